@@ -0,0 +1,799 @@
+# =============================================================================
+# Copyright (c) 2024 by Laszlo Anka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+"""
+This module generates encoder and decoder functions specialized for an Avro schema. The
+generic DatumWriter and DatumReader interpret the schema for every record, i.e. they
+validate the whole record upfront, dispatch on the type of every field and create an
+encoder or decoder object per record. The generated functions access the fields by
+name, encode and decode them inline and process an entire batch in one call:
+
+    codec = compile_codec(parsed_schema)
+    values = codec.encode_batch([{"text": "HelloWorld_0"}, {"text": "HelloWorld_1"}])
+    records = codec.decode_batch(values)
+
+The encoded bytes are identical to the output of the DatumWriter. Invalid records are
+rejected by the encoder, but the error is less descriptive, hence the callers shall fall
+back to the generic path to explain it. Schemas with logical types, recursive records
+or ambiguous unions (e.g., a map and a record in the same union) are not supported,
+in that case compile_codec() returns None.
+
+If only some fields of a record are needed, the decoder can be generated for a projection.
+It skips the other fields at byte level i.e., they are neither decoded nor materialized:
+
+    codec = compile_codec(parsed_schema, ["text"])
+"""
+
+import struct
+from typing import Any, Callable, Iterable, Optional
+
+from avro.schema import Schema
+
+from pypz.example.records import ColumnBatch, ColumnsRecordType, DictRecordType, RowRecordType, \
+    check_record_type, create_row_type
+
+IntRange = (-(1 << 31), (1 << 31) - 1)
+
+LongRange = (-(1 << 63), (1 << 63) - 1)
+
+
+class UnsupportedSchemaError(Exception):
+    pass
+
+
+def _write_varint(buffer: bytearray, value: int) -> None:
+    """
+    Writes the already zigzag encoded value as variable length integer.
+    """
+
+    while value > 0x7F:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+
+    buffer.append(value)
+
+
+def _read_long(data: bytes, position: int) -> tuple[int, int]:
+    """
+    :return: the decoded zigzag varint and the position after it
+    """
+
+    byte = data[position]
+    position += 1
+    value = byte & 0x7F
+    shift = 7
+
+    while byte & 0x80:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+
+    return (value >> 1) ^ -(value & 1), position
+
+
+class _CodeGenerator:
+    """
+    Generates the source of the encode_batch() and decode_batch() functions. The constants
+    (e.g., enum symbols) are collected into the namespace of the generated code.
+    """
+
+    def __init__(self):
+        self.namespace: dict[str, Any] = {
+            "_write_varint": _write_varint,
+            "_read_long": _read_long,
+            "_pack_float": struct.Struct("<f").pack,
+            "_pack_double": struct.Struct("<d").pack,
+            "_unpack_float": struct.Struct("<f").unpack_from,
+            "_unpack_double": struct.Struct("<d").unpack_from,
+        }
+
+        self._variable_count: int = 0
+
+        self._record_names: list[str] = []
+        """
+        Names of the records being generated to detect recursion
+        """
+
+    def _new_variable(self, prefix: str = "v") -> str:
+        self._variable_count += 1
+        return f"{prefix}{self._variable_count}"
+
+    def _add_constant(self, prefix: str, value: Any) -> str:
+        name = self._new_variable(f"_{prefix}")
+        self.namespace[name] = value
+        return name
+
+    @staticmethod
+    def _check_supported(schema: Schema) -> None:
+        if getattr(schema, "logical_type", None) is not None:
+            raise UnsupportedSchemaError(f"Logical type is not supported: {schema.logical_type}")
+
+    # --------------------------
+    # Encoder
+    # --------------------------
+
+    def _encode_long(self, value_expression: str, lines: list[str], indent: str) -> None:
+        zigzag = self._new_variable("z")
+
+        lines.append(f"{indent}{zigzag} = ({value_expression} << 1) ^ ({value_expression} >> 63)")
+        lines.append(f"{indent}if {zigzag} < 0x80:")
+        lines.append(f"{indent}    buffer.append({zigzag})")
+        lines.append(f"{indent}else:")
+        lines.append(f"{indent}    _write_varint(buffer, {zigzag})")
+
+    def _encode_length_prefixed(self, data_expression: str, lines: list[str], indent: str) -> None:
+        length = self._new_variable("n")
+
+        lines.append(f"{indent}{length} = len({data_expression})")
+        lines.append(f"{indent}if {length} < 0x40:")
+        lines.append(f"{indent}    buffer.append({length} << 1)")
+        lines.append(f"{indent}else:")
+        lines.append(f"{indent}    _write_varint(buffer, {length} << 1)")
+        lines.append(f"{indent}buffer += {data_expression}")
+
+    def _encode_invalid(self, schema_type: str, value: str, lines: list[str], indent: str) -> None:
+        lines.append(f"{indent}raise TypeError(f'Invalid {schema_type} value: {{{value}!r}}')")
+
+    def _get_union_predicate(self, schema: Schema, value: str) -> str:
+        """
+        :return: the same condition as the validation of the DatumWriter, except for the
+                 containers, whose items are checked by their encoder
+        """
+
+        schema_type = schema.type
+
+        if "null" == schema_type:
+            return f"{value} is None"
+        if "boolean" == schema_type:
+            return f"isinstance({value}, bool)"
+        if schema_type in ("int", "long"):
+            value_range = IntRange if "int" == schema_type else LongRange
+            return f"(isinstance({value}, int) and {value_range[0]} <= {value} <= {value_range[1]})"
+        if schema_type in ("float", "double"):
+            return f"isinstance({value}, (int, float))"
+        if "string" == schema_type:
+            return f"isinstance({value}, str)"
+        if "bytes" == schema_type:
+            return f"isinstance({value}, bytes)"
+        if "fixed" == schema_type:
+            return f"(isinstance({value}, bytes) and len({value}) == {schema.size})"
+        if "enum" == schema_type:
+            return f"(isinstance({value}, str) and {value} in {self._add_constant('symbols', set(schema.symbols))})"
+        if "array" == schema_type:
+            return f"isinstance({value}, list)"
+        if schema_type in ("map", "record"):
+            return f"isinstance({value}, dict)"
+
+        raise UnsupportedSchemaError(f"Unsupported union branch: {schema_type}")
+
+    def encode(self, schema: Schema, value: str, lines: list[str], indent: str) -> None:
+        """
+        Generates the code, which appends the encoded value of the variable to the buffer.
+        """
+
+        self._check_supported(schema)
+
+        schema_type = schema.type
+
+        if "null" == schema_type:
+            lines.append(f"{indent}if {value} is not None:")
+            self._encode_invalid(schema_type, value, lines, indent + "    ")
+        elif "boolean" == schema_type:
+            lines.append(f"{indent}if {value} is True:")
+            lines.append(f"{indent}    buffer.append(1)")
+            lines.append(f"{indent}elif {value} is False:")
+            lines.append(f"{indent}    buffer.append(0)")
+            lines.append(f"{indent}else:")
+            self._encode_invalid(schema_type, value, lines, indent + "    ")
+        elif schema_type in ("int", "long"):
+            value_range = IntRange if "int" == schema_type else LongRange
+            lines.append(f"{indent}if not ({value_range[0]} <= {value} <= {value_range[1]}):")
+            self._encode_invalid(schema_type, value, lines, indent + "    ")
+            self._encode_long(value, lines, indent)
+        elif "float" == schema_type:
+            lines.append(f"{indent}buffer += _pack_float({value})")
+        elif "double" == schema_type:
+            lines.append(f"{indent}buffer += _pack_double({value})")
+        elif "string" == schema_type:
+            encoded = self._new_variable("e")
+            lines.append(f"{indent}{encoded} = {value}.encode()")
+            self._encode_length_prefixed(encoded, lines, indent)
+        elif "bytes" == schema_type:
+            lines.append(f"{indent}if not isinstance({value}, bytes):")
+            self._encode_invalid(schema_type, value, lines, indent + "    ")
+            self._encode_length_prefixed(value, lines, indent)
+        elif "fixed" == schema_type:
+            lines.append(f"{indent}if not (isinstance({value}, bytes) and len({value}) == {schema.size}):")
+            self._encode_invalid(schema_type, value, lines, indent + "    ")
+            lines.append(f"{indent}buffer += {value}")
+        elif "enum" == schema_type:
+            indices = self._add_constant("enum", {symbol: index for index, symbol in enumerate(schema.symbols)})
+            index = self._new_variable("i")
+            lines.append(f"{indent}{index} = {indices}[{value}]")
+            self._encode_long(index, lines, indent)
+        elif "array" == schema_type:
+            item = self._new_variable("x")
+            lines.append(f"{indent}if not isinstance({value}, list):")
+            self._encode_invalid(schema_type, value, lines, indent + "    ")
+            lines.append(f"{indent}if {value}:")
+            self._encode_long(f"len({value})", lines, indent + "    ")
+            lines.append(f"{indent}    for {item} in {value}:")
+            self.encode(schema.items, item, lines, indent + "        ")
+            lines.append(f"{indent}buffer.append(0)")
+        elif "map" == schema_type:
+            key = self._new_variable("k")
+            item = self._new_variable("x")
+            encoded_key = self._new_variable("e")
+            lines.append(f"{indent}if not isinstance({value}, dict):")
+            self._encode_invalid(schema_type, value, lines, indent + "    ")
+            lines.append(f"{indent}if {value}:")
+            self._encode_long(f"len({value})", lines, indent + "    ")
+            lines.append(f"{indent}    for {key}, {item} in {value}.items():")
+            lines.append(f"{indent}        {encoded_key} = {key}.encode()")
+            self._encode_length_prefixed(encoded_key, lines, indent + "        ")
+            self.encode(schema.values, item, lines, indent + "        ")
+            lines.append(f"{indent}buffer.append(0)")
+        elif "union" == schema_type:
+            branch_kinds = [self._get_union_predicate(branch, "_")
+                            for branch in schema.schemas if branch.type in ("array", "map", "record")]
+            if len(branch_kinds) != len(set(branch_kinds)):
+                raise UnsupportedSchemaError("Union with ambiguous container branches")
+
+            # The DatumWriter selects the last valid branch, hence the branches are checked in reverse order
+            keyword = "if"
+            for index in reversed(range(len(schema.schemas))):
+                branch = schema.schemas[index]
+                lines.append(f"{indent}{keyword} {self._get_union_predicate(branch, value)}:")
+                self._encode_long(str(index), lines, indent + "    ")
+                if "null" != branch.type:
+                    self.encode(branch, value, lines, indent + "    ")
+                keyword = "elif"
+            lines.append(f"{indent}else:")
+            self._encode_invalid(schema_type, value, lines, indent + "    ")
+        elif "record" == schema_type:
+            if schema.fullname in self._record_names:
+                raise UnsupportedSchemaError(f"Recursive record: {schema.fullname}")
+            self._record_names.append(schema.fullname)
+
+            field_names = self._add_constant("fields", frozenset(field.name for field in schema.fields))
+            lines.append(f"{indent}if not (isinstance({value}, dict) and {field_names}.issuperset({value})):")
+            self._encode_invalid(schema_type, value, lines, indent + "    ")
+
+            for field in schema.fields:
+                field_value = self._new_variable("f")
+                lines.append(f"{indent}{field_value} = {value}.get({field.name!r})")
+                self.encode(field.type, field_value, lines, indent)
+
+            self._record_names.pop()
+        else:
+            raise UnsupportedSchemaError(f"Unsupported type: {schema_type}")
+
+    # --------------------------
+    # Decoder
+    # --------------------------
+
+    def _decode_long(self, target: str, lines: list[str], indent: str) -> None:
+        byte = self._new_variable("c")
+
+        lines.append(f"{indent}{byte} = data[position]")
+        lines.append(f"{indent}if {byte} < 0x80:")
+        lines.append(f"{indent}    {target} = ({byte} >> 1) ^ -({byte} & 1)")
+        lines.append(f"{indent}    position += 1")
+        lines.append(f"{indent}else:")
+        lines.append(f"{indent}    {target}, position = _read_long(data, position)")
+
+    def _decode_blocks(self, lines: list[str], indent: str, decode_item: Callable[[str], None]) -> None:
+        """
+        Generates the block loop of the arrays and maps. Negative block counts are followed
+        by the size of the block in bytes, which is not needed here.
+        """
+
+        count = self._new_variable("n")
+        block_size = self._new_variable("s")
+
+        self._decode_long(count, lines, indent)
+        lines.append(f"{indent}while {count}:")
+        lines.append(f"{indent}    if {count} < 0:")
+        lines.append(f"{indent}        {count} = -{count}")
+        self._decode_long(block_size, lines, indent + "        ")
+        lines.append(f"{indent}    for _ in range({count}):")
+        decode_item(indent + "        ")
+        self._decode_long(count, lines, indent + "    ")
+
+    def decode(self, schema: Schema, lines: list[str], indent: str) -> str:
+        """
+        Generates the code, which decodes a value from the data at the position.
+
+        :return: the expression of the decoded value
+        """
+
+        self._check_supported(schema)
+
+        schema_type = schema.type
+
+        if "null" == schema_type:
+            return "None"
+
+        target = self._new_variable()
+
+        if "boolean" == schema_type:
+            lines.append(f"{indent}{target} = data[position] == 1")
+            lines.append(f"{indent}position += 1")
+        elif schema_type in ("int", "long"):
+            self._decode_long(target, lines, indent)
+        elif schema_type in ("float", "double"):
+            size = 4 if "float" == schema_type else 8
+            lines.append(f"{indent}{target} = _unpack_{schema_type}(data, position)[0]")
+            lines.append(f"{indent}position += {size}")
+        elif schema_type in ("string", "bytes"):
+            length = self._new_variable("n")
+            self._decode_long(length, lines, indent)
+            if "string" == schema_type:
+                lines.append(f"{indent}{target} = str(data[position:position + {length}], 'utf-8')")
+            else:
+                lines.append(f"{indent}{target} = bytes(data[position:position + {length}])")
+            lines.append(f"{indent}position += {length}")
+        elif "fixed" == schema_type:
+            lines.append(f"{indent}{target} = bytes(data[position:position + {schema.size}])")
+            lines.append(f"{indent}position += {schema.size}")
+        elif "enum" == schema_type:
+            symbols = self._add_constant("symbols", tuple(schema.symbols))
+            index = self._new_variable("i")
+            self._decode_long(index, lines, indent)
+            lines.append(f"{indent}{target} = {symbols}[{index}]")
+        elif "array" == schema_type:
+            lines.append(f"{indent}{target} = []")
+
+            def decode_item(item_indent: str) -> None:
+                item = self.decode(schema.items, lines, item_indent)
+                lines.append(f"{item_indent}{target}.append({item})")
+
+            self._decode_blocks(lines, indent, decode_item)
+        elif "map" == schema_type:
+            lines.append(f"{indent}{target} = {{}}")
+
+            def decode_item(item_indent: str) -> None:
+                key = self._decode_key(lines, item_indent)
+                item = self.decode(schema.values, lines, item_indent)
+                lines.append(f"{item_indent}{target}[{key}] = {item}")
+
+            self._decode_blocks(lines, indent, decode_item)
+        elif "union" == schema_type:
+            index = self._new_variable("i")
+            self._decode_long(index, lines, indent)
+
+            keyword = "if"
+            for branch_index, branch in enumerate(schema.schemas):
+                lines.append(f"{indent}{keyword} {index} == {branch_index}:")
+                branch_lines = []
+                branch_value = self.decode(branch, branch_lines, indent + "    ")
+                lines.extend(branch_lines)
+                lines.append(f"{indent}    {target} = {branch_value}")
+                keyword = "elif"
+            lines.append(f"{indent}else:")
+            lines.append(f"{indent}    raise ValueError(f'Invalid union index: {{{index}}}')")
+        elif "record" == schema_type:
+            if schema.fullname in self._record_names:
+                raise UnsupportedSchemaError(f"Recursive record: {schema.fullname}")
+            self._record_names.append(schema.fullname)
+
+            field_values = [(field.name, self.decode(field.type, lines, indent)) for field in schema.fields]
+            lines.append(f"{indent}{target} = {{{', '.join(f'{name!r}: {value}' for name, value in field_values)}}}")
+
+            self._record_names.pop()
+        else:
+            raise UnsupportedSchemaError(f"Unsupported type: {schema_type}")
+
+        return target
+
+    # --------------------------
+    # Skipping
+    # --------------------------
+
+    @staticmethod
+    def _get_fixed_size(schema: Schema) -> Optional[int]:
+        """
+        :return: the encoded size of the values of the schema, if it is the same for every value
+        """
+
+        schema_type = schema.type
+
+        if "null" == schema_type:
+            return 0
+        if "boolean" == schema_type:
+            return 1
+        if "float" == schema_type:
+            return 4
+        if "double" == schema_type:
+            return 8
+        if "fixed" == schema_type:
+            return schema.size
+        if "record" == schema_type:
+            field_sizes = [_CodeGenerator._get_fixed_size(field.type) for field in schema.fields]
+            return None if None in field_sizes else sum(field_sizes)
+
+        return None
+
+    def _skip_fields(self, fields: list, lines: list[str], indent: str) -> None:
+        """
+        Generates the code, which skips the consecutive fields. The sizes of the consecutive
+        fixed size fields are summed up, so e.g., 8 doubles are skipped by one addition.
+        """
+
+        pending_size = 0
+
+        for field in fields:
+            fixed_size = self._get_fixed_size(field.type)
+
+            if fixed_size is not None:
+                pending_size += fixed_size
+                continue
+
+            if 0 < pending_size:
+                lines.append(f"{indent}position += {pending_size}")
+                pending_size = 0
+
+            self.skip(field.type, lines, indent)
+
+        if 0 < pending_size:
+            lines.append(f"{indent}position += {pending_size}")
+
+    def skip(self, schema: Schema, lines: list[str], indent: str) -> None:
+        """
+        Generates the code, which moves the position after the value without decoding it.
+        The strings and bytes are skipped by their length, the integers by their last byte.
+        """
+
+        self._check_supported(schema)
+
+        schema_type = schema.type
+
+        fixed_size = self._get_fixed_size(schema)
+
+        if fixed_size is not None:
+            if 0 < fixed_size:
+                lines.append(f"{indent}position += {fixed_size}")
+        elif schema_type in ("int", "long", "enum"):
+            lines.append(f"{indent}while data[position] & 0x80:")
+            lines.append(f"{indent}    position += 1")
+            lines.append(f"{indent}position += 1")
+        elif schema_type in ("string", "bytes"):
+            length = self._new_variable("n")
+            self._decode_long(length, lines, indent)
+            lines.append(f"{indent}position += {length}")
+        elif schema_type in ("array", "map"):
+            count = self._new_variable("n")
+            block_size = self._new_variable("s")
+
+            # Blocks with negative count are prefixed by their size, hence they are skipped at once
+            self._decode_long(count, lines, indent)
+            lines.append(f"{indent}while {count}:")
+            lines.append(f"{indent}    if {count} < 0:")
+            self._decode_long(block_size, lines, indent + "        ")
+            lines.append(f"{indent}        position += {block_size}")
+            lines.append(f"{indent}    else:")
+            item_size = self._get_fixed_size(schema.items) if "array" == schema_type else None
+            if item_size is not None:
+                lines.append(f"{indent}        position += {count} * {item_size}")
+            else:
+                lines.append(f"{indent}        for _ in range({count}):")
+                if "map" == schema_type:
+                    key_length = self._new_variable("n")
+                    self._decode_long(key_length, lines, indent + "            ")
+                    lines.append(f"{indent}            position += {key_length}")
+                self.skip(schema.items if "array" == schema_type else schema.values, lines, indent + "            ")
+            self._decode_long(count, lines, indent + "    ")
+        elif "union" == schema_type:
+            index = self._new_variable("i")
+            self._decode_long(index, lines, indent)
+
+            keyword = "if"
+            for branch_index, branch in enumerate(schema.schemas):
+                branch_lines = []
+                self.skip(branch, branch_lines, indent + "    ")
+                if branch_lines:
+                    lines.append(f"{indent}{keyword} {index} == {branch_index}:")
+                    lines.extend(branch_lines)
+                    keyword = "elif"
+        elif "record" == schema_type:
+            if schema.fullname in self._record_names:
+                raise UnsupportedSchemaError(f"Recursive record: {schema.fullname}")
+            self._record_names.append(schema.fullname)
+
+            self._skip_fields(schema.fields, lines, indent)
+
+            self._record_names.pop()
+        else:
+            raise UnsupportedSchemaError(f"Unsupported type: {schema_type}")
+
+    def _decode_key(self, lines: list[str], indent: str) -> str:
+        key = self._new_variable("k")
+        length = self._new_variable("n")
+
+        self._decode_long(length, lines, indent)
+        lines.append(f"{indent}{key} = str(data[position:position + {length}], 'utf-8')")
+        lines.append(f"{indent}position += {length}")
+
+        return key
+
+    def encode_row(self, schema: Schema, lines: list[str], indent: str) -> None:
+        """
+        Generates the code, which appends the encoded record to the buffer, where the record
+        is a tuple of the field values in the order of the schema e.g., a row.
+        """
+
+        self._record_names.append(schema.fullname)
+
+        field_values = [self._new_variable("f") for _ in schema.fields]
+
+        lines.append(f"{indent}if not (isinstance(record, tuple) and len(record) == {len(schema.fields)}):")
+        self._encode_invalid("row", "record", lines, indent + "    ")
+        lines.append(f"{indent}{', '.join(field_values)}, = record")
+
+        for field, field_value in zip(schema.fields, field_values):
+            self.encode(field.type, field_value, lines, indent)
+
+        self._record_names.pop()
+
+    def decode_fields(self, schema: Schema, projected_field_names: Optional[set[str]],
+                      lines: list[str], indent: str) -> list[tuple[str, str]]:
+        """
+        Generates the code, which decodes the fields of the record. In case of projection,
+        the other fields are skipped and the fields after the last projected one are not
+        even skipped, since the rest of the data is not needed.
+
+        :return: the name and the expression of the decoded fields
+        """
+
+        self._record_names.append(schema.fullname)
+
+        if projected_field_names is None:
+            projected_field_names = {field.name for field in schema.fields}
+
+        last_projected_index = max(index for index, field in enumerate(schema.fields)
+                                   if field.name in projected_field_names)
+
+        field_values = []
+        skipped_fields = []
+
+        for field in schema.fields[:last_projected_index + 1]:
+            if field.name not in projected_field_names:
+                skipped_fields.append(field)
+                continue
+
+            self._skip_fields(skipped_fields, lines, indent)
+            skipped_fields = []
+
+            field_values.append((field.name, self.decode(field.type, lines, indent)))
+
+        self._record_names.pop()
+
+        return field_values
+
+    def _generate_decoder(self, schema: Schema, projected_field_names: Optional[set[str]],
+                          record_type: str) -> list[str]:
+        decoder_lines = []
+
+        if "record" != schema.type:
+            decoded_value = self.decode(schema, decoder_lines, " " * 8)
+
+            return [
+                "def decode_batch(values):",
+                "    records = []",
+                "    for data in values:",
+                "        position = 0",
+                *decoder_lines,
+                f"        records.append({decoded_value})",
+                "    return records",
+            ]
+
+        field_values = self.decode_fields(schema, projected_field_names, decoder_lines, " " * 8)
+
+        if ColumnsRecordType == record_type:
+            # The append methods are bound once per batch
+            columns = [self._new_variable("column") for _ in field_values]
+            column_batch = ", ".join(f"{name!r}: {column}" for column, (name, _) in zip(columns, field_values))
+
+            return [
+                "def decode_batch(values):",
+                *[f"    {column} = []" for column in columns],
+                *[f"    {column}_append = {column}.append" for column in columns],
+                "    for data in values:",
+                "        position = 0",
+                *decoder_lines,
+                *[f"        {column}_append({value})" for column, (_, value) in zip(columns, field_values)],
+                f"    return _ColumnBatch({{{column_batch}}})",
+            ]
+
+        if RowRecordType == record_type:
+            decoded_record = f"_new_row(_row_type, ({''.join(f'{value}, ' for _, value in field_values)}))"
+        else:
+            decoded_record = f"{{{', '.join(f'{name!r}: {value}' for name, value in field_values)}}}"
+
+        return [
+            "def decode_batch(values):",
+            "    records = []",
+            "    for data in values:",
+            "        position = 0",
+            *decoder_lines,
+            f"        records.append({decoded_record})",
+            "    return records",
+        ]
+
+    def _generate_encoder(self, function_name: str, encoder_lines: list[str]) -> list[str]:
+        return [
+            f"def {function_name}(records):",
+            "    buffer = bytearray()",
+            "    ends = []",
+            "    for record in records:",
+            *encoder_lines,
+            "        ends.append(len(buffer))",
+            "    view = memoryview(buffer)",
+            "    values = []",
+            "    start = 0",
+            "    for end in ends:",
+            "        values.append(bytes(view[start:end]))",
+            "        start = end",
+            "    return values",
+        ]
+
+    def generate(self, schema: Schema, projected_field_names: Optional[set[str]] = None,
+                 record_type: str = DictRecordType) -> str:
+        """
+        :return: the source of the functions encode_batch() and decode_batch(), in case of
+                 record schemas encode_rows() as well, which encodes tuples of field values
+        """
+
+        encoder_lines = []
+        self.encode(schema, "record", encoder_lines, " " * 8)
+
+        source_lines = self._generate_encoder("encode_batch", encoder_lines)
+
+        if "record" == schema.type:
+            row_encoder_lines = []
+            self.encode_row(schema, row_encoder_lines, " " * 8)
+            source_lines += ["", "", *self._generate_encoder("encode_rows", row_encoder_lines)]
+
+        source_lines += ["", "", *self._generate_decoder(schema, projected_field_names, record_type), ""]
+
+        return "\n".join(source_lines)
+
+
+class AvroCodec:
+    """
+    Encoder and decoder functions generated for a schema.
+
+    :param schema: the parsed Avro schema
+    :param source: source code of the generated functions
+    :param namespace: globals of the generated functions
+    :param projected_field_names: name of the fields returned by the decoder, None if every field is decoded
+    :param record_type: representation of the decoded records, see records.py
+    :param row_type: type of the decoded rows, if the record type is "row"
+    """
+
+    def __init__(self, schema: Schema, source: str, namespace: dict[str, Any],
+                 projected_field_names: Optional[list[str]] = None, record_type: str = DictRecordType,
+                 row_type: Optional[type] = None):
+        self.schema: Schema = schema
+        self.source: str = source
+
+        self.projected_field_names: Optional[list[str]] = projected_field_names
+
+        self.record_type: str = record_type
+
+        self.row_type: Optional[type] = row_type
+
+        exec(compile(source, f"<avro codec {getattr(schema, 'fullname', schema.type)}>", "exec"), namespace)
+
+        self._encode_dicts: Callable[[list[Any]], list[bytes]] = namespace["encode_batch"]
+
+        self._encode_rows: Optional[Callable[[Iterable[tuple]], list[bytes]]] = namespace.get("encode_rows")
+
+        self._field_names: Optional[list[str]] = [field.name for field in schema.fields] \
+            if "record" == schema.type else None
+
+        self.decode_batch: Callable[[list[bytes]], Any] = namespace["decode_batch"]
+        """
+        Decodes the records, in case of projection only the projected fields. The result is
+        a list of dicts or rows, or a ColumnBatch depending on the record type.
+        """
+
+    def encode_batch(self, records: Any) -> list[bytes]:
+        """
+        Encodes the records into one buffer and returns the encoded records as separate
+        bytes objects, each identical to the output of the DatumWriter. The records can be
+        a list of dicts, a list of rows (tuples of the field values in the order of the
+        schema) or a ColumnBatch with the fields of the schema.
+        """
+
+        if self._encode_rows is not None:
+            if isinstance(records, ColumnBatch):
+                if not records.columns.keys() <= set(self._field_names):
+                    raise TypeError(f"Unknown columns: {sorted(records.columns.keys() - set(self._field_names))}")
+
+                return self._encode_rows(zip(*[records.columns[field_name] for field_name in self._field_names]))
+
+            if (0 < len(records)) and isinstance(records[0], tuple):
+                return self._encode_rows(records)
+
+        return self._encode_dicts(records)
+
+    def encode(self, record: Any) -> bytes:
+        return self.encode_batch([record])[0]
+
+    def decode(self, data: bytes) -> Any:
+        return self.decode_batch([data])[0]
+
+
+def check_projection(schema: Schema, projected_field_names: Iterable[str]) -> list[str]:
+    """
+    :param schema: the parsed Avro record schema
+    :param projected_field_names: name of the fields to be decoded
+    :return: the projected field names in the order of the schema
+    :raises ValueError: if the schema is not a record or a field does not exist
+    """
+
+    if "record" != schema.type:
+        raise ValueError(f"Projection requires a record schema: {schema.type}")
+
+    projected_field_names = set(projected_field_names)
+
+    if 0 == len(projected_field_names):
+        raise ValueError("Projection requires at least one field")
+
+    unknown_field_names = projected_field_names.difference(field.name for field in schema.fields)
+
+    if 0 < len(unknown_field_names):
+        raise ValueError(f"Projected fields not found in {schema.fullname}: {sorted(unknown_field_names)}")
+
+    return [field.name for field in schema.fields if field.name in projected_field_names]
+
+
+def compile_codec(schema: Schema, projected_field_names: Optional[Iterable[str]] = None,
+                  record_type: str = DictRecordType, row_type: Optional[type] = None) -> Optional[AvroCodec]:
+    """
+    :param schema: the parsed Avro schema
+    :param projected_field_names: if specified, the decoder returns only these fields of
+                                  the record, the other fields are skipped without decoding
+    :param record_type: representation of the decoded records i.e., "dict", "row" or "columns"
+    :param row_type: type of the decoded rows, if not specified, it is created from the schema
+    :return: the specialized codec or None, if the schema is not supported
+    :raises ValueError: if the projection or the record type does not match the schema
+    """
+
+    if projected_field_names is not None:
+        projected_field_names = check_projection(schema, projected_field_names)
+
+    if (DictRecordType != check_record_type(record_type)) and ("record" != schema.type):
+        raise ValueError(f"Record type '{record_type}' requires a record schema: {schema.type}")
+
+    if (RowRecordType == record_type) and (row_type is None):
+        row_type = create_row_type(schema.name, projected_field_names or [field.name for field in schema.fields])
+
+    generator = _CodeGenerator()
+    generator.namespace.update({
+        "_ColumnBatch": ColumnBatch,
+        "_new_row": tuple.__new__,
+        "_row_type": row_type,
+    })
+
+    try:
+        source = generator.generate(schema, None if projected_field_names is None else set(projected_field_names),
+                                    record_type)
+    except UnsupportedSchemaError:
+        return None
+
+    return AvroCodec(schema, source, generator.namespace, projected_field_names, record_type, row_type)
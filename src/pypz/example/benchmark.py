@@ -0,0 +1,251 @@
+# =============================================================================
+# Copyright (c) 2024 by Laszlo Anka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+import argparse
+import inspect
+import json
+import threading
+import time
+import tracemalloc
+from typing import Optional
+
+from pypz.core.specs.operator import Operator
+from pypz.core.specs.pipeline import Pipeline
+from pypz.executors.pipeline.executor import PipelineExecutor
+
+from pypz.example.generators import GeneratorOperator
+from pypz.example.memory_io import get_channel_statistics, reset_channel_statistics
+from pypz.example.memory_pipeline import MemoryDemoPipeline, MemoryRMQDemoPipeline
+from pypz.example.writer import DemoWriterOperator
+
+"""
+This example shows, how to measure the overhead of the framework by executing the demo
+pipelines with in-memory channels i.e., without any broker. It reports the throughput,
+the p50/p99 end-to-end latency between the output and input ports and optionally the
+memory allocated by each operator. Notice that tracing the memory slows down the
+execution significantly, hence the throughput shall be measured without it.
+
+    python -m pypz.example.benchmark --record-count 100000 --batch-size 100
+"""
+
+BenchmarkPipelines = {
+    "demo": MemoryDemoPipeline,
+    "rmq-demo": MemoryRMQDemoPipeline,
+}
+
+
+def calculate_percentile(samples: list[tuple[int, int]], percentile: float) -> float:
+    """
+    Calculates the percentile of weighted samples.
+
+    :param samples: list of (value, weight) pairs
+    :param percentile: percentile in range [0, 100]
+    :return: the percentile value or 0, if there are no samples
+    """
+
+    if 0 == len(samples):
+        return 0
+
+    sorted_samples = sorted(samples)
+    total_weight = sum(weight for _, weight in sorted_samples)
+    target_weight = total_weight * percentile / 100
+
+    cumulated_weight = 0
+    for value, weight in sorted_samples:
+        cumulated_weight += weight
+        if target_weight <= cumulated_weight:
+            return value
+
+    return sorted_samples[-1][0]
+
+
+class OperatorMemorySampler:
+    """
+    Since all the operators are executed in the same process, the allocated memory is
+    attributed to the operator, whose code is the closest to the allocation in the
+    traceback. The sampler periodically takes a snapshot and keeps the peak per operator.
+
+    :param operators: operators to sample the memory of
+    :param interval_sec: time between snapshots
+    """
+
+    TracebackFrameCount = 32
+
+    def __init__(self, operators: list[Operator], interval_sec: float = 0.5):
+        self._interval_sec: float = interval_sec
+
+        self._code_ranges: dict[str, list[tuple[str, int, int]]] = {
+            operator.get_full_name(): OperatorMemorySampler._retrieve_code_ranges(type(operator))
+            for operator in operators
+        }
+        """
+        Source ranges (file, first line, last line) of the operator classes
+        """
+
+        self.peak_memory_bytes: dict[str, int] = {name: 0 for name in self._code_ranges}
+
+        self._stopped: threading.Event = threading.Event()
+
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _retrieve_code_ranges(operator_type: type) -> list[tuple[str, int, int]]:
+        code_ranges = []
+
+        for cls in operator_type.__mro__:
+            # Framework classes are shared by all operators, hence they cannot be used for attribution
+            if (not issubclass(cls, Operator)) or cls.__module__.startswith("pypz.core"):
+                continue
+
+            source_lines, first_line = inspect.getsourcelines(cls)
+            code_ranges.append((inspect.getsourcefile(cls), first_line, first_line + len(source_lines)))
+
+        return code_ranges
+
+    def _attribute(self, traceback: tracemalloc.Traceback) -> Optional[str]:
+        # Frames are ordered from the oldest to the most recent one
+        for frame in reversed(traceback):
+            for operator_name, code_ranges in self._code_ranges.items():
+                for file_name, first_line, last_line in code_ranges:
+                    if (frame.filename == file_name) and (first_line <= frame.lineno <= last_line):
+                        return operator_name
+        return None
+
+    def _sample(self) -> None:
+        memory_bytes = {name: 0 for name in self._code_ranges}
+
+        for statistic in tracemalloc.take_snapshot().statistics("traceback"):
+            operator_name = self._attribute(statistic.traceback)
+            if operator_name is not None:
+                memory_bytes[operator_name] += statistic.size
+
+        for operator_name, size in memory_bytes.items():
+            self.peak_memory_bytes[operator_name] = max(self.peak_memory_bytes[operator_name], size)
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self._interval_sec):
+            self._sample()
+
+    def start(self) -> None:
+        tracemalloc.start(OperatorMemorySampler.TracebackFrameCount)
+        self._thread = threading.Thread(target=self._run, name=self.__class__.__name__, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._thread.join()
+        tracemalloc.stop()
+
+
+def run_benchmark(pipeline: Pipeline, record_count: int, batch_size: int,
+                  trace_memory: bool = False) -> dict:
+    """
+    Executes the pipeline and evaluates the statistics of its memory channels.
+
+    :param pipeline: pipeline with in-memory channels, which has a writer and a reader operator
+    :param record_count: number of records sent by the writer
+    :param batch_size: number of records sent in one iteration, if supported by the writer
+    :param trace_memory: if True, the memory allocated by the operators will be traced
+    :return: the benchmark results
+    """
+
+    pipeline.writer.set_parameter("recordCount", record_count)
+
+    if isinstance(pipeline.writer, DemoWriterOperator):
+        pipeline.writer.set_parameter("batchSize", batch_size)
+        pipeline.writer.set_parameter("targetRecordsPerSecond", 0)
+
+    if isinstance(pipeline.writer, GeneratorOperator):
+        pipeline.writer.set_parameter("flushRecordCount", batch_size)
+
+    pipeline.set_parameter(">>channelConfig", {"latency_tracking": True})
+
+    # Logging each record would measure the logger instead of the framework
+    for operator in (pipeline.writer, pipeline.reader):
+        operator.logger.set_parameter("logLevel", "WARNING")
+
+    reset_channel_statistics()
+
+    memory_sampler = OperatorMemorySampler([pipeline.writer, pipeline.reader]) if trace_memory else None
+
+    if memory_sampler is not None:
+        memory_sampler.start()
+
+    executor = PipelineExecutor(pipeline)
+
+    start_time = time.perf_counter()
+    executor.start()
+    executor.shutdown()
+    elapsed_time_sec = time.perf_counter() - start_time
+
+    if memory_sampler is not None:
+        memory_sampler.stop()
+
+    results = {
+        "pipeline": pipeline.get_full_name(),
+        "recordCount": record_count,
+        "batchSize": batch_size,
+        "totalElapsedTimeSec": elapsed_time_sec,
+        "channels": {},
+    }
+
+    for channel_name, statistics in get_channel_statistics().items():
+        transfer_time_sec = (statistics.last_read_time_ns - statistics.first_write_time_ns) / 1e9
+
+        results["channels"][channel_name] = {
+            "writtenRecordCount": statistics.written_record_count,
+            "readRecordCount": statistics.read_record_count,
+            "recordsPerSecond": statistics.read_record_count / transfer_time_sec if 0 < transfer_time_sec else 0,
+            "latencyP50Ms": calculate_percentile(statistics.latency_samples, 50) / 1e6,
+            "latencyP99Ms": calculate_percentile(statistics.latency_samples, 99) / 1e6,
+        }
+
+    if memory_sampler is not None:
+        results["peakMemoryBytesPerOperator"] = memory_sampler.peak_memory_bytes
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks the demo pipelines with in-memory channels")
+    parser.add_argument("--pipeline", choices=list(BenchmarkPipelines.keys()), nargs="+",
+                        default=list(BenchmarkPipelines.keys()))
+    parser.add_argument("--record-count", type=int, default=100000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Traces the memory allocated by the operators, slows down the execution")
+    parser.add_argument("--output", help="Path of a JSON file to store the results e.g., for regression checks")
+    arguments = parser.parse_args()
+
+    benchmark_results = []
+
+    for pipeline_name in arguments.pipeline:
+        benchmark_results.append(run_benchmark(BenchmarkPipelines[pipeline_name](pipeline_name),
+                                               arguments.record_count, arguments.batch_size,
+                                               arguments.trace_memory))
+
+    for result in benchmark_results:
+        print(f"Pipeline: {result['pipeline']}")
+        for channel_name, channel_result in result["channels"].items():
+            print(f"  {channel_name}: {channel_result['readRecordCount']} records; "
+                  f"{channel_result['recordsPerSecond']:.0f} records/s; "
+                  f"p50: {channel_result['latencyP50Ms']:.3f} ms; "
+                  f"p99: {channel_result['latencyP99Ms']:.3f} ms")
+        for operator_name, memory_bytes in result.get("peakMemoryBytesPerOperator", {}).items():
+            print(f"  {operator_name}: {memory_bytes / 1024:.1f} KiB peak memory")
+
+    if arguments.output is not None:
+        with open(arguments.output, "w") as output_file:
+            json.dump(benchmark_results, output_file, indent=2)
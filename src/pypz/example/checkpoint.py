@@ -0,0 +1,334 @@
+# =============================================================================
+# Copyright (c) 2024 by Laszlo Anka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+"""
+This module implements the checkpointing of the operators. A checkpoint consists of the
+state of the operator and of the read offsets of its input ports, which are captured
+together on the operator's thread after an _on_running, hence they are consistent i.e.,
+the state reflects exactly the records before the offsets. The checkpoints are persisted
+by a background thread, so the processing is not blocked by the store.
+
+At restart, the state is restored and the input ports are positioned to the offsets of the
+checkpoint. The offsets committed by the channels after every iteration may be ahead of the
+checkpoint, in this case the records in between are read again, but they are applied to the
+restored state, hence they are not counted twice. The operator shall implement:
+
+    def get_checkpoint_state(self) -> dict:
+        return {"receivedRecordCount": self.received_record_count}
+
+    def restore_checkpoint_state(self, state: dict) -> None:
+        self.received_record_count = state["receivedRecordCount"]
+
+The offsets are only checkpointed, if the channel reader supports it (e.g., the Kafka
+readers in kafka_io.py), otherwise only the state is restored.
+"""
+
+import copy
+import functools
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Optional
+
+from pypz.core.commons.parameters import OptionalParameter
+from pypz.core.specs.plugin import ServicePlugin, ExtendedPlugin, InputPortPlugin
+from pypz.core.specs.utils import Internals
+
+from pypz.example.ports import resolve_class
+from pypz.example.sync import ReplicableEvent, ReplicableLock
+
+
+class CheckpointStore:
+    """
+    Interface of the checkpoint stores. Custom stores can be specified by the parameter
+    "storeType" of the CheckpointPlugin, they are created with the "storeLocation".
+
+    :param location: location of the checkpoints, the meaning depends on the implementation
+    """
+
+    def __init__(self, location: str):
+        self.location: str = location
+
+    def load(self, key: str) -> Optional[dict]:
+        """
+        :param key: key of the checkpoint, usually the full name of the operator
+        :return: the last saved checkpoint or None, if there is none
+        """
+        raise NotImplementedError()
+
+    def save(self, key: str, checkpoint: dict) -> None:
+        """
+        Saves the checkpoint, which replaces the previous one.
+        """
+        raise NotImplementedError()
+
+
+class FileCheckpointStore(CheckpointStore):
+    """
+    Stores the checkpoints as JSON files in the directory specified by the location. On
+    Kubernetes, the directory shall be on a volume, which survives the restart of the pod.
+    """
+
+    def _get_file_path(self, key: str) -> str:
+        return os.path.join(self.location, f"{key.replace(os.sep, '_')}.checkpoint.json")
+
+    def load(self, key: str) -> Optional[dict]:
+        try:
+            with open(self._get_file_path(key)) as checkpoint_file:
+                return json.load(checkpoint_file)
+        except FileNotFoundError:
+            return None
+
+    def save(self, key: str, checkpoint: dict) -> None:
+        os.makedirs(self.location, exist_ok=True)
+
+        # Written into a temporary file first, so a crash never leaves a partial checkpoint
+        file_descriptor, tmp_file_path = tempfile.mkstemp(dir=self.location)
+
+        try:
+            with os.fdopen(file_descriptor, "w") as tmp_file:
+                json.dump(checkpoint, tmp_file)
+                tmp_file.flush()
+                os.fsync(tmp_file.fileno())
+
+            os.replace(tmp_file_path, self._get_file_path(key))
+        except BaseException:
+            if os.path.exists(tmp_file_path):
+                os.remove(tmp_file_path)
+            raise
+
+
+class CheckpointPlugin(ServicePlugin, ExtendedPlugin):
+    """
+    This plugin checkpoints the state of the operator and the offsets of its input ports
+    periodically and restores them at the first _on_running after a restart. It is
+    disabled, until the parameter "storeLocation" is set. Each replica has its own
+    checkpoint, since the key is the full name of the operator:
+
+        self.checkpoint = CheckpointPlugin()
+
+    :param name: name of the instance, if not provided, it will be attempted to deduce from the variable's name
+    """
+
+    store_location = OptionalParameter(str, alt_name="storeLocation",
+                                       description="Location of the checkpoints e.g., directory for the "
+                                                   "FileCheckpointStore. None disables the checkpoints")
+    store_type = OptionalParameter(str, alt_name="storeType",
+                                   description="Class of the checkpoint store in 'module:class' format")
+    checkpoint_interval_sec = OptionalParameter(float, alt_name="checkpointIntervalSec",
+                                                description="Min time between two checkpoints")
+
+    def __init__(self, name: str = None, *args, **kwargs):
+        super().__init__(name, *args, **kwargs)
+
+        self.store_location = None
+        self.store_type = "pypz.example.checkpoint:FileCheckpointStore"
+        self.checkpoint_interval_sec = 5.0
+
+        self._store: Optional[CheckpointStore] = None
+
+        self._input_ports: list[InputPortPlugin] = []
+
+        self._restored: bool = False
+
+        self._sequence: int = 0
+        """
+        Sequence number of the last captured checkpoint, continued from the restored one
+        """
+
+        self._next_checkpoint_time: float = 0
+
+        self._pending_checkpoint: Optional[dict] = None
+        """
+        Last captured checkpoint, which is not yet saved. Only the latest is kept, since
+        it supersedes the previous ones.
+        """
+
+        self._pending_lock: ReplicableLock = ReplicableLock()
+
+        self._checkpoint_requested: threading.Event = ReplicableEvent()
+
+        self._writer_stopped: threading.Event = ReplicableEvent()
+
+        self._writer_thread: Optional[threading.Thread] = None
+
+    def is_enabled(self) -> bool:
+        return self.store_location is not None
+
+    def _get_key(self) -> str:
+        return self.get_context().get_full_name()
+
+    # --------------------------
+    # Capture and restore
+    # --------------------------
+
+    def _capture_checkpoint(self) -> None:
+        """
+        Captures the state and the offsets on the operator's thread, since neither the
+        operator nor the channels are thread-safe.
+        """
+
+        operator = self.get_context()
+
+        offsets = {}
+        for input_port in self._input_ports:
+            # Offsets are only available, if the channel supports it (e.g., Kafka)
+            channel_reader = getattr(input_port, "_channel_reader", None)
+
+            if hasattr(channel_reader, "get_checkpoint_offsets"):
+                offsets[input_port.get_simple_name()] = channel_reader.get_checkpoint_offsets()
+
+        self._sequence += 1
+
+        checkpoint = {
+            "sequence": self._sequence,
+            "timestamp": time.time(),
+            "state": copy.deepcopy(operator.get_checkpoint_state())
+            if hasattr(operator, "get_checkpoint_state") else {},
+            "offsets": offsets,
+        }
+
+        with self._pending_lock:
+            self._pending_checkpoint = checkpoint
+
+        self._checkpoint_requested.set()
+
+        self._next_checkpoint_time = time.monotonic() + self.checkpoint_interval_sec
+
+    def _restore_checkpoint(self) -> None:
+        self._restored = True
+
+        checkpoint = self._store.load(self._get_key())
+
+        if checkpoint is None:
+            self.get_logger().debug("No checkpoint found")
+            return
+
+        # The ports are positioned first, so the state is not restored, if it fails
+        for input_port in self._input_ports:
+            offsets = checkpoint["offsets"].get(input_port.get_simple_name())
+            channel_reader = getattr(input_port, "_channel_reader", None)
+
+            if (offsets is not None) and hasattr(channel_reader, "seek_to_checkpoint_offsets"):
+                channel_reader.seek_to_checkpoint_offsets(offsets)
+
+        operator = self.get_context()
+
+        if hasattr(operator, "restore_checkpoint_state"):
+            operator.restore_checkpoint_state(checkpoint["state"])
+
+        self._sequence = checkpoint["sequence"]
+
+        self.get_logger().info(f"Checkpoint #{checkpoint['sequence']} restored; Offsets: {checkpoint['offsets']}")
+
+    # --------------------------
+    # Persistence
+    # --------------------------
+
+    def _save_pending_checkpoint(self) -> None:
+        with self._pending_lock:
+            checkpoint, self._pending_checkpoint = self._pending_checkpoint, None
+
+        if checkpoint is None:
+            return
+
+        try:
+            self._store.save(self._get_key(), checkpoint)
+        except Exception as e:
+            # The next checkpoint supersedes this one, hence the processing can continue
+            self.get_logger().warning(f"Failed to save checkpoint #{checkpoint['sequence']}: {e}")
+
+    def _write_loop(self) -> None:
+        while True:
+            self._checkpoint_requested.wait()
+            self._checkpoint_requested.clear()
+
+            self._save_pending_checkpoint()
+
+            if self._writer_stopped.is_set():
+                return
+
+    # --------------------------
+    # Plugin lifecycle
+    # --------------------------
+
+    def _pre_execution(self) -> None:
+        if (not self.is_enabled()) or (self._store is not None):
+            return
+
+        self._store = resolve_class(self.store_type)(self.store_location)
+
+        self._input_ports = [plugin for plugin in Internals(self.get_context()).nested_instances.values()
+                             if isinstance(plugin, InputPortPlugin)]
+
+        operator = self.get_context()
+        original_running = operator._on_running
+        original_shutdown = operator._on_shutdown
+
+        # functools.wraps preserves the annotations, which are used by the executor to check the return type
+        @functools.wraps(original_running)
+        def checkpointed_running():
+            # The restore happens here, since the ports are opened and their offsets are loaded at this point
+            if not self._restored:
+                self._restore_checkpoint()
+
+            result = original_running()
+
+            # Not reached, if the _on_running raised, since the state may be inconsistent then
+            if self._next_checkpoint_time <= time.monotonic():
+                self._capture_checkpoint()
+
+            return result
+
+        @functools.wraps(original_shutdown)
+        def checkpointed_shutdown():
+            finished = original_shutdown()
+
+            if finished and self._restored:
+                self._capture_checkpoint()
+
+            return finished
+
+        operator._on_running = checkpointed_running
+        operator._on_shutdown = checkpointed_shutdown
+
+    def _post_execution(self) -> None:
+        pass
+
+    def _on_service_start(self) -> bool:
+        if self.is_enabled():
+            self._writer_stopped.clear()
+            self._writer_thread = threading.Thread(target=self._write_loop, name="checkpoint-writer", daemon=True)
+            self._writer_thread.start()
+
+        return True
+
+    def _on_service_shutdown(self) -> bool:
+        if self._writer_thread is not None:
+            # The writer saves the pending checkpoint before it stops
+            self._writer_stopped.set()
+            self._checkpoint_requested.set()
+            self._writer_thread.join()
+            self._writer_thread = None
+
+        return True
+
+    def _on_interrupt(self, system_signal: int = None) -> None:
+        pass
+
+    def _on_error(self, source: Any, exception: Exception) -> None:
+        pass
@@ -0,0 +1,223 @@
+# =============================================================================
+# Copyright (c) 2024 by Laszlo Anka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+import argparse
+import io
+import json
+import random
+import time
+import tracemalloc
+from typing import Any, Callable, Optional
+
+from avro.io import BinaryDecoder, BinaryEncoder
+
+from pypz.example.records import DictRecordType, RecordTypes, to_dicts
+from pypz.example.schemas import CompiledSchema, get_demo_record_schema, schema_registry
+
+"""
+This example compares the generic Avro encoding and decoding, as done by the Kafka
+channels of pypz (DatumWriter/DatumReader with an encoder/decoder per record), with the
+codec generated for the schema. It measures a small record (the DemoRecord) and a wide
+record with fields of every supported type and verifies that both paths produce the
+same bytes and the same records. For the wide record, the decoding of a projection i.e.,
+of three fields only, is measured as well. The decoding into rows and into a ColumnBatch
+(see records.py) is measured together with the memory retained per decoded record.
+
+    python -m pypz.example.codec_benchmark --record-count 10000 --output results.json
+"""
+
+WideRecordSchema = schema_registry.register(json.dumps({
+    "type": "record",
+    "name": "WideRecord",
+    "fields": [
+        *[{"name": f"long_{index}", "type": "long"} for index in range(8)],
+        *[{"name": f"double_{index}", "type": "double"} for index in range(8)],
+        *[{"name": f"text_{index}", "type": "string"} for index in range(8)],
+        {"name": "optional_text", "type": ["null", "string"]},
+        {"name": "flag", "type": "boolean"},
+        {"name": "level", "type": {"type": "enum", "name": "Level", "symbols": ["LOW", "MEDIUM", "HIGH"]}},
+        {"name": "values", "type": {"type": "array", "items": "long"}},
+        {"name": "tags", "type": {"type": "map", "values": "string"}},
+        {"name": "position", "type": {
+            "type": "record",
+            "name": "Position",
+            "fields": [{"name": "x", "type": "double"}, {"name": "y", "type": "double"}],
+        }},
+    ],
+}))
+"""
+Schema of the wide record with 30 fields
+"""
+
+WideRecordProjection = ["long_0", "text_0", "level"]
+"""
+Fields of the wide record decoded by the projected decoder
+"""
+
+
+def create_records(compiled_schema: CompiledSchema, record_count: int) -> list[dict]:
+    generator = random.Random(0)
+
+    if compiled_schema is get_demo_record_schema():
+        return [{"text": f"HelloWorld_{index}"} for index in range(record_count)]
+
+    return [{
+        **{f"long_{field_index}": generator.randint(-1 << 40, 1 << 40) for field_index in range(8)},
+        **{f"double_{field_index}": generator.random() for field_index in range(8)},
+        **{f"text_{field_index}": f"text_{index}_{field_index}" for field_index in range(8)},
+        "optional_text": None if 0 == index % 2 else f"optional_{index}",
+        "flag": 0 == index % 3,
+        "level": ("LOW", "MEDIUM", "HIGH")[index % 3],
+        "values": list(range(index % 10)),
+        "tags": {"source": "benchmark", "index": str(index)},
+        "position": {"x": generator.random(), "y": generator.random()},
+    } for index in range(record_count)]
+
+
+def measure_min_time_sec(function: Callable[[], Any], repeat_count: int) -> float:
+    elapsed_times = []
+
+    for _ in range(repeat_count):
+        start_time = time.perf_counter()
+        function()
+        elapsed_times.append(time.perf_counter() - start_time)
+
+    return min(elapsed_times)
+
+
+def measure_retained_bytes(function: Callable[[], Any]) -> int:
+    """
+    :return: the size of the memory allocated by the function and still referenced by its result
+    """
+
+    tracemalloc.start()
+
+    try:
+        start_size = tracemalloc.get_traced_memory()[0]
+        result = function()
+        retained_size = tracemalloc.get_traced_memory()[0] - start_size
+    finally:
+        tracemalloc.stop()
+
+    del result
+
+    return retained_size
+
+
+def run_benchmark(schema_name: str, compiled_schema: CompiledSchema, record_count: int, repeat_count: int,
+                  projected_field_names: Optional[list[str]] = None) -> dict:
+    records = create_records(compiled_schema, record_count)
+
+    datum_writer = compiled_schema.datum_writer
+    datum_reader = compiled_schema.datum_reader
+
+    def generic_encode() -> list[bytes]:
+        values = []
+        for record in records:
+            record_bytes = io.BytesIO()
+            datum_writer.write(record, BinaryEncoder(record_bytes))
+            values.append(record_bytes.getvalue())
+        return values
+
+    encoded_values = generic_encode()
+
+    def generic_decode() -> list[Any]:
+        return [datum_reader.read(BinaryDecoder(io.BytesIO(value))) for value in encoded_values]
+
+    start_time = time.perf_counter()
+    codec = compiled_schema.get_codec()
+    generation_time_sec = time.perf_counter() - start_time
+
+    if codec.encode_batch(records) != encoded_values:
+        raise AssertionError(f"[{schema_name}] The generated encoder differs from the DatumWriter")
+
+    if codec.decode_batch(encoded_values) != generic_decode():
+        raise AssertionError(f"[{schema_name}] The generated decoder differs from the DatumReader")
+
+    projected_codec = None if projected_field_names is None else compiled_schema.get_codec(projected_field_names)
+
+    if (projected_codec is not None) and (projected_codec.decode_batch(encoded_values) != [
+        {field_name: record[field_name] for field_name in projected_codec.projected_field_names}
+        for record in generic_decode()
+    ]):
+        raise AssertionError(f"[{schema_name}] The projected decoder differs from the DatumReader")
+
+    results = {
+        "schema": schema_name,
+        "recordCount": record_count,
+        "encodedSizeBytes": sum(map(len, encoded_values)),
+        "generationTimeMs": generation_time_sec * 1000,
+        "paths": {},
+    }
+
+    paths = {
+        "generic-encode": generic_encode,
+        "generated-encode": lambda: codec.encode_batch(records),
+        "generic-decode": generic_decode,
+        "generated-decode": lambda: codec.decode_batch(encoded_values),
+    }
+
+    if projected_codec is not None:
+        paths["projected-decode"] = lambda: projected_codec.decode_batch(encoded_values)
+
+    record_type_codecs = {
+        record_type: compiled_schema.get_codec(record_type=record_type) for record_type in RecordTypes
+    }
+
+    for record_type, record_type_codec in record_type_codecs.items():
+        if to_dicts(record_type_codec.decode_batch(encoded_values)) != generic_decode():
+            raise AssertionError(f"[{schema_name}] The {record_type} decoder differs from the DatumReader")
+
+        if DictRecordType != record_type:
+            paths[f"{record_type}-decode"] = lambda decode=record_type_codec.decode_batch: decode(encoded_values)
+
+    results["retainedBytesPerRecord"] = {
+        record_type: measure_retained_bytes(lambda: record_type_codec.decode_batch(encoded_values)) / record_count
+        for record_type, record_type_codec in record_type_codecs.items()
+    }
+
+    for path_name, path in paths.items():
+        results["paths"][path_name] = {
+            "recordsPerSec": record_count / measure_min_time_sec(path, repeat_count),
+        }
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compares the generic and the generated Avro codec")
+    parser.add_argument("--record-count", type=int, default=10000)
+    parser.add_argument("--repeat-count", type=int, default=5)
+    parser.add_argument("--output", help="Path of a JSON file to store the results e.g., for regression checks")
+    arguments = parser.parse_args()
+
+    benchmark_results = [
+        run_benchmark("small", get_demo_record_schema(), arguments.record_count, arguments.repeat_count),
+        run_benchmark("wide", WideRecordSchema, arguments.record_count, arguments.repeat_count,
+                      WideRecordProjection),
+    ]
+
+    for result in benchmark_results:
+        print(f"Schema: {result['schema']}; Records: {result['recordCount']}; "
+              f"Encoded: {result['encodedSizeBytes'] / 1024:.1f} KiB; "
+              f"Generation: {result['generationTimeMs']:.2f} ms")
+        for path_name, path_result in result["paths"].items():
+            print(f"  {path_name}: {path_result['recordsPerSec']:,.0f} records/s")
+        for record_type, retained_bytes in result["retainedBytesPerRecord"].items():
+            print(f"  {record_type}: {retained_bytes:,.0f} bytes/record")
+
+    if arguments.output is not None:
+        with open(arguments.output, "w") as output_file:
+            json.dump(benchmark_results, output_file, indent=2)
@@ -0,0 +1,70 @@
+# =============================================================================
+# Copyright (c) 2024 by Laszlo Anka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+import json
+from operator import itemgetter
+from typing import Any
+
+from pypz.example.records import ColumnBatch, is_row
+
+# NumPy is optional (pip install pypz-example-project[columnar]). If not available,
+# the columns will be plain lists, which still spares the per-record processing loop.
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def is_numpy_available() -> bool:
+    return numpy is not None
+
+
+def retrieve_field_names(avro_schema: str) -> list[str]:
+    """
+    Retrieves the field names of an Avro record schema in declaration order.
+
+    :param avro_schema: Avro record schema as JSON string
+    :return: list of field names
+    """
+
+    return [field["name"] for field in json.loads(avro_schema)["fields"]]
+
+
+def to_columns(records: Any, field_names: list[str]) -> dict[str, Any]:
+    """
+    Converts a batch of records (dicts or rows) into a column set, where each
+    field is represented by one array. If NumPy is available, the columns are
+    NumPy arrays, otherwise lists. The columns of a ColumnBatch are taken as
+    they are, so no per-record iteration is necessary.
+
+    :param records: batch of records as retrieved from the input port
+    :param field_names: name of the fields to convert into columns
+    :return: dict, where key is the field name and value is the column
+    """
+
+    columns = {}
+
+    for field_name in field_names:
+        if isinstance(records, ColumnBatch):
+            column = records.columns[field_name]
+        else:
+            # Rows are tuples, hence their fields are accessed by index
+            key = records[0]._fields.index(field_name) if (0 < len(records)) and is_row(records[0]) else field_name
+            # map() with itemgetter runs the iteration in C instead of a Python level loop
+            column = list(map(itemgetter(key), records))
+
+        columns[field_name] = column if numpy is None else numpy.asarray(column)
+
+    return columns
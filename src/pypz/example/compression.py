@@ -0,0 +1,418 @@
+# =============================================================================
+# Copyright (c) 2024 by Laszlo Anka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+"""
+This module implements the batch compression of the output ports. The compression is
+specified by the port parameter "compression":
+
+- "none": no compression, which is the default
+- "gzip", "lz4" or "zstd", optionally with level e.g., "zstd:9" (levels are not supported
+  by the Kafka producer, hence the Kafka ports use the default levels)
+- "adaptive": the codec (and level) is selected by the CompressionSelector. It estimates the
+  compression ratio and the encoding cost of the candidates by sampling the batches, and
+  selects the candidate, which maximizes the effective throughput i.e., the raw bytes per
+  second, if the batch is compressed and then transferred with the network bandwidth
+  specified by the port parameter "networkBandwidthMbps". Slow networks favor the stronger
+  codecs, fast networks the cheaper ones or no compression at all.
+
+The Kafka ports use the compression of the Kafka producer, which compresses the batches
+of records sent to the brokers, hence the consumers decompress them transparently. The
+frame based RMQ ports compress the frames i.e., one batch per message, with a header,
+which identifies the codec and holds the size of the frame, so the readers can decompress
+any frame and can tell it apart from a plain message starting with the same bytes.
+"""
+
+import itertools
+import struct
+import time
+import zlib
+from typing import Any, Callable, Optional
+
+# LZ4 and Zstandard are optional (pip install pypz-example-project[compression]). If not
+# available, the codecs are not offered, while gzip (zlib) is always available. Notice that
+# the readers shall have the libraries of the codecs used by the writers.
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+AdaptiveCompression = "adaptive"
+
+CompressedPayloadMagic = b"PZC"
+
+CompressedPayloadHeader = struct.Struct("<3sBI")
+"""
+Header of the compressed payloads: magic, codec id and size of the uncompressed payload
+"""
+
+
+class CompressionCodec:
+    """
+    :param name: name of the codec as used by the "compression" parameter
+    :param codec_id: id of the codec in the header of the compressed payloads
+    :param compress: function(data, level) -> compressed data
+    :param decompress: function(compressed data) -> data
+    :param default_level: level used, if not specified. It is the level of the Kafka producer
+    :param decompress_errors: exceptions raised by the decompression, if the data is corrupt
+    """
+
+    def __init__(self, name: str, codec_id: int, compress: Callable[[bytes, Optional[int]], bytes],
+                 decompress: Callable[[bytes], bytes], default_level: Optional[int] = None,
+                 decompress_errors: tuple[type[Exception], ...] = ()):
+        self.name: str = name
+        self.codec_id: int = codec_id
+        self.compress: Callable[[bytes, Optional[int]], bytes] = compress
+        self.decompress: Callable[[bytes], bytes] = decompress
+        self.default_level: Optional[int] = default_level
+        self.decompress_errors: tuple[type[Exception], ...] = decompress_errors
+
+
+def _create_codecs() -> dict[str, CompressionCodec]:
+    codecs = [
+        CompressionCodec("none", 0, lambda data, level: data, lambda data: data),
+        CompressionCodec("gzip", 1, lambda data, level: zlib.compress(data, level), zlib.decompress, 9,
+                         (zlib.error,)),
+    ]
+
+    if lz4_frame is not None:
+        codecs.append(CompressionCodec("lz4", 2, lambda data, level: lz4_frame.compress(data, level or 0),
+                                       lz4_frame.decompress, 0, (RuntimeError,)))
+
+    if zstandard is not None:
+        codecs.append(CompressionCodec("zstd", 3, lambda data, level: zstandard.compress(data, level),
+                                       zstandard.decompress, 3, (zstandard.ZstdError,)))
+
+    return {codec.name: codec for codec in codecs}
+
+
+Codecs: dict[str, CompressionCodec] = _create_codecs()
+"""
+Available codecs by name
+"""
+
+CodecsById: dict[int, CompressionCodec] = {codec.codec_id: codec for codec in Codecs.values()}
+
+DefaultCandidates = ["none", "gzip:1", "gzip:6", "lz4", "zstd:1", "zstd:3", "zstd:9"]
+"""
+Candidates of the adaptive compression, the unavailable codecs are skipped
+"""
+
+
+def parse_compression(compression: str) -> tuple[CompressionCodec, Optional[int]]:
+    """
+    :param compression: codec name with optional level e.g., "zstd" or "zstd:9"
+    :return: the codec and the level, the latter is the default level of the codec, if not specified
+    """
+
+    codec_name, _, level = compression.partition(":")
+
+    if codec_name not in Codecs:
+        raise ValueError(f"Compression not available: {codec_name}; Available: {sorted(Codecs)}")
+
+    codec = Codecs[codec_name]
+
+    return codec, int(level) if level else codec.default_level
+
+
+def compress_payload(data: bytes, compression: str) -> bytes:
+    """
+    Compresses the payload and prepends the header of the codec. If the compression does not
+    reduce the size, the payload is returned uncompressed i.e., without header.
+    """
+
+    codec, level = parse_compression(compression)
+
+    if 0 == codec.codec_id:
+        return data
+
+    return _pack_payload(codec, data, codec.compress(data, level))
+
+
+def _pack_payload(codec: CompressionCodec, data: bytes, compressed: bytes) -> bytes:
+    if (0 == codec.codec_id) or (len(data) <= CompressedPayloadHeader.size + len(compressed)):
+        return data
+
+    return CompressedPayloadHeader.pack(CompressedPayloadMagic, codec.codec_id, len(data)) + compressed
+
+
+def is_compressed(data: bytes | bytearray | memoryview) -> bool:
+    """
+    :return: True, if the data starts with the header of the compressed payloads. Notice that
+             an uncompressed payload can start with the same bytes, which is detected only by
+             decompress_payload().
+    """
+
+    return (CompressedPayloadHeader.size <= len(data)) and \
+        (CompressedPayloadMagic == bytes(data[:len(CompressedPayloadMagic)]))
+
+
+def decompress_payload(data: bytes | bytearray | memoryview) -> bytes | bytearray | memoryview:
+    """
+    :return: the decompressed payload or the payload as is, if it is not compressed
+    :raises ValueError: if the payload has the header, but it cannot be decompressed by
+                        it i.e., it is corrupt or it is an uncompressed payload starting
+                        with the same bytes as the header
+    """
+
+    if not is_compressed(data):
+        return data
+
+    _, codec_id, size = CompressedPayloadHeader.unpack_from(data)
+
+    if codec_id not in CodecsById:
+        raise ValueError(f"Payload compressed by an unavailable codec: {codec_id}")
+
+    codec = CodecsById[codec_id]
+
+    try:
+        decompressed = codec.decompress(bytes(data[CompressedPayloadHeader.size:]))
+    except codec.decompress_errors as e:
+        raise ValueError(f"Payload cannot be decompressed by {codec.name}: {e}") from e
+
+    if size != len(decompressed):
+        raise ValueError(f"Size of the decompressed payload differs from the header: {len(decompressed)} != {size}")
+
+    return decompressed
+
+
+class CandidateStatistics:
+    """
+    Estimations of a candidate, which are exponential moving averages of the samples, so
+    they follow the changes of the data.
+    """
+
+    SmoothingFactor = 0.3
+
+    def __init__(self):
+        self.sample_count: int = 0
+
+        self.compressed_fraction: float = 1.0
+        """
+        Compressed size / raw size
+        """
+
+        self.encode_sec_per_byte: float = 0.0
+
+    def add_sample(self, raw_size: int, compressed_size: int, encode_time_sec: float) -> None:
+        compressed_fraction = compressed_size / raw_size
+        encode_sec_per_byte = encode_time_sec / raw_size
+
+        if 0 == self.sample_count:
+            self.compressed_fraction = compressed_fraction
+            self.encode_sec_per_byte = encode_sec_per_byte
+        else:
+            factor = CandidateStatistics.SmoothingFactor
+            self.compressed_fraction += factor * (compressed_fraction - self.compressed_fraction)
+            self.encode_sec_per_byte += factor * (encode_sec_per_byte - self.encode_sec_per_byte)
+
+        self.sample_count += 1
+
+    def get_effective_bytes_per_sec(self, bandwidth_bytes_per_sec: float) -> float:
+        """
+        :return: raw bytes per second, if the data is compressed and then transferred
+        """
+
+        return 1 / (self.encode_sec_per_byte + self.compressed_fraction / bandwidth_bytes_per_sec)
+
+
+class CompressionSelector:
+    """
+    Selects the compression of the batches. In fixed mode, it always selects the specified
+    compression. In adaptive mode, it samples the candidates and selects the one with the
+    highest effective throughput:
+
+    - the selected candidate is measured by every batch it compresses
+    - first, every candidate is sampled once, one per batch
+    - then, every "sample_interval"-th batch is compressed by the next candidate as well
+      (round robin) to follow the changes of the data, which costs an additional compression
+    - a new candidate is selected only, if it is better by more than the switch threshold,
+      so the selection does not flap between similar candidates
+
+    :param compression: "none", codec name with optional level or "adaptive"
+    :param bandwidth_mbps: network bandwidth in megabits per second
+    :param candidates: candidates of the adaptive mode, the unavailable codecs are skipped
+    :param sample_interval: every n-th batch is sampled by a candidate other than the selected
+    """
+
+    SwitchThreshold = 1.05
+
+    def __init__(self, compression: str, bandwidth_mbps: float = 1000.0,
+                 candidates: Optional[list[str]] = None, sample_interval: int = 20):
+        self.adaptive: bool = AdaptiveCompression == compression
+
+        if self.adaptive:
+            candidates = [candidate for candidate in (candidates or DefaultCandidates)
+                          if candidate.partition(":")[0] in Codecs]
+        else:
+            candidates = [compression]
+
+        for candidate in candidates:
+            parse_compression(candidate)
+
+        if 0 >= bandwidth_mbps:
+            raise ValueError(f"Invalid network bandwidth: {bandwidth_mbps}")
+
+        self.candidates: list[str] = candidates
+
+        self.bandwidth_bytes_per_sec: float = bandwidth_mbps * 1_000_000 / 8
+
+        self.sample_interval: int = sample_interval
+
+        self.selected: str = candidates[0]
+
+        self._statistics: dict[str, CandidateStatistics] = {candidate: CandidateStatistics()
+                                                            for candidate in candidates}
+
+        self._sampled_candidates = itertools.cycle(candidates)
+
+        self._batch_count: int = 0
+
+        self._raw_size: int = 0
+
+        self._compressed_size: int = 0
+
+        self._compression_time_sec: float = 0
+        """
+        Total time spent with compression, including the samples
+        """
+
+    def _measure(self, candidate: str, data: bytes) -> bytes:
+        codec, level = parse_compression(candidate)
+
+        start_time = time.perf_counter()
+        compressed = codec.compress(data, level)
+        encode_time_sec = time.perf_counter() - start_time
+
+        self._compression_time_sec += encode_time_sec
+
+        if self.adaptive:
+            self._statistics[candidate].add_sample(len(data), len(compressed), encode_time_sec)
+
+        return compressed
+
+    def _get_next_sampled_candidate(self) -> Optional[str]:
+        """
+        :return: the candidate to be sampled by the current batch, None if no sampling is due
+        """
+
+        unsampled = next((candidate for candidate, statistics in self._statistics.items()
+                          if 0 == statistics.sample_count), None)
+
+        if unsampled is not None:
+            return unsampled
+
+        if 0 != self._batch_count % self.sample_interval:
+            return None
+
+        candidate = next(self._sampled_candidates)
+
+        return next(self._sampled_candidates) if candidate == self.selected else candidate
+
+    def _update_selection(self) -> None:
+        def get_effective_bytes_per_sec(candidate: str) -> float:
+            return self._statistics[candidate].get_effective_bytes_per_sec(self.bandwidth_bytes_per_sec)
+
+        best = max((candidate for candidate, statistics in self._statistics.items() if 0 < statistics.sample_count),
+                   key=get_effective_bytes_per_sec)
+
+        if (0 == self._statistics[self.selected].sample_count) or \
+                (get_effective_bytes_per_sec(self.selected) * CompressionSelector.SwitchThreshold <
+                 get_effective_bytes_per_sec(best)):
+            self.selected = best
+
+    def sample(self, data: bytes) -> None:
+        """
+        Samples the data without compressing it, if sampling is due. It shall be called with
+        every batch, if the compression itself is performed by other means (e.g., by the
+        Kafka producer), in this case the selected candidate is sampled as well.
+        """
+
+        self._batch_count += 1
+
+        if (not self.adaptive) or (0 == len(data)):
+            return
+
+        candidate = self._get_next_sampled_candidate()
+
+        if candidate is not None:
+            self._measure(candidate, data)
+
+            if (candidate != self.selected) and (0 == self._batch_count % self.sample_interval):
+                self._measure(self.selected, data)
+
+            self._update_selection()
+
+    def compress(self, data: bytes) -> bytes:
+        """
+        Compresses the data by the selected candidate, and by another candidate, if sampling
+        is due. The result is the payload with header, see compress_payload().
+        """
+
+        self._batch_count += 1
+
+        if 0 == len(data):
+            return data
+
+        codec, _ = parse_compression(self.selected)
+
+        compressed = self._measure(self.selected, data)
+
+        if self.adaptive:
+            candidate = self._get_next_sampled_candidate()
+
+            if candidate is not None:
+                self._measure(candidate, data)
+
+            self._update_selection()
+
+        payload = _pack_payload(codec, data, compressed)
+
+        self._raw_size += len(data)
+        self._compressed_size += len(payload)
+
+        return payload
+
+    def get_statistics(self) -> dict[str, Any]:
+        """
+        :return: the statistics of the compression, which are exposed in the health check
+                 payload of the channels, hence they are visible in the sniffer
+        """
+
+        statistics = {
+            "compression": self.selected,
+            "compressionRatio": (self._raw_size / self._compressed_size) if 0 < self._compressed_size else None,
+            "compressionTimeSec": self._compression_time_sec,
+        }
+
+        if self.adaptive:
+            statistics["compressionCandidates"] = {
+                candidate: {
+                    "ratio": 1 / candidate_statistics.compressed_fraction,
+                    "encodeMBps": (1 / candidate_statistics.encode_sec_per_byte / 1_000_000)
+                    if 0 < candidate_statistics.encode_sec_per_byte else None,
+                    "effectiveMBps": candidate_statistics.get_effective_bytes_per_sec(
+                        self.bandwidth_bytes_per_sec) / 1_000_000,
+                    "sampleCount": candidate_statistics.sample_count,
+                }
+                for candidate, candidate_statistics in self._statistics.items()
+                if 0 < candidate_statistics.sample_count
+            }
+
+        return statistics
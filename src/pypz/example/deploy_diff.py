@@ -0,0 +1,55 @@
+# =============================================================================
+# Copyright (c) 2024 by Laszlo Anka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+import sys
+
+from pypz.example.deployers import DiffKubernetesDeployer
+from pypz.example.k8s_pipeline import KubernetesRMQDemoPipeline
+
+"""
+This example shows, how to deploy and redeploy a pipeline with many replicas by the
+DiffKubernetesDeployer. Only the changed resources are touched and the API calls are
+executed concurrently. By default, it deploys onto the cluster of the current kube config,
+provide "--fake" to run against the in-memory fake API of the tests with simulated latency
+(the fake is not part of the package, hence it requires running from the repository root).
+"""
+
+if __name__ == "__main__":
+    pipeline = KubernetesRMQDemoPipeline("pipeline")
+
+    pipeline.set_parameter(">>channelLocation", "RABBITMQ_BROKER_URL")
+    pipeline.writer.set_parameter("recordCount", 30)
+
+    if "--fake" in sys.argv:
+        from test.fake_k8s import FakeCoreV1Api
+
+        fake_api = FakeCoreV1Api(latency_sec=0.05)
+        deployer = DiffKubernetesDeployer(namespace="NAMESPACE", max_workers=16, core_v1_api=fake_api,
+                                          poll_interval_sec=0.01)
+    else:
+        deployer = DiffKubernetesDeployer(namespace="NAMESPACE", max_workers=16)
+
+    """ First deployment, all the pods and the secret are created """
+    print(deployer.deploy_diff(pipeline))
+
+    """ Changing a parameter of the writer, hence only the writer pods and the secret
+        will be replaced, the 51 reader pods remain untouched """
+    pipeline.writer.set_parameter("recordCount", 60)
+    print(deployer.deploy_diff(pipeline))
+
+    """ Nothing changed, nothing to do """
+    print(deployer.deploy_diff(pipeline))
+
+    deployer.destroy(pipeline.get_full_name())
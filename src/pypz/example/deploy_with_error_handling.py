@@ -19,8 +19,8 @@ from datetime import datetime
 
 from pypz.core.specs.operator import Operator
 from pypz.deployers.base import DeploymentState
-from pypz.deployers.k8s import KubernetesDeployer
 
+from pypz.example.deployers import DiffKubernetesDeployer
 from pypz.example.pipeline import DemoPipeline
 
 """
@@ -51,8 +51,8 @@ if __name__ == "__main__":
     """ The KubernetesDeployer is an implementation of the Deployer interface, which
         allows the deployment of entire pipelines on Kubernetes. For each operator a
         Pod will be created and executed. The pipeline configuration is stored as
-        secret. """
-    deployer = KubernetesDeployer(namespace="NAMESPACE")
+        secret. The DiffKubernetesDeployer extends it by an event driven attach(). """
+    deployer = DiffKubernetesDeployer(namespace="NAMESPACE")
 
     """ Deploy only, if it is not yet deployed """
     if not deployer.is_deployed(pipeline.get_full_name()):
@@ -62,27 +62,32 @@ if __name__ == "__main__":
         """
         This method will be called for every state change for every
         operator in the pipeline. In case of operator error, it will
-        persist the logs and attempts to restart the operator.
+        persist the logs. The callbacks are executed by a worker pool,
+        hence a slow log retrieval does not delay the other operators.
         """
 
         if DeploymentState.Failed == state:
             try:
                 print("Error")
-                logs = deployer.retrieve_operator_logs(operator.get_full_name())
 
-                """ Name of the log file is set to the operator name and the current datetime """
-                with open(operator.get_full_name() + "_" + datetime.now().strftime("%Y%m%d_%H%M%S"), "w") as f:
-                    f.write(logs)
+                """ Name of the log file is set to the operator name and the current datetime. The log
+                    is streamed into the compressed file chunk by chunk i.e., it is not held in the
+                    memory. Use save_operator_group_logs() to save the logs of all replicas. """
+                deployer.save_operator_logs(
+                    operator.get_full_name(),
+                    operator.get_full_name() + "_" + datetime.now().strftime("%Y%m%d_%H%M%S") + ".log.gz"
+                )
             except:
                 """ Do nothing, just print exception, hence the operator can be restarted 
                     even, if there is an error in log retrieval or persistence"""
                 traceback.print_exc(file=sys.stderr)
 
-            deployer.restart_operator(operator.get_full_name())
-
     """ Attach to the deployed pipeline, which blocks the execution until the
-        pipeline is finished i.e., all operators are finished in the pipeline. """
-    deployer.attach(pipeline.get_full_name(), on_operator_state_change=state_monitor)
+        pipeline is finished i.e., all operators are finished in the pipeline.
+        Failed operators are restarted with backoff, after their callbacks
+        have been executed i.e., after the logs have been persisted. """
+    deployer.attach(pipeline.get_full_name(), on_operator_state_change=state_monitor,
+                    restart_on_failure=True, max_restart_count=3)
 
     """ Destroy all pipeline related resources on Kubernetes """
     deployer.destroy(pipeline.get_full_name())
@@ -0,0 +1,804 @@
+# =============================================================================
+# Copyright (c) 2024 by Laszlo Anka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+import base64
+import collections
+import concurrent.futures
+import functools
+import gzip
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+import traceback
+from typing import Any, Callable, Iterator, Optional
+
+from kubernetes.client import ApiException, Configuration, CoreV1Api, V1ObjectMeta, V1Pod, V1Secret, V1SecretList
+from kubernetes.watch import Watch
+from pypz.core.commons.loggers import ContextLogger
+from pypz.core.specs.operator import Operator
+from pypz.core.specs.pipeline import Pipeline
+from pypz.core.specs.utils import Internals
+from pypz.deployers.base import DeploymentState
+from pypz.deployers.k8s import DeploymentException, KubernetesDeployer
+from pypz.executors.commons import ExecutionMode
+from pypz.operators.k8s import KubernetesOperator
+from pypz.utils.k8s import (
+    label_key_exec_mode,
+    label_key_instance_type,
+    label_key_part_of,
+    label_value_pipeline,
+    pipeline_config_secret_key,
+    sanitize,
+)
+
+from pypz.example.specs import load_pipeline
+
+annotation_key_spec_hash = "pypz.io/spec-hash"
+"""
+Hash of the pod manifest and the operator configuration the pod has been created with
+"""
+
+
+def interpret_pod_state(pod: Optional[V1Pod]) -> DeploymentState:
+    """
+    Interprets the pod the same way as KubernetesDeployer.retrieve_operator_state(),
+    but without retrieving it i.e., it can be used on pods received from watch events.
+    """
+
+    if pod is None:
+        return DeploymentState.NotExisting
+
+    if (pod.status is None) or (pod.status.phase is None):
+        return DeploymentState.Unknown
+
+    if "Succeeded" == pod.status.phase:
+        return DeploymentState.Completed
+
+    if "Failed" == pod.status.phase:
+        return DeploymentState.Failed
+
+    if "Pending" == pod.status.phase:
+        return DeploymentState.Open
+
+    if "Running" != pod.status.phase:
+        return DeploymentState.Unknown
+
+    if pod.status.container_statuses is None:
+        return DeploymentState.Unknown
+
+    # Unhealthy state can be identified only, if the startup and readiness probes are set
+    container_spec = next((container for container in pod.spec.containers
+                           if container.name == pod.metadata.name), None)
+    container_status = next((status for status in pod.status.container_statuses
+                             if status.name == pod.metadata.name), None)
+
+    if (container_spec is not None) and (container_status is not None) and \
+            (container_spec.readiness_probe is not None) and (container_spec.startup_probe is not None) and \
+            container_status.started and not container_status.ready:
+        return DeploymentState.Unhealthy
+
+    return DeploymentState.Running
+
+
+class KeySerialExecutor:
+    """
+    Executes the submitted tasks on a thread pool, where the tasks with the same key
+    are executed sequentially in the order of their submission, while tasks with
+    different keys are executed concurrently. This allows e.g., to handle the state
+    changes of an operator in order without delaying the handling of other operators.
+
+    :param max_workers: max number of concurrently executed tasks
+    :param logger: logger to report the errors of the tasks
+    """
+
+    def __init__(self, max_workers: int, logger: ContextLogger):
+        self._executor: concurrent.futures.ThreadPoolExecutor = \
+            concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="attach")
+
+        self._logger: ContextLogger = logger
+
+        self._pending_tasks: dict[str, collections.deque] = collections.defaultdict(collections.deque)
+
+        self._active_keys: set[str] = set()
+        """
+        Keys, whose tasks are currently executed by a worker
+        """
+
+        self._lock: threading.Lock = threading.Lock()
+
+    def submit(self, key: str, task: Callable[[], Any]) -> None:
+        with self._lock:
+            self._pending_tasks[key].append(task)
+
+            if key in self._active_keys:
+                return
+
+            self._active_keys.add(key)
+
+        self._executor.submit(self._execute_pending_tasks, key)
+
+    def _execute_pending_tasks(self, key: str) -> None:
+        while True:
+            with self._lock:
+                if 0 == len(self._pending_tasks[key]):
+                    self._active_keys.discard(key)
+                    return
+
+                task = self._pending_tasks[key].popleft()
+
+            try:
+                task()
+            except:  # noqa: E722
+                self._logger.error(f"[{key}] Task error:\n{traceback.format_exc()}")
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+
+class PodOperation:
+    """
+    Operation to be performed on a single pod to reach the desired state.
+    """
+
+    Create = "create"
+    Replace = "replace"
+    Patch = "patch"
+    Delete = "delete"
+
+
+class PodOperationResult:
+    def __init__(self, pod_name: str, operation: str):
+        self.pod_name: str = pod_name
+        self.operation: str = operation
+        self.elapsed_time_sec: float = 0
+        self.error: Optional[str] = None
+
+    def __repr__(self):
+        status = "OK" if self.error is None else f"ERROR: {self.error}"
+        return f"{self.pod_name}: {self.operation} ({self.elapsed_time_sec:.3f}s) {status}"
+
+
+class DeploymentDiff:
+    """
+    Difference between the desired pipeline and the deployed resources.
+
+    :param pod_operations: operation per pod name, unchanged pods are not included
+    :param pod_manifests: desired manifests of the pods, which shall be created, replaced or patched
+    :param unchanged_pod_names: pods, which are already in the desired state
+    :param secret: desired configuration secret, if it has to be (re)created, otherwise None
+    """
+
+    def __init__(self, pod_operations: dict[str, str], pod_manifests: dict[str, dict],
+                 unchanged_pod_names: list[str], secret: Optional[V1Secret]):
+        self.pod_operations: dict[str, str] = pod_operations
+        self.pod_manifests: dict[str, dict] = pod_manifests
+        self.unchanged_pod_names: list[str] = unchanged_pod_names
+        self.secret: Optional[V1Secret] = secret
+
+    def is_empty(self) -> bool:
+        return (0 == len(self.pod_operations)) and (self.secret is None)
+
+
+class DeploymentReport:
+    def __init__(self, diff: DeploymentDiff):
+        self.diff: DeploymentDiff = diff
+        self.secret_elapsed_time_sec: float = 0
+        self.total_elapsed_time_sec: float = 0
+        self.pod_results: list[PodOperationResult] = []
+
+    def failed_results(self) -> list[PodOperationResult]:
+        return [result for result in self.pod_results if result.error is not None]
+
+    def __repr__(self):
+        lines = [f"Pod operations: {len(self.pod_results)}; "
+                 f"Unchanged pods: {len(self.diff.unchanged_pod_names)}; "
+                 f"Secret replaced: {self.diff.secret is not None} ({self.secret_elapsed_time_sec:.3f}s); "
+                 f"Total: {self.total_elapsed_time_sec:.3f}s"]
+        lines.extend(f"  {result}" for result in sorted(self.pod_results, key=lambda result: result.pod_name))
+        return "\n".join(lines)
+
+
+class DiffDeploymentException(DeploymentException):
+    def __init__(self, message: str, report: DeploymentReport):
+        super().__init__(message)
+
+        self.report: DeploymentReport = report
+
+
+class DiffKubernetesDeployer(KubernetesDeployer):
+    """
+    This deployer extends the KubernetesDeployer by the deploy_diff() method, which
+    compares the desired pipeline with the resources already deployed and performs
+    only the necessary operations on them. The pod operations are executed concurrently
+    by a bounded worker pool, hence deploying and redeploying pipelines with many
+    replicas does not wait for the API calls one after the other. In addition, attach()
+    is driven by a watch stream instead of polling each operator and the operator logs
+    can be streamed into (compressed) files without holding them in the memory.
+
+    Notice that the spec of a running pod is immutable (except some fields like the
+    image), moreover the operators read their configuration only at startup, hence a
+    changed pod is deleted and created again. Pods with only changed labels are patched.
+    The configuration secret is immutable as well, so it is replaced, if changed.
+
+    :param max_workers: max number of concurrent API calls and state change callbacks
+    :param poll_interval_sec: time between two checks, while waiting for resource state changes
+    :param core_v1_api: if provided, it will be used instead of the one created from the
+        configuration e.g., to test against a fake API
+    """
+
+    def __init__(self, namespace: str = "default", configuration: Configuration = None,
+                 config_file: Any = None, verify_ssl: bool = True,
+                 mock_nonexistent_at_retrieval: bool = False,
+                 max_workers: int = 16, poll_interval_sec: float = 1,
+                 core_v1_api: Any = None):
+        if (core_v1_api is not None) and (configuration is None):
+            # Prevents loading the kube config, which might not exist
+            configuration = Configuration()
+
+        super().__init__(namespace, configuration, config_file, verify_ssl, mock_nonexistent_at_retrieval)
+
+        if core_v1_api is not None:
+            self._core_v1_api: CoreV1Api = core_v1_api
+
+        self._max_workers: int = max_workers
+
+        self._poll_interval_sec: float = poll_interval_sec
+
+    # ========================= diff ==========================
+
+    @staticmethod
+    def _calculate_hash(value: Any) -> str:
+        return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
+    @staticmethod
+    def _generate_secret_for(pipeline: Pipeline, execution_mode: ExecutionMode) -> V1Secret:
+        # Same secret as the one created by the KubernetesDeployer, since
+        # the other methods like restart_operator() depend on its content
+        secret_labels = {
+            sanitize(operator.get_full_name()): operator.get_simple_name()
+            for operator in Internals(pipeline).nested_instances.values()
+        }
+        secret_labels[label_key_instance_type] = label_value_pipeline
+        secret_labels[label_key_exec_mode] = execution_mode.value
+
+        return V1Secret(
+            api_version="v1",
+            kind="Secret",
+            metadata=V1ObjectMeta(name=pipeline.get_full_name(), labels=secret_labels),
+            data={pipeline_config_secret_key: base64.b64encode(pipeline.__str__().encode()).decode()},
+            type="Opaque",
+            immutable=True,
+        )
+
+    @staticmethod
+    def _generate_annotated_pod_manifest_for(operator: KubernetesOperator, execution_mode: ExecutionMode) -> dict:
+        manifest = KubernetesDeployer._generate_pod_manifest_for(operator, execution_mode)
+
+        # The operator's configuration is part of the secret and not the manifest,
+        # however a changed configuration requires the pod to be restarted as well
+        spec_hash = DiffKubernetesDeployer._calculate_hash([manifest["spec"], operator.__str__()])
+
+        manifest["metadata"]["annotations"] = {annotation_key_spec_hash: spec_hash}
+
+        return manifest
+
+    def compute_diff(self, pipeline: Pipeline, execution_mode: ExecutionMode = ExecutionMode.Standard,
+                     ignore_operators: list[Operator] = None) -> DeploymentDiff:
+        """
+        Compares the desired pipeline with the deployed resources without modifying them.
+        """
+
+        operators = Internals(pipeline).nested_instances.values()
+
+        if any(not isinstance(operator, KubernetesOperator) for operator in operators):
+            raise TypeError(f"[{pipeline.get_full_name()}] Only {KubernetesOperator} type can be deployed.")
+
+        desired_manifests: dict[str, dict] = {
+            sanitize(operator.get_full_name()): DiffKubernetesDeployer._generate_annotated_pod_manifest_for(
+                operator,
+                execution_mode if (ignore_operators is None) or (operator not in ignore_operators)
+                else ExecutionMode.Skip
+            )
+            for operator in operators
+        }
+
+        deployed_pods: dict[str, V1Pod] = {
+            pod.metadata.name: pod for pod in self._retrieve_operator_pods(pipeline.get_full_name())
+        }
+
+        pod_operations: dict[str, str] = {}
+        unchanged_pod_names: list[str] = []
+
+        for pod_name, manifest in desired_manifests.items():
+            if pod_name not in deployed_pods:
+                pod_operations[pod_name] = PodOperation.Create
+                continue
+
+            deployed_metadata = deployed_pods[pod_name].metadata
+            deployed_annotations = deployed_metadata.annotations or {}
+
+            if deployed_annotations.get(annotation_key_spec_hash) != \
+                    manifest["metadata"]["annotations"][annotation_key_spec_hash]:
+                pod_operations[pod_name] = PodOperation.Replace
+            elif (deployed_metadata.labels or {}) != (manifest["metadata"]["labels"] or {}):
+                pod_operations[pod_name] = PodOperation.Patch
+            else:
+                unchanged_pod_names.append(pod_name)
+
+        for pod_name in deployed_pods:
+            if pod_name not in desired_manifests:
+                pod_operations[pod_name] = PodOperation.Delete
+
+        desired_secret = DiffKubernetesDeployer._generate_secret_for(pipeline, execution_mode)
+        deployed_secret = self._retrieve_config_secret(pipeline.get_full_name())
+
+        if (deployed_secret is not None) and \
+                (deployed_secret.data == desired_secret.data) and \
+                (deployed_secret.metadata.labels == desired_secret.metadata.labels):
+            desired_secret = None
+
+        return DeploymentDiff(
+            pod_operations,
+            {pod_name: desired_manifests[pod_name] for pod_name in pod_operations if pod_name in desired_manifests},
+            unchanged_pod_names,
+            desired_secret
+        )
+
+    # ========================= deployment ==========================
+
+    def _wait_for_pod_deletion(self, pod_name: str) -> None:
+        while self._retrieve_operator_pod(pod_name) is not None:
+            time.sleep(self._poll_interval_sec)
+
+    def _execute_pod_operation(self, pod_name: str, operation: str, manifest: Optional[dict],
+                               wait: bool) -> PodOperationResult:
+        result = PodOperationResult(pod_name, operation)
+        start_time = time.perf_counter()
+
+        try:
+            if PodOperation.Patch == operation:
+                self._core_v1_api.patch_namespaced_pod(
+                    pod_name, self._namespace, body={"metadata": {"labels": manifest["metadata"]["labels"]}}
+                )
+
+            if operation in (PodOperation.Replace, PodOperation.Delete):
+                self._core_v1_api.delete_namespaced_pod(name=pod_name, namespace=self._namespace)
+
+                # A pod with the same name can be created only after the old one is deleted
+                if wait or (PodOperation.Replace == operation):
+                    self._wait_for_pod_deletion(pod_name)
+
+            if operation in (PodOperation.Create, PodOperation.Replace):
+                self._core_v1_api.create_namespaced_pod(self._namespace, body=manifest)
+
+                while wait and (DeploymentState.NotExisting == self.retrieve_operator_state(pod_name)):
+                    time.sleep(self._poll_interval_sec)
+        except ApiException as e:
+            result.error = f"Status: {e.status}; Reason: {e.reason}"
+        except Exception as e:
+            result.error = repr(e)
+
+        result.elapsed_time_sec = time.perf_counter() - start_time
+
+        return result
+
+    def _replace_config_secret(self, pipeline_name: str, secret: V1Secret, wait: bool) -> None:
+        if self._retrieve_config_secret(pipeline_name) is not None:
+            self._core_v1_api.delete_namespaced_secret(pipeline_name, self._namespace)
+
+            while self._retrieve_config_secret(pipeline_name) is not None:
+                time.sleep(self._poll_interval_sec)
+
+        secret.metadata.namespace = self._namespace
+        self._core_v1_api.create_namespaced_secret(self._namespace, secret)
+
+        # Configuration must be already there before Operator deployment
+        while wait and (self._retrieve_config_secret(pipeline_name) is None):
+            time.sleep(self._poll_interval_sec)
+
+    def deploy_diff(self, pipeline: Pipeline, execution_mode: ExecutionMode = ExecutionMode.Standard,
+                    ignore_operators: list[Operator] = None, wait: bool = True) -> DeploymentReport:
+        """
+        Deploys the pipeline by creating, replacing, patching or deleting only the pods and
+        the secret that differ from the desired state. Unlike deploy(), it can be called on
+        an already deployed pipeline e.g., after changing a parameter. There is no rollback
+        in case of errors, since the previous state is not known entirely, however calling
+        it again performs only the remaining operations.
+
+        :param pipeline: pipeline to be deployed
+        :param execution_mode: execution mode of the operators
+        :param ignore_operators: operators to be deployed with ExecutionMode.Skip
+        :param wait: if True, waits until the created pods exist and the deleted ones are gone
+        :return: the report with the timing of each operation
+        :raises DiffDeploymentException: if any of the operations failed, the report is attached
+        """
+
+        start_time = time.perf_counter()
+
+        diff = self.compute_diff(pipeline, execution_mode, ignore_operators)
+        report = DeploymentReport(diff)
+
+        if diff.secret is not None:
+            secret_start_time = time.perf_counter()
+            self._replace_config_secret(pipeline.get_full_name(), diff.secret, wait)
+            report.secret_elapsed_time_sec = time.perf_counter() - secret_start_time
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self._max_workers,
+                                                   thread_name_prefix="deployer") as executor:
+            futures = [
+                executor.submit(self._execute_pod_operation, pod_name, operation,
+                                diff.pod_manifests.get(pod_name), wait)
+                for pod_name, operation in diff.pod_operations.items()
+            ]
+
+            for future in concurrent.futures.as_completed(futures):
+                report.pod_results.append(future.result())
+
+        report.total_elapsed_time_sec = time.perf_counter() - start_time
+
+        failed_results = report.failed_results()
+
+        if 0 < len(failed_results):
+            raise DiffDeploymentException(
+                f"[{pipeline.get_full_name()}] Failed operations: {len(failed_results)}; "
+                f"Retry deploy_diff() to perform the remaining operations", report
+            )
+
+        return report
+
+    def _retrieve_deployed_pipeline_from_secret(self, secret: V1Secret) -> Optional[Pipeline]:
+        if pipeline_config_secret_key not in secret.data:
+            raise DeploymentException("Provided secret is not pipeline configuration secret")
+
+        # The same configuration is retrieved by many methods e.g., restart_operator(), hence
+        # the parsed spec is cached. Notice that every call still gets its own pipeline instance.
+        return load_pipeline(base64.b64decode(secret.data[pipeline_config_secret_key]),
+                             mock_nonexistent=self._mock_nonexistent_at_retrieval)
+
+    # ========================= attach ==========================
+
+    def _retrieve_pod_states(self, pipeline_name: str) -> tuple[dict[str, DeploymentState], Optional[str]]:
+        pod_list = self._core_v1_api.list_namespaced_pod(
+            self._namespace, label_selector=f"{label_key_part_of}={pipeline_name}"
+        )
+
+        return ({pod.metadata.name: interpret_pod_state(pod) for pod in pod_list.items},
+                pod_list.metadata.resource_version if pod_list.metadata is not None else None)
+
+    def attach(self, pipeline_name: str,
+               on_operator_state_change: Callable[[Operator, DeploymentState], None] = None,
+               restart_on_failure: bool = False, max_restart_count: Optional[int] = None,
+               restart_backoff_sec: float = 1, max_restart_backoff_sec: float = 60,
+               watch_timeout_sec: int = 60) -> None:
+        """
+        Same as Deployer.attach(), but the state changes are received from a single watch
+        stream over all pods of the pipeline, which is resumed from the last seen resource
+        version and resynchronized by listing the pods, if the version expired. The callbacks
+        are executed by a worker pool in the order of the state changes per operator, hence
+        a slow callback of an operator does not delay the handling of the others.
+
+        If restart_on_failure is set, the failed operators are restarted with exponential
+        backoff. A restart is performed after the pending callbacks of the operator e.g.,
+        after its logs have been saved, and multiple failures are coalesced into a single
+        restart, while one is already scheduled.
+
+        :param pipeline_name: name of the deployed pipeline entity
+        :param on_operator_state_change: callback to hook into state changes
+        :param restart_on_failure: if True, failed operators are restarted
+        :param max_restart_count: max number of restarts per operator, None means unlimited
+        :param restart_backoff_sec: delay of the first restart, doubled by each subsequent one
+        :param max_restart_backoff_sec: max delay of the restarts
+        :param watch_timeout_sec: max duration of a watch request, before it is resumed
+        """
+
+        pipeline: Pipeline = self.retrieve_deployed_pipeline(pipeline_name)
+
+        operators: dict[str, Operator] = {
+            sanitize(operator.get_full_name()): operator
+            for operator in Internals(pipeline).nested_instances.values()
+        }
+
+        operator_states: dict[str, DeploymentState] = {
+            pod_name: DeploymentState.Unknown for pod_name in operators
+        }
+
+        restart_counts: dict[str, int] = collections.defaultdict(int)
+
+        restart_due_times: dict[str, float] = {}
+        """
+        Scheduled restarts, which are not yet submitted
+        """
+
+        submitted_restarts: set[str] = set()
+        """
+        Restarts submitted to the executor, whose new pod has not yet been observed
+        """
+
+        restart_lock = threading.Lock()
+
+        executor = KeySerialExecutor(self._max_workers, self._logger)
+
+        def restart(pod_name: str) -> None:
+            try:
+                self.restart_operator(operators[pod_name].get_full_name())
+            except:  # noqa: E722
+                with restart_lock:
+                    submitted_restarts.discard(pod_name)
+                raise
+
+        def schedule_restart(pod_name: str) -> None:
+            with restart_lock:
+                if (pod_name in restart_due_times) or (pod_name in submitted_restarts):
+                    return
+
+            if (max_restart_count is not None) and (max_restart_count <= restart_counts[pod_name]):
+                self._logger.error(f"[{pod_name}] Max restart count reached: {max_restart_count}")
+                return
+
+            delay_sec = min(restart_backoff_sec * (2 ** restart_counts[pod_name]), max_restart_backoff_sec)
+            restart_counts[pod_name] += 1
+            restart_due_times[pod_name] = time.monotonic() + delay_sec
+
+            self._logger.debug(f"[{pod_name}] Restart scheduled in {delay_sec}s")
+
+        def submit_due_restarts() -> None:
+            now = time.monotonic()
+
+            for pod_name, due_time in list(restart_due_times.items()):
+                if due_time <= now:
+                    with restart_lock:
+                        del restart_due_times[pod_name]
+                        submitted_restarts.add(pod_name)
+
+                    executor.submit(pod_name, functools.partial(restart, pod_name))
+
+        def update_state(pod_name: str, state: DeploymentState) -> None:
+            if (pod_name not in operators) or (state == operator_states[pod_name]):
+                return
+
+            # The restart is considered finished, once the new pod has been observed,
+            # otherwise the pipeline could be considered finished in the meantime
+            if DeploymentState.Open == state:
+                with restart_lock:
+                    submitted_restarts.discard(pod_name)
+
+            operator_states[pod_name] = state
+
+            if on_operator_state_change is not None:
+                executor.submit(pod_name, functools.partial(on_operator_state_change, operators[pod_name], state))
+
+            if restart_on_failure and (DeploymentState.Failed == state):
+                schedule_restart(pod_name)
+
+        def synchronize() -> Optional[str]:
+            pod_states, list_resource_version = self._retrieve_pod_states(pipeline_name)
+
+            for pod_name in operators:
+                update_state(pod_name, pod_states.get(pod_name, DeploymentState.NotExisting))
+
+            return list_resource_version
+
+        def is_restart_due() -> bool:
+            return any(due_time <= time.monotonic() for due_time in restart_due_times.values())
+
+        def is_finished() -> bool:
+            with restart_lock:
+                if (0 < len(restart_due_times)) or (0 < len(submitted_restarts)):
+                    return False
+
+            return not any(
+                (DeploymentState.Open == state) or (DeploymentState.Running == state)
+                for state in operator_states.values()
+            )
+
+        try:
+            resource_version = synchronize()
+            watch = Watch()
+
+            while not is_finished():
+                submit_due_restarts()
+
+                timeout_sec = watch_timeout_sec
+                if 0 < len(restart_due_times):
+                    next_due_sec = min(restart_due_times.values()) - time.monotonic()
+                    timeout_sec = max(1, min(watch_timeout_sec, math.ceil(next_due_sec)))
+
+                try:
+                    events = watch.stream(self._core_v1_api.list_namespaced_pod, self._namespace,
+                                          label_selector=f"{label_key_part_of}={pipeline_name}",
+                                          resource_version=resource_version,
+                                          timeout_seconds=timeout_sec)
+
+                    try:
+                        for event in events:
+                            if event["type"] not in ("ADDED", "MODIFIED", "DELETED"):
+                                continue
+
+                            pod: V1Pod = event["object"]
+
+                            update_state(pod.metadata.name,
+                                         DeploymentState.NotExisting if "DELETED" == event["type"]
+                                         else interpret_pod_state(pod))
+
+                            if is_restart_due() or is_finished():
+                                break
+                    finally:
+                        # Closing the stream closes its HTTP response, even if the loop was left early
+                        watch.stop()
+                        events.close()
+
+                    if watch.resource_version is not None:
+                        resource_version = watch.resource_version
+                except ApiException as e:
+                    # The resource version is too old, the current state needs to be retrieved again
+                    if 410 != e.status:
+                        raise
+
+                    self._logger.debug(f"Watch expired, resynchronizing: {e.reason}")
+                    resource_version = synchronize()
+        finally:
+            executor.shutdown(wait=True)
+
+    # ========================= logs ==========================
+
+    def stream_operator_logs(self, operator_full_name: str, offset: int = 0, chunk_size: int = 65536,
+                             **kwargs) -> Optional[Iterator[bytes]]:
+        """
+        Streams the logs of the operator in chunks instead of retrieving it as one string.
+
+        :param operator_full_name: full name of the operator
+        :param offset: number of bytes to be skipped from the beginning of the requested log, which
+            allows to resume an interrupted retrieval. Notice that the bytes are skipped on client
+            side, use since_seconds or since_time to reduce the transferred data
+        :param chunk_size: max size of the yielded chunks
+        :param kwargs: arguments of CoreV1Api.read_namespaced_pod_log() e.g., since_seconds, follow
+        :return: iterator of the log chunks or None, if the operator does not exist
+        """
+
+        try:
+            response = self._core_v1_api.read_namespaced_pod_log(
+                name=sanitize(operator_full_name),
+                namespace=self._namespace,
+                _preload_content=False,
+                **kwargs,
+            )
+        except ApiException as e:
+            if 404 == e.status:
+                return None
+            raise
+
+        def generate_chunks() -> Iterator[bytes]:
+            remaining_offset = offset
+
+            try:
+                for chunk in response.stream(chunk_size, decode_content=True):
+                    if remaining_offset < len(chunk):
+                        yield chunk[remaining_offset:]
+                        remaining_offset = 0
+                    else:
+                        remaining_offset -= len(chunk)
+            finally:
+                response.close()
+                response.release_conn()
+
+        return generate_chunks()
+
+    def save_operator_logs(self, operator_full_name: str, file_path: str, compress: bool = True,
+                           resume: bool = True, chunk_size: int = 65536, **kwargs) -> Optional[int]:
+        """
+        Writes the logs of the operator into the file chunk by chunk, optionally gzip compressed.
+        The number of bytes written from the log of the current pod is stored in the file
+        "<file_path>.progress", which allows to resume the retrieval e.g., after an interruption
+        or to append only the new part of the log in the next call. If the operator has been
+        restarted since the last call, the file is overwritten by the log of the new pod. The
+        progress is only stored, if the log has been written successfully.
+
+        :param operator_full_name: full name of the operator
+        :param file_path: path of the target file
+        :param compress: if True, the file is gzip compressed
+        :param resume: if False, the file is overwritten, otherwise the log is appended from the
+            stored offset
+        :param chunk_size: max size of the chunks held in the memory
+        :param kwargs: arguments of CoreV1Api.read_namespaced_pod_log() e.g., since_seconds, follow
+        :return: the number of bytes written or None, if the operator does not exist
+        """
+
+        pod = self._retrieve_operator_pod(operator_full_name)
+
+        if pod is None:
+            return None
+
+        progress_file_path = file_path + ".progress"
+        offset = 0
+        append = False
+
+        if resume and os.path.exists(progress_file_path):
+            with open(progress_file_path) as progress_file:
+                progress = json.load(progress_file)
+
+            # Logs of a restarted operator's new pod start from the beginning, hence the
+            # log of the previous pod is not continued
+            if progress["podUid"] == pod.metadata.uid:
+                offset = progress["offset"]
+                append = True
+
+        chunks = self.stream_operator_logs(operator_full_name, offset, chunk_size, **kwargs)
+
+        if chunks is None:
+            return None
+
+        written_byte_count = 0
+        mode = "ab" if append else "wb"
+
+        # Notice that appending to a gzip file creates a new gzip member, which is
+        # still a valid gzip file i.e., it can be read as a whole
+        with (gzip.open(file_path, mode) if compress else open(file_path, mode)) as log_file:
+            for chunk in chunks:
+                log_file.write(chunk)
+                written_byte_count += len(chunk)
+
+        with open(progress_file_path, "w") as progress_file:
+            json.dump({"podUid": pod.metadata.uid, "offset": offset + written_byte_count}, progress_file)
+
+        return written_byte_count
+
+    def _retrieve_operator_group(self, operator_full_name: str) -> list[Operator]:
+        operator_pod_name = sanitize(operator_full_name)
+
+        # Same lookup as in restart_operator()
+        secret_list: V1SecretList = self._core_v1_api.list_namespaced_secret(
+            self._namespace, label_selector=operator_pod_name
+        )
+
+        if 1 != len(secret_list.items):
+            raise DeploymentException(
+                f"No unique pipeline configuration found for operator: {operator_full_name}"
+            )
+
+        secret: V1Secret = secret_list.items[0]
+        deployed_operators = Internals(self._retrieve_deployed_pipeline_from_secret(secret)).nested_instances
+        operator = deployed_operators[secret.metadata.labels[operator_pod_name]]
+
+        return [deployed_operator for deployed_operator in deployed_operators.values()
+                if deployed_operator.get_group_name() == operator.get_group_name()]
+
+    def save_operator_group_logs(self, operator_full_name: str, directory_path: str, compress: bool = True,
+                                 resume: bool = True, **kwargs) -> dict[str, Optional[int]]:
+        """
+        Same as save_operator_logs(), but for the operator and all of its replicas concurrently.
+        The logs are written into the directory, the files are named after the operators.
+
+        :return: the number of bytes written per operator full name
+        """
+
+        os.makedirs(directory_path, exist_ok=True)
+
+        operators = self._retrieve_operator_group(operator_full_name)
+        extension = ".log.gz" if compress else ".log"
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self._max_workers,
+                                                   thread_name_prefix="logs") as executor:
+            futures = {
+                operator.get_full_name(): executor.submit(
+                    self.save_operator_logs, operator.get_full_name(),
+                    os.path.join(directory_path, operator.get_full_name() + extension), compress, resume, **kwargs
+                )
+                for operator in operators
+            }
+
+        return {operator_name: future.result() for operator_name, future in futures.items()}
@@ -13,18 +13,21 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 # =============================================================================
-from pypz.core.specs.pipeline import Pipeline
 from pypz.executors.pipeline.executor import PipelineExecutor
 
+from pypz.example.specs import load_pipeline
+
 """
 This example shows, how to create a Pipeline instance object from a configuration
 stored in a yaml file and, how to execute it locally with the PipelineExecutor.
 Note that you should use PipelineExecutor for testing and not for productive workload.
+The load_pipeline() accepts the configuration in the compact format as well, which
+is significantly faster to load for large pipelines, see pypz.example.specs.
 """
 
 if __name__ == "__main__":
     with open('../../../pipeline.yml') as yml_file:
-        pipeline = Pipeline.create_from_string(yml_file.read())
+        pipeline = load_pipeline(yml_file.read())
 
     """ Note that you will not be able to execute this pipeline until 
         you did not modify the parameters in the YAML file. You need 
@@ -0,0 +1,175 @@
+# =============================================================================
+# Copyright (c) 2024 by Laszlo Anka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+"""
+This module implements a binary frame, which packs a batch of binary records into a
+single buffer, so the batch can be sent as one message. The frame layout is:
+
+    | magic (4 bytes) | record count n (uint32) | n end offsets (uint32) | payload |
+
+All integers are little endian. The end offset of a record is relative to the start of
+the payload, so the record i is payload[offsets[i - 1]:offsets[i]].
+"""
+
+import array
+import bisect
+import itertools
+import struct
+import sys
+from typing import Iterator
+
+FrameMagic = b"PZF1"
+
+FrameHeader = struct.Struct("<4sI")
+
+OffsetItemSize = 4
+
+LastOffset = struct.Struct("<I")
+
+
+def pack_frame(records: list[bytes | bytearray | memoryview | str]) -> bytes:
+    """
+    Packs the records into a frame. Strings are encoded as UTF-8. Notice that memoryviews
+    shall have byte format i.e., len() shall return their size in bytes.
+
+    :param records: records to be packed
+    :return: the frame
+    :raises ValueError: if the size of the payload exceeds the range of the offsets (4 GiB)
+    """
+
+    records = [record.encode() if isinstance(record, str) else record for record in records]
+
+    end_offsets = list(itertools.accumulate(map(len, records)))
+
+    # Checked upfront, since the array would raise an OverflowError without the size
+    if (0 < len(end_offsets)) and (0xFFFFFFFF < end_offsets[-1]):
+        raise ValueError(f"Frame payload exceeds the max size: {end_offsets[-1]}")
+
+    offsets = array.array("I", end_offsets)
+
+    if "big" == sys.byteorder:
+        offsets.byteswap()
+
+    # Notice that the records are copied only once here into the frame
+    return b"".join([FrameHeader.pack(FrameMagic, len(records)), offsets.tobytes(), *records])
+
+
+def is_frame(buffer: bytes | bytearray | memoryview) -> bool:
+    """
+    :return: True, if the buffer is a frame. Besides the magic, the size of the buffer is
+             checked against the record count and the last offset, so a message, which only
+             starts with the same bytes as the magic, is not considered as frame.
+    """
+
+    if (len(buffer) < FrameHeader.size) or (FrameMagic != bytes(buffer[:len(FrameMagic)])):
+        return False
+
+    _, record_count = FrameHeader.unpack_from(buffer)
+
+    offsets_end = FrameHeader.size + record_count * OffsetItemSize
+
+    if len(buffer) < offsets_end:
+        return False
+
+    payload_size = LastOffset.unpack_from(buffer, offsets_end - OffsetItemSize)[0] if 0 < record_count else 0
+
+    return offsets_end + payload_size == len(buffer)
+
+
+class RecordFrame:
+    """
+    Read-only sequence view of the records in a frame. The records are returned as
+    memoryview slices of the frame's buffer i.e., there is no copy and no object
+    creation per record, until the record is accessed. Use bytes(record) or
+    record.tobytes(), if the record shall outlive the frame or shall be used as key.
+
+    :param buffer: the frame created by pack_frame()
+    """
+
+    def __init__(self, buffer: bytes | bytearray | memoryview):
+        if not is_frame(buffer):
+            raise ValueError("Invalid frame, magic not found")
+
+        self._buffer: memoryview = memoryview(buffer).cast("B")
+
+        _, self._record_count = FrameHeader.unpack_from(self._buffer)
+
+        offsets_end = FrameHeader.size + self._record_count * OffsetItemSize
+
+        if "little" == sys.byteorder:
+            self._offsets: memoryview | array.array = self._buffer[FrameHeader.size:offsets_end].cast("I")
+        else:
+            self._offsets = array.array("I", self._buffer[FrameHeader.size:offsets_end])
+            self._offsets.byteswap()
+
+        self._payload: memoryview = self._buffer[offsets_end:]
+
+    def __len__(self) -> int:
+        return self._record_count
+
+    def __getitem__(self, index: int) -> memoryview:
+        if index < 0:
+            index += self._record_count
+
+        if not (0 <= index < self._record_count):
+            raise IndexError(f"Record index out of range: {index}")
+
+        start = self._offsets[index - 1] if 0 < index else 0
+
+        return self._payload[start:self._offsets[index]]
+
+    def __iter__(self) -> Iterator[memoryview]:
+        start = 0
+        for end in self._offsets:
+            yield self._payload[start:end]
+            start = end
+
+    def get_payload_size(self) -> int:
+        return len(self._payload)
+
+
+class RecordFrameBatch:
+    """
+    Read-only sequence view of the records of multiple frames, so the frames received in
+    one poll can be returned as one list-like object.
+
+    :param frames: the frames
+    """
+
+    def __init__(self, frames: list[RecordFrame]):
+        self.frames: list[RecordFrame] = frames
+
+        self._end_indices: list[int] = list(itertools.accumulate(len(frame) for frame in frames))
+        """
+        Cumulated record count of the frames to locate the frame of a record
+        """
+
+    def __len__(self) -> int:
+        return self._end_indices[-1] if 0 < len(self._end_indices) else 0
+
+    def __getitem__(self, index: int) -> memoryview:
+        if index < 0:
+            index += len(self)
+
+        if not (0 <= index < len(self)):
+            raise IndexError(f"Record index out of range: {index}")
+
+        frame_index = bisect.bisect_right(self._end_indices, index)
+        frame_start_index = self._end_indices[frame_index - 1] if 0 < frame_index else 0
+
+        return self.frames[frame_index][index - frame_start_index]
+
+    def __iter__(self) -> Iterator[memoryview]:
+        return itertools.chain.from_iterable(self.frames)
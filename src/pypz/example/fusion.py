@@ -0,0 +1,227 @@
+# =============================================================================
+# Copyright (c) 2024 by Laszlo Anka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+import argparse
+import concurrent.futures
+import signal
+import sys
+from typing import Optional
+
+from pypz.abstracts.channel_ports import ChannelInputPort, ChannelOutputPort
+from pypz.core.specs.operator import Operator
+from pypz.core.specs.pipeline import Pipeline
+from pypz.core.specs.plugin import PortPlugin
+from pypz.core.specs.utils import Internals
+from pypz.executors.commons import ExecutionMode
+from pypz.executors.operator.executor import OperatorExecutor
+from pypz.executors.pipeline.executor import PipelineExecutor
+
+from pypz.example.memory_io import MemoryChannelReader, MemoryChannelWriter
+
+"""
+This module implements the fusion of connected operators. The operators of a fused group
+are executed in the same process, hence the ports connecting them are switched to memory
+channels i.e., the batches sent by the output port are handed over to the input port by
+reference without serialization and broker. The connections to operators outside of the
+group remain unchanged. Neither the operators nor their ports need to be changed, the
+pipeline only marks the operators, which can be fused:
+
+    mark_fusable(pipeline, pipeline.writer, pipeline.reader)
+
+The fusion is applied by the FusedPipelineExecutor or, if only a group shall be executed
+e.g., in a single pod, by the FusedGroupExecutor:
+
+    python -m pypz.example.fusion pipeline.yml writer reader
+
+Notice that the fused operators shall not be replicated, since the replicas of a fused
+group are not executed in the same process.
+"""
+
+FusedOperatorsParameterName = "fusedOperators"
+"""
+Name of the pipeline parameter, which stores the fusable groups as lists of operator names
+"""
+
+FusedChannelLocation = "fused"
+"""
+Location of the memory channels of the fused connections
+"""
+
+
+def mark_fusable(pipeline: Pipeline, *operators: Operator) -> None:
+    """
+    Marks the operators as group, which can be executed in the same process. The groups are
+    stored as pipeline parameter, hence they are part of the pipeline configuration.
+
+    :param pipeline: pipeline of the operators
+    :param operators: operators to be fused
+    """
+
+    fused_groups = get_fused_groups(pipeline)
+    fused_groups.append([operator.get_simple_name() for operator in operators])
+
+    pipeline.set_parameter(FusedOperatorsParameterName, fused_groups)
+
+
+def get_fused_groups(pipeline: Pipeline) -> list[list[str]]:
+    """
+    :return: the operator names of the marked groups
+    """
+
+    if not pipeline.has_parameter(FusedOperatorsParameterName):
+        return []
+
+    return [list(operator_names) for operator_names in pipeline.get_parameter(FusedOperatorsParameterName)]
+
+
+def _is_fused_connection(port: PortPlugin, operator_names: set[str]) -> bool:
+    """
+    :return: True, if every connection of the port is inside the group, False if none is
+    """
+
+    connected_operator_names = {connected_port.get_context().get_simple_name()
+                                for connected_port in port.get_connected_ports()}
+
+    if (0 == len(connected_operator_names)) or connected_operator_names.isdisjoint(operator_names):
+        return False
+
+    if not connected_operator_names.issubset(operator_names):
+        raise ValueError(f"[{port.get_full_name()}] Port is connected inside and outside of the fused group, "
+                         f"which is not supported: {sorted(connected_operator_names)}")
+
+    return True
+
+
+def apply_fusion(pipeline: Pipeline, operator_names: list[str]) -> list[PortPlugin]:
+    """
+    Switches the ports connecting the specified operators to memory channels. It shall be
+    called before the execution, since the ports create their channels at execution.
+
+    :param pipeline: pipeline of the operators
+    :param operator_names: simple name of the operators to be fused
+    :return: the fused ports
+    """
+
+    operator_name_set = set(operator_names)
+    nested_instances = Internals(pipeline).nested_instances
+
+    fused_ports = []
+
+    for operator_name in operator_names:
+        operator: Operator = nested_instances[operator_name]
+
+        if 0 < len(operator.get_replicas()):
+            raise ValueError(f"[{operator.get_full_name()}] Replicated operators cannot be fused; "
+                             f"set the replicationFactor to 0")
+
+        for plugin in Internals(operator).nested_instances.values():
+            if isinstance(plugin, (ChannelInputPort, ChannelOutputPort)) and \
+                    _is_fused_connection(plugin, operator_name_set):
+                if isinstance(plugin, ChannelInputPort):
+                    plugin.channel_reader_type = MemoryChannelReader
+                else:
+                    plugin.channel_writer_type = MemoryChannelWriter
+
+                plugin.set_parameter("channelLocation", FusedChannelLocation)
+
+                fused_ports.append(plugin)
+
+    return fused_ports
+
+
+class FusedPipelineExecutor(PipelineExecutor):
+    """
+    PipelineExecutor, which fuses the marked groups of the pipeline before the execution.
+    """
+
+    def __init__(self, pipeline: Pipeline):
+        for operator_names in get_fused_groups(pipeline):
+            apply_fusion(pipeline, operator_names)
+
+        super().__init__(pipeline)
+
+
+class FusedGroupExecutor:
+    """
+    Executes a fused group of operators in the current process, one thread per operator.
+    It can be used as the entrypoint of a pod executing the entire group instead of a
+    single operator.
+
+    :param pipeline: pipeline of the operators
+    :param operator_names: simple name of the operators to be fused and executed
+    """
+
+    def __init__(self, pipeline: Pipeline, operator_names: list[str]):
+        self.pipeline: Pipeline = pipeline
+        self.operator_names: list[str] = operator_names
+
+        apply_fusion(pipeline, operator_names)
+
+        # The interrupts are handled on group level and forwarded to the operators
+        self._operator_executors: list[OperatorExecutor] = [
+            OperatorExecutor(Internals(pipeline).nested_instances[operator_name], handle_interrupts=False)
+            for operator_name in operator_names
+        ]
+
+    def interrupt(self, system_signal: int, frame=None) -> None:
+        for operator_executor in self._operator_executors:
+            if operator_executor.is_running():
+                operator_executor.interrupt(system_signal, frame)
+
+    def execute(self, exec_mode: ExecutionMode = ExecutionMode.Standard) -> int:
+        """
+        :return: the first non-zero exit code of the operators or 0
+        """
+
+        signal.signal(signal.SIGTERM, self.interrupt)
+        signal.signal(signal.SIGINT, self.interrupt)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(self._operator_executors),
+                                                   thread_name_prefix="fused") as executor:
+            futures = [executor.submit(operator_executor.execute, exec_mode)
+                       for operator_executor in self._operator_executors]
+
+            # Unlike busy waiting, this does not take the CPU from the operators
+            concurrent.futures.wait(futures)
+
+        exit_codes = [future.result() for future in futures]
+
+        return next((exit_code for exit_code in exit_codes if exit_code), 0)
+
+
+if __name__ == "__main__":
+    from pypz.core.specs.dtos import PipelineInstanceDTO
+
+    from pypz.example.specs import parse_spec
+
+    parser = argparse.ArgumentParser(description="Executes connected operators in the same process")
+    parser.add_argument("config_path", help="Path of the pipeline configuration (YAML or compact format)")
+    parser.add_argument("operator_names", nargs="*",
+                        help="Simple name of the operators to execute, default is the first marked group")
+    parser.add_argument("--exec-mode", default="Standard")
+    arguments = parser.parse_args()
+
+    with open(arguments.config_path) as config_file:
+        fused_pipeline = Pipeline.create_from_dto(PipelineInstanceDTO(**parse_spec(config_file.read())),
+                                                  mock_nonexistent=True)
+
+    group_operator_names: Optional[list[str]] = arguments.operator_names or next(
+        iter(get_fused_groups(fused_pipeline)), None
+    )
+
+    if not group_operator_names:
+        parser.error("No operators specified and no fusable group marked in the pipeline")
+
+    sys.exit(FusedGroupExecutor(fused_pipeline, group_operator_names).execute(ExecutionMode(arguments.exec_mode)))
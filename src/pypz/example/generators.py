@@ -0,0 +1,159 @@
+# =============================================================================
+# Copyright (c) 2024 by Laszlo Anka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+import inspect
+import time
+from typing import Any, Callable, Generator, Optional, Union
+
+from pypz.core.commons.parameters import OptionalParameter
+from pypz.core.specs.operator import Operator
+from pypz.core.specs.plugin import OutputPortPlugin
+from pypz.core.specs.utils import Internals
+
+from pypz.example.records import ColumnBatch, concatenate_batches
+
+
+class GeneratorOperator(Operator):
+    """
+    Base class of the operators, which implement the _on_running method as generator. Instead
+    of sending the records and returning after every record, the generator simply yields
+    the records, which are collected and sent to the output port, if either the specified
+    number of records are collected or the oldest collected record waits for the specified
+    time. This way, one call of _on_running processes many records, hence the records do
+    not pay the overhead of the executor's state machine one by one:
+
+        def _on_running(self):
+            for index in range(self.record_count):
+                yield {"text": f"HelloWorld_{index}"}
+
+    The generator can yield:
+
+    - a single record
+    - a list of records
+    - a ColumnBatch (see records.py), which is sent as ColumnBatch
+    - None, which signals that nothing to send for now, hence the collected records are
+      sent right away and the control is given back to the executor
+
+    The generator is created at the first call of _on_running and is continued by the
+    subsequent calls. Once it is exhausted, the remaining records are sent and its return
+    value is returned to the executor. As usual, None means that the framework decides,
+    whether to continue. If it continues, then the next call creates a new generator.
+
+    Notice that the time threshold is only checked, if the generator yields, hence
+    a generator blocking for a long time delays the sending of the collected records.
+    """
+
+    flush_record_count = OptionalParameter(int, alt_name="flushRecordCount",
+                                           description="Specifies the number of collected records, which are "
+                                                       "sent at once")
+    flush_interval_ms = OptionalParameter(int, alt_name="flushIntervalMs",
+                                          description="Specifies the max time the collected records are kept "
+                                                      "before sending")
+
+    def __init__(self, name: str = None, *args, **kwargs):
+        super().__init__(name, *args, **kwargs)
+
+        self.flush_record_count = 1000
+        self.flush_interval_ms = 100
+
+        self._record_generator: Optional[Generator] = None
+        """
+        Generator created by the _on_running implementation of the subclass
+        """
+
+        self._collected_records: Union[list[Any], ColumnBatch] = []
+
+        self._flush_deadline: float = 0
+        """
+        Time, when the oldest collected record shall be sent at latest
+        """
+
+        self._send_generated_records: Optional[Callable[[list[Any]], None]] = None
+        """
+        Send method of the output port. Notice that the port itself cannot be stored in an
+        attribute, since the Instance would register it as nested instance.
+        """
+
+        if inspect.isgeneratorfunction(type(self)._on_running):
+            # The executor calls the _on_running method, hence it is replaced by the drainer
+            self._on_running = self._drain_record_generator
+
+    def _get_generated_records_port(self) -> OutputPortPlugin:
+        """
+        :return: the port, where the generated records are sent to, by default the
+                 only output port of the operator
+        """
+
+        output_ports = [plugin for plugin in Internals(self).nested_instances.values()
+                        if isinstance(plugin, OutputPortPlugin)]
+
+        if 1 != len(output_ports):
+            raise AttributeError(f"Exactly one output port expected, found {len(output_ports)}; "
+                                 f"override _get_generated_records_port() to select one")
+
+        return output_ports[0]
+
+    def flush_generated_records(self) -> None:
+        """
+        Sends the collected records. It can be called explicitly as well e.g., at shutdown.
+        """
+
+        if 0 == len(self._collected_records):
+            return
+
+        # A new list is created, since the channel may keep the reference of the sent one
+        records_to_send, self._collected_records = self._collected_records, []
+
+        self._send_generated_records(records_to_send)
+
+    def _drain_record_generator(self) -> Optional[bool]:
+        if self._record_generator is None:
+            self._record_generator = type(self)._on_running(self)
+
+        if self._send_generated_records is None:
+            self._send_generated_records = self._get_generated_records_port().send
+
+        flush_interval_sec = self.flush_interval_ms / 1000
+
+        while True:
+            try:
+                generated = next(self._record_generator)
+            except StopIteration as stop:
+                self._record_generator = None
+                self.flush_generated_records()
+                return stop.value
+
+            if generated is None:
+                self.flush_generated_records()
+                return False
+
+            current_time = time.monotonic()
+
+            if 0 == len(self._collected_records):
+                self._flush_deadline = current_time + flush_interval_sec
+
+            if isinstance(generated, ColumnBatch) or isinstance(self._collected_records, ColumnBatch):
+                # Column batches are collected column-wise, unless they are mixed with other records
+                generated_batch = generated if isinstance(generated, (list, ColumnBatch)) else [generated]
+                self._collected_records = generated_batch if 0 == len(self._collected_records) else \
+                    concatenate_batches([self._collected_records, generated_batch])
+            elif isinstance(generated, list):
+                self._collected_records.extend(generated)
+            else:
+                self._collected_records.append(generated)
+
+            if (self.flush_record_count <= len(self._collected_records)) or (self._flush_deadline <= current_time):
+                self.flush_generated_records()
+                return False
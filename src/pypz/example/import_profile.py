@@ -0,0 +1,196 @@
+# =============================================================================
+# Copyright (c) 2024 by Laszlo Anka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+import argparse
+import json
+import re
+import subprocess
+import sys
+from typing import Optional
+
+"""
+This example measures, how much time the import of the specified modules or classes
+takes and which transport libraries are imported along. The imports are executed in
+a new interpreter with "-X importtime", so the already imported modules of the caller
+have no effect on the results:
+
+    python -m pypz.example.import_profile pypz.example.pipeline pypz.example.rmq_pipeline --top 10
+
+With --forbid-transports, the script fails, if any of the targets imports a transport
+library, so it can guard the lazy imports of the ports e.g., in CI:
+
+    python -m pypz.example.import_profile pypz.example.writer pypz.example.reader --separately --forbid-transports
+
+The classes can be specified in the same format as in the instance specs e.g.,
+"pypz.example.writer:DemoWriterOperator".
+"""
+
+TransportModulePrefixes = (
+    "kafka",
+    "amqp",
+    "avro",
+    "pypz.plugins.kafka_io",
+    "pypz.plugins.rmq_io",
+    "pypz.sniffer",
+    "tkinter",
+)
+"""
+Modules, which shall only be imported, if the transport or the tool is actually used
+"""
+
+StartupFinishedMarker = "-- startup finished --"
+"""
+Printed before the imports, so the modules imported at the interpreter startup can be excluded
+"""
+
+ImportTimeLinePattern = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$")
+
+
+class ImportRecord:
+    """
+    One line of the "-X importtime" output.
+
+    :param module_name: name of the imported module
+    :param self_time_us: time spent in the module itself
+    :param cumulative_time_us: time spent in the module and in its not yet imported dependencies
+    :param depth: nesting level of the import, 0 is a direct import of the profiled code
+    """
+
+    def __init__(self, module_name: str, self_time_us: int, cumulative_time_us: int, depth: int):
+        self.module_name: str = module_name
+        self.self_time_us: int = self_time_us
+        self.cumulative_time_us: int = cumulative_time_us
+        self.depth: int = depth
+
+
+def create_import_code(targets: list[str]) -> str:
+    """
+    :param targets: module names or class names in "module:class" format
+    :return: code, which imports the targets
+    """
+
+    lines = ["import importlib", "import sys", f"sys.stderr.write({StartupFinishedMarker!r} + '\\n')"]
+
+    for target in targets:
+        module_name, _, qualified_name = target.partition(":")
+        lines.append(f"resolved = importlib.import_module({module_name!r})")
+        for attribute_name in filter(None, qualified_name.split(".")):
+            lines.append(f"resolved = getattr(resolved, {attribute_name!r})")
+
+    return "\n".join(lines)
+
+
+def profile_imports(targets: list[str], python_executable: Optional[str] = None) -> list[ImportRecord]:
+    """
+    Imports the targets in a new interpreter and collects the import times.
+
+    :param targets: module names or class names in "module:class" format
+    :param python_executable: the interpreter, by default the current one
+    :return: the records in the order of the output i.e., dependencies precede their importer.
+             The modules imported by the interpreter startup are not included.
+    """
+
+    process = subprocess.run(
+        [python_executable or sys.executable, "-X", "importtime", "-c", create_import_code(targets)],
+        capture_output=True, text=True
+    )
+
+    if 0 != process.returncode:
+        raise ImportError(f"Failed to import {targets}:\n{process.stderr}")
+
+    records = []
+
+    output_lines = process.stderr.splitlines()
+
+    for line in output_lines[output_lines.index(StartupFinishedMarker) + 1:]:
+        match = ImportTimeLinePattern.match(line)
+        if match is not None:
+            self_time_us, cumulative_time_us, indentation, module_name = match.groups()
+            records.append(ImportRecord(module_name, int(self_time_us), int(cumulative_time_us),
+                                        (len(indentation) - 1) // 2))
+
+    return records
+
+
+def create_report(targets: list[str], records: list[ImportRecord], top_count: int = 10) -> dict:
+    """
+    :return: total import time, the slowest modules by cumulative time, self time per top
+             level package and the imported transport modules
+    """
+
+    time_per_package_us: dict[str, int] = {}
+    for record in records:
+        package_name = record.module_name.split(".")[0]
+        time_per_package_us[package_name] = time_per_package_us.get(package_name, 0) + record.self_time_us
+
+    return {
+        "targets": targets,
+        "totalTimeMs": sum(record.self_time_us for record in records) / 1000,
+        "moduleCount": len(records),
+        "slowestModulesMs": {
+            record.module_name: record.cumulative_time_us / 1000
+            for record in sorted(records, key=lambda rec: rec.cumulative_time_us, reverse=True)[:top_count]
+        },
+        "packagesMs": {
+            package_name: time_us / 1000
+            for package_name, time_us in sorted(time_per_package_us.items(), key=lambda item: item[1], reverse=True)
+        },
+        "transportModules": sorted({
+            prefix for record in records for prefix in TransportModulePrefixes
+            if (record.module_name == prefix) or record.module_name.startswith(prefix + ".")
+        }),
+    }
+
+
+def check_no_transports(reports: list[dict]) -> None:
+    """
+    :raises ImportError: if any of the reports contains imported transport modules
+    """
+
+    violations = {", ".join(report["targets"]): report["transportModules"]
+                  for report in reports if 0 < len(report["transportModules"])}
+
+    if 0 < len(violations):
+        raise ImportError(f"Transport modules imported: {violations}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measures the import time of modules and classes")
+    parser.add_argument("targets", nargs="+", help="Module names or class names in module:class format")
+    parser.add_argument("--top", type=int, default=10, help="Number of the slowest modules to report")
+    parser.add_argument("--separately", action="store_true", help="Profile every target in its own interpreter")
+    parser.add_argument("--output", help="Path of a JSON file to store the reports")
+    parser.add_argument("--forbid-transports", action="store_true",
+                        help="Fail, if any of the targets imports a transport library")
+    arguments = parser.parse_args()
+
+    target_groups = [[target] for target in arguments.targets] if arguments.separately else [arguments.targets]
+
+    reports = [create_report(target_group, profile_imports(target_group), arguments.top)
+               for target_group in target_groups]
+
+    for report in reports:
+        print(f"Targets: {', '.join(report['targets'])}; Total: {report['totalTimeMs']:.1f} ms; "
+              f"Modules: {report['moduleCount']}")
+        print(f"  Transports: {', '.join(report['transportModules']) or '-'}")
+        for module_name, time_ms in report["slowestModulesMs"].items():
+            print(f"  {module_name}: {time_ms:.1f} ms")
+
+    if arguments.output is not None:
+        with open(arguments.output, "w") as output_file:
+            json.dump(reports, output_file, indent=2)
+
+    if arguments.forbid_transports:
+        check_no_transports(reports)
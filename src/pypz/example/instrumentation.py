@@ -0,0 +1,397 @@
+# =============================================================================
+# Copyright (c) 2024 by Laszlo Anka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+import bisect
+import functools
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer, ThreadingHTTPServer
+from typing import Any, Optional
+
+from pypz.core.commons.parameters import OptionalParameter
+from pypz.core.specs.plugin import ServicePlugin, ExtendedPlugin, InputPortPlugin, OutputPortPlugin
+from pypz.core.specs.utils import Internals
+
+from pypz.example.sync import ReplicableEvent
+
+DurationBucketsSec = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+BatchSizeBuckets = (0, 1, 5, 10, 50, 100, 500, 1000, 5000, 10000)
+
+
+class Histogram:
+    """
+    Histogram with fixed bucket bounds. The bucket counters are allocated upfront,
+    so observing a value only increments a counter.
+
+    :param bounds: upper bounds of the buckets in ascending order
+    """
+
+    def __init__(self, bounds: tuple):
+        self.bounds: tuple = bounds
+        self.bucket_counts: list[int] = [0] * (len(bounds) + 1)
+        """
+        The last bucket counts the values above the highest bound (+Inf)
+        """
+        self.count: int = 0
+        self.sum: float = 0
+
+    def observe(self, value: float) -> None:
+        self.bucket_counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def render(self, name: str, labels: str) -> list[str]:
+        lines = []
+        cumulated_count = 0
+
+        for bound, bucket_count in zip(self.bounds, self.bucket_counts):
+            cumulated_count += bucket_count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulated_count}')
+
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+
+        return lines
+
+
+class InstrumentationPlugin(ServicePlugin, ExtendedPlugin):
+    """
+    This plugin records, how the operator spends its time. It measures the duration
+    of _on_init/_on_running/_on_shutdown, the size of the batches retrieved from the
+    input ports and sent to the output ports, the number of idle iterations (i.e.,
+    nothing retrieved) and the lag of the input ports. The metrics are exposed in
+    Prometheus text format through an HTTP endpoint and/or a file, hence in case of
+    replicas one can easily spot, which replicas are starved and which are saturated.
+    Like the logger, it can be attached to any operator:
+
+        self.instrumentation = InstrumentationPlugin()
+
+    :param name: name of the instance, if not provided, it will be attempted to deduce from the variable's name
+    """
+
+    MetricPrefix = "pypz_operator"
+
+    InstrumentedOperatorMethods = ("_on_init", "_on_running", "_on_shutdown")
+
+    port = OptionalParameter(int, description="Port of the HTTP endpoint (/metrics), None disables it")
+    export_file_path = OptionalParameter(str, alt_name="exportFilePath",
+                                         description="Path of the file to export the metrics into periodically "
+                                                     "e.g., for node exporter's textfile collector. "
+                                                     "None disables the file export")
+    export_interval_sec = OptionalParameter(float, alt_name="exportIntervalSec",
+                                            description="Time between two file exports")
+    lag_sample_interval_sec = OptionalParameter(float, alt_name="lagSampleIntervalSec",
+                                                description="Time between two samplings of the input port lag")
+
+    def __init__(self, name: str = None, *args, **kwargs):
+        super().__init__(name, *args, **kwargs)
+
+        self.port = None
+        self.export_file_path = None
+        self.export_interval_sec = 10.0
+        self.lag_sample_interval_sec = 5.0
+
+        self._method_durations: dict[str, Histogram] = {
+            method_name: Histogram(DurationBucketsSec)
+            for method_name in InstrumentationPlugin.InstrumentedOperatorMethods
+        }
+
+        self._batch_sizes: dict[str, Histogram] = {}
+        """
+        Batch size histograms per port, key is the name of the port
+        """
+
+        self._idle_iteration_counts: dict[str, int] = {}
+        """
+        Number of retrievals without any record per input port
+        """
+
+        self._lags: dict[str, int] = {}
+        """
+        Last sampled lag per input port
+        """
+
+        self._input_ports: list[InputPortPlugin] = []
+
+        self._output_ports: list[OutputPortPlugin] = []
+
+        self._next_lag_sample_time: float = 0
+
+        self._instrumented: bool = False
+
+        self._server: Optional[HTTPServer] = None
+        self._server_thread: Optional[threading.Thread] = None
+
+        self._export_stopped: threading.Event = ReplicableEvent()
+        self._export_thread: Optional[threading.Thread] = None
+
+    # --------------------------
+    # Instrumentation
+    # --------------------------
+
+    def _instrument_operator_method(self, method_name: str) -> None:
+        operator = self.get_context()
+        original_method = getattr(operator, method_name)
+        histogram = self._method_durations[method_name]
+
+        # functools.wraps preserves the annotations, which are used by the executor to check the return type
+        @functools.wraps(original_method)
+        def instrumented_method():
+            start_time_ns = time.perf_counter_ns()
+            try:
+                return original_method()
+            finally:
+                histogram.observe((time.perf_counter_ns() - start_time_ns) / 1e9)
+
+        setattr(operator, method_name, instrumented_method)
+
+    def _instrument_input_port(self, input_port: InputPortPlugin) -> None:
+        port_name = input_port.get_simple_name()
+        original_retrieve = input_port.retrieve
+        histogram = self._batch_sizes[port_name] = Histogram(BatchSizeBuckets)
+        idle_iteration_counts = self._idle_iteration_counts
+        idle_iteration_counts[port_name] = 0
+
+        @functools.wraps(original_retrieve)
+        def instrumented_retrieve():
+            records = original_retrieve()
+            record_count = 0 if records is None else len(records)
+
+            histogram.observe(record_count)
+
+            if 0 == record_count:
+                idle_iteration_counts[port_name] += 1
+
+            return records
+
+        input_port.retrieve = instrumented_retrieve
+
+        self._input_ports.append(input_port)
+
+    def _instrument_output_port(self, output_port: OutputPortPlugin) -> None:
+        original_send = output_port.send
+        histogram = self._batch_sizes[output_port.get_simple_name()] = Histogram(BatchSizeBuckets)
+
+        @functools.wraps(original_send)
+        def instrumented_send(data):
+            histogram.observe(len(data))
+            return original_send(data)
+
+        output_port.send = instrumented_send
+
+        self._output_ports.append(output_port)
+
+    def _sample_lags(self) -> None:
+        """
+        The channels are not thread-safe, hence the lag is sampled on the operator's
+        thread after the _on_running, but only once in every lag_sample_interval_sec.
+        """
+
+        current_time = time.monotonic()
+
+        if current_time < self._next_lag_sample_time:
+            return
+
+        self._next_lag_sample_time = current_time + self.lag_sample_interval_sec
+
+        for input_port in self._input_ports:
+            # Lag is only available, if the channel supports it (e.g., Kafka)
+            channel_reader = getattr(input_port, "_channel_reader", None)
+
+            if hasattr(channel_reader, "get_consumer_lag"):
+                try:
+                    self._lags[input_port.get_simple_name()] = channel_reader.get_consumer_lag()
+                except Exception as e:
+                    self.get_logger().warning(f"Failed to retrieve lag of {input_port.get_simple_name()}: {e}")
+
+    def render(self) -> str:
+        """
+        :return: the metrics in Prometheus text exposition format
+        """
+
+        operator = self.get_context()
+        operator_labels = f'operator="{operator.get_full_name()}",replica="{operator.get_group_index()}"'
+        prefix = InstrumentationPlugin.MetricPrefix
+
+        lines = [f"# TYPE {prefix}_method_duration_seconds histogram"]
+        for method_name, histogram in self._method_durations.items():
+            lines.extend(histogram.render(f"{prefix}_method_duration_seconds",
+                                          f'{operator_labels},method="{method_name}"'))
+
+        lines.append(f"# TYPE {prefix}_batch_size histogram")
+        for port_name, histogram in self._batch_sizes.items():
+            lines.extend(histogram.render(f"{prefix}_batch_size", f'{operator_labels},port="{port_name}"'))
+
+        lines.append(f"# TYPE {prefix}_idle_iterations_total counter")
+        for port_name, idle_iteration_count in self._idle_iteration_counts.items():
+            lines.append(f'{prefix}_idle_iterations_total{{{operator_labels},port="{port_name}"}} '
+                         f'{idle_iteration_count}')
+
+        lines.append(f"# TYPE {prefix}_input_lag gauge")
+        for port_name, lag in self._lags.items():
+            lines.append(f'{prefix}_input_lag{{{operator_labels},port="{port_name}"}} {lag}')
+
+        # Flow control metrics are only available, if the channel supports it (e.g., FlowControlRMQChannelWriter)
+        flow_control_metrics = [
+            (output_port.get_simple_name(), channel_writer.get_channel_name(), channel_writer.get_flow_control_metrics())
+            for output_port in self._output_ports
+            for channel_writer in list(getattr(output_port, "_channel_writers", None) or [])
+            if hasattr(channel_writer, "get_flow_control_metrics")
+        ]
+
+        lines.append(f"# TYPE {prefix}_output_credit gauge")
+        for port_name, channel_name, metrics in flow_control_metrics:
+            if metrics["credit"] is not None:
+                lines.append(f'{prefix}_output_credit{{{operator_labels},port="{port_name}",'
+                             f'channel="{channel_name}"}} {metrics["credit"]}')
+
+        lines.append(f"# TYPE {prefix}_output_in_flight_messages gauge")
+        for port_name, channel_name, metrics in flow_control_metrics:
+            lines.append(f'{prefix}_output_in_flight_messages{{{operator_labels},port="{port_name}",'
+                         f'channel="{channel_name}"}} {metrics["inFlightMessageCount"]}')
+
+        return "\n".join(lines) + "\n"
+
+    # --------------------------
+    # Export
+    # --------------------------
+
+    def _export_to_file(self) -> None:
+        # Written into a temporary file first, so the collector never reads a partial file
+        export_dir = os.path.dirname(os.path.abspath(self.export_file_path))
+        file_descriptor, tmp_file_path = tempfile.mkstemp(dir=export_dir)
+
+        with os.fdopen(file_descriptor, "w") as tmp_file:
+            tmp_file.write(self.render())
+
+        os.replace(tmp_file_path, self.export_file_path)
+
+    def _export_loop(self) -> None:
+        while not self._export_stopped.wait(self.export_interval_sec):
+            try:
+                self._export_to_file()
+            except OSError as e:
+                self.get_logger().warning(f"Failed to export metrics: {e}")
+
+    def _start_http_server(self) -> None:
+        render = self.render
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    status = 200
+                    body = render().encode("utf-8")
+                else:
+                    status = 404
+                    body = b"NOT_FOUND"
+
+                self.send_response(status)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # Scrapes shall not pollute the operator's output
+                pass
+
+        self._server = ThreadingHTTPServer(("0.0.0.0", self.port), MetricsHandler)
+
+        self._server_thread = threading.Thread(
+            target=self._server.serve_forever,
+            name="metrics-server",
+            daemon=True,
+        )
+        self._server_thread.start()
+
+        self.get_logger().debug(f"Metrics server started and listening on port: {self.port}")
+
+    def _stop_http_server(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._server_thread and self._server_thread.is_alive():
+            self._server_thread.join(timeout=2.0)
+        self._server_thread = None
+
+    # --------------------------
+    # Plugin lifecycle
+    # --------------------------
+
+    def _pre_execution(self) -> None:
+        if self._instrumented:
+            return
+
+        for method_name in InstrumentationPlugin.InstrumentedOperatorMethods:
+            self._instrument_operator_method(method_name)
+
+        for plugin in Internals(self.get_context()).nested_instances.values():
+            if isinstance(plugin, InputPortPlugin):
+                self._instrument_input_port(plugin)
+            elif isinstance(plugin, OutputPortPlugin):
+                self._instrument_output_port(plugin)
+
+        # Lag sampling is attached to _on_running, since it needs to happen on the operator's thread
+        if 0 < len(self._input_ports):
+            operator = self.get_context()
+            instrumented_running = operator._on_running
+
+            @functools.wraps(instrumented_running)
+            def running_with_lag_sampling():
+                try:
+                    return instrumented_running()
+                finally:
+                    self._sample_lags()
+
+            operator._on_running = running_with_lag_sampling
+
+        self._instrumented = True
+
+    def _post_execution(self) -> None:
+        # Final export to have the complete picture after the execution
+        if self.export_file_path is not None:
+            self._export_to_file()
+
+    def _on_service_start(self) -> bool:
+        if self.port is not None:
+            self._start_http_server()
+
+        if self.export_file_path is not None:
+            self._export_stopped.clear()
+            self._export_thread = threading.Thread(target=self._export_loop, name="metrics-exporter", daemon=True)
+            self._export_thread.start()
+
+        return True
+
+    def _on_service_shutdown(self) -> bool:
+        self._stop_http_server()
+
+        if self._export_thread is not None:
+            self._export_stopped.set()
+            self._export_thread.join()
+            self._export_thread = None
+
+        return True
+
+    def _on_interrupt(self, system_signal: int = None) -> None:
+        pass
+
+    def _on_error(self, source: Any, exception: Exception) -> None:
+        pass
@@ -0,0 +1,61 @@
+# =============================================================================
+# Copyright (c) 2024 by Laszlo Anka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+"""
+This module provides the demo operators as KubernetesOperator i.e., along with their
+own parameters, they have the parameters of the Pod e.g., resources, probes, affinity.
+The KubernetesDeployer can deploy only KubernetesOperators.
+"""
+
+from pypz.core.specs.pipeline import Pipeline
+from pypz.operators.k8s import KubernetesOperator
+
+from pypz.example.rmq_pipeline import RMQDemoReaderOperator, RMQDemoWriterOperator
+
+
+class KubernetesRMQDemoWriterOperator(RMQDemoWriterOperator, KubernetesOperator):
+    pass
+
+
+class KubernetesRMQDemoReaderOperator(RMQDemoReaderOperator, KubernetesOperator):
+    pass
+
+
+class KubernetesRMQDemoPipeline(Pipeline):
+    """
+    RMQDemoPipeline with KubernetesOperators
+    """
+
+    def __init__(self, name: str, *args, **kwargs):
+        super().__init__(name, *args, **kwargs)
+
+        self.reader = KubernetesRMQDemoReaderOperator()
+        self.writer = KubernetesRMQDemoWriterOperator()
+
+        self.reader.input_port.connect(self.writer.output_port)
+
+        self.reader.set_parameter("operatorImageName", "accessible-repository/pypz-example")
+        self.writer.set_parameter("operatorImageName", "accessible-repository/pypz-example")
+
+        self.writer.set_parameter("replicationFactor", 3)
+        self.reader.set_parameter("replicationFactor", 50)
+
+        self.writer.output_port.set_parameter("channelConfig", {
+            "max_queued_message_count": 10000,
+            "confirm_batch_size": 100,
+        })
+        self.reader.input_port.set_parameter("channelConfig", {
+            "prefetch_count": 10,
+        })
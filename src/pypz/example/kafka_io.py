@@ -0,0 +1,503 @@
+# =============================================================================
+# Copyright (c) 2024 by Laszlo Anka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+import concurrent.futures
+import io
+import queue
+import threading
+from typing import Any, Optional, TYPE_CHECKING
+
+from avro.io import BinaryDecoder
+from kafka import KafkaConsumer, KafkaProducer, OffsetAndMetadata, TopicPartition
+from kafka.codec import has_gzip, has_lz4, has_zstd
+from pypz.plugins.kafka_io.channels import KafkaChannelReader, KafkaChannelWriter
+
+from pypz.example.avro_codegen import check_projection
+from pypz.example.compression import AdaptiveCompression, CompressionSelector
+# The ports were located in this module, hence they are re-exported for the existing imports
+from pypz.example.ports import PartitionedKafkaChannelInputPort, SchemaKafkaChannelInputPort, \
+    SchemaKafkaChannelOutputPort  # noqa: F401
+from pypz.example.records import ColumnBatch, ColumnsRecordType, DictRecordType, RowRecordType, \
+    concatenate_batches, to_dicts
+from pypz.example.schemas import schema_registry
+
+if TYPE_CHECKING:
+    from pypz.core.specs.plugin import InputPortPlugin, OutputPortPlugin
+
+KafkaCompressionCandidates = {"none": lambda: True, "gzip": has_gzip, "lz4": has_lz4, "zstd": has_zstd}
+"""
+Candidates of the adaptive compression of the Kafka channels with the check of their
+libraries. The Kafka producer does not support compression levels, hence the candidates
+are the codecs with their default levels.
+"""
+
+
+def is_kafka_compression_supported(compression: str, producer: KafkaProducer) -> bool:
+    """
+    :return: True, if the libraries of the codec are available and the broker supports it
+    """
+
+    if (compression not in KafkaCompressionCandidates) or (not KafkaCompressionCandidates[compression]()):
+        return False
+
+    return ("zstd" != compression) or ((2, 1, 0) <= producer.config["api_version"])
+
+
+class SchemaKafkaChannelReader(KafkaChannelReader):
+    """
+    Kafka channel reader, which takes the precompiled datum reader from the
+    schema registry instead of parsing the schema of the port itself. If the
+    schema is supported, the records are decoded batch-wise by the decoder
+    generated for the schema. If the port specifies projected fields, only
+    those fields are decoded. The records are returned in the representation
+    specified by the record type of the port, see records.py.
+    """
+
+    def __init__(self, channel_name: str, context: "InputPortPlugin",
+                 executor: Optional[concurrent.futures.ThreadPoolExecutor] = None, **kwargs):
+        super().__init__(channel_name, context, executor, **kwargs)
+
+        compiled_schema = schema_registry.register(context.get_schema())
+
+        self._generic_datum_reader = compiled_schema.datum_reader
+
+        projected_field_names = getattr(context, "projected_fields", None)
+
+        self._projected_field_names: Optional[list[str]] = None if projected_field_names is None else \
+            check_projection(compiled_schema.parsed_schema, projected_field_names)
+        """
+        Projected fields in the order of the schema, which is the order of the decoded fields
+        """
+
+        self._record_type: str = getattr(context, "record_type", DictRecordType)
+
+        # Checks the record type as well, even if the schema is not supported by the generator
+        self._codec = compiled_schema.get_codec(self._projected_field_names, self._record_type)
+
+        self._row_type: Optional[type] = compiled_schema.get_row_type(self._projected_field_names) \
+            if RowRecordType == self._record_type else None
+
+    def _decode_values(self, values: list[bytes]) -> Any:
+        if self._codec is not None:
+            return self._codec.decode_batch(values)
+
+        records = [self._generic_datum_reader.read(BinaryDecoder(io.BytesIO(value))) for value in values]
+
+        if (self._projected_field_names is None) and (DictRecordType == self._record_type):
+            return records
+
+        field_names = self._projected_field_names or \
+            [field.name for field in self._generic_datum_reader.writers_schema.fields]
+
+        if RowRecordType == self._record_type:
+            return [self._row_type._make(record[field_name] for field_name in field_names) for record in records]
+
+        if ColumnsRecordType == self._record_type:
+            return ColumnBatch.from_records(records, field_names)
+
+        return [{field_name: record[field_name] for field_name in field_names} for record in records]
+
+    def _read_records(self):
+        consumed_data_records = self._data_consumer.poll(timeout_ms=self._consumer_timeout_ms)
+
+        if KafkaChannelReader.InitialDataConsumerTimeoutInMs == self._consumer_timeout_ms:
+            self._consumer_timeout_ms = KafkaChannelReader.DataConsumerTimeoutInMs
+
+        # The batches of the partitions are concatenated in the representation of the record type
+        return concatenate_batches([self._decode_values([record.value for record in consumer_records])
+                                    for consumer_records in consumed_data_records.values()])
+
+    def get_checkpoint_offsets(self) -> dict[str, int]:
+        """
+        :return: offsets of the records returned so far, key is the partition
+        """
+
+        return {str(self._target_partition.partition): self._read_record_offset}
+
+    def seek_to_checkpoint_offsets(self, offsets: dict[str, int]) -> None:
+        """
+        Positions the reader to the offsets of a checkpoint and commits them, so the
+        reading continues from there regardless of the previously committed offsets.
+
+        :param offsets: offsets returned by get_checkpoint_offsets()
+        """
+
+        offset = offsets.get(str(self._target_partition.partition))
+
+        if offset is not None:
+            self._data_consumer.seek(self._target_partition, offset)
+            self._commit_offset(offset)
+            self.set_initial_record_offset(offset)
+
+
+class SchemaKafkaChannelWriter(KafkaChannelWriter):
+    """
+    Kafka channel writer, which takes the precompiled datum writer from the
+    schema registry instead of parsing the schema of the port itself. If the
+    schema is supported, the records are encoded batch-wise by the encoder
+    generated for the schema. Besides the list of dicts, the list of rows and
+    the ColumnBatch are accepted as well, see records.py.
+
+    The compression of the port is performed by the Kafka producer, hence the readers
+    decompress the records transparently. In adaptive mode, the encoded batches are sampled
+    by the CompressionSelector. Since the compression type of a producer cannot be changed,
+    the producer is flushed and recreated, if another codec is selected. Notice that the
+    producer compresses its own batches per partition, so the sampled ratio is an estimation.
+    """
+
+    def __init__(self, channel_name: str, context: "OutputPortPlugin",
+                 executor: Optional[concurrent.futures.ThreadPoolExecutor] = None, **kwargs):
+        super().__init__(channel_name, context, executor, **kwargs)
+
+        compiled_schema = schema_registry.register(context.get_schema())
+
+        self._generic_datum_writer = compiled_schema.datum_writer
+
+        self._codec = compiled_schema.get_codec()
+
+        self._compression: str = getattr(context, "compression", "none")
+
+        if ":" in self._compression:
+            raise ValueError(f"Compression levels are not supported by the Kafka producer: {self._compression}")
+
+        self._network_bandwidth_mbps: int = getattr(context, "network_bandwidth_mbps", 1000)
+
+        self._compression_selector: Optional[CompressionSelector] = None
+        """
+        Created with the producer, since the supported codecs depend on the broker as well
+        """
+
+    def _open_channel(self):
+        data_producer_missing = self._data_producer is None
+
+        # In adaptive mode, the producer starts without compression until the first selection
+        if data_producer_missing and (AdaptiveCompression == self._compression):
+            self._data_producer_properties["compression_type"] = None
+        elif data_producer_missing and ("none" != self._compression):
+            self._data_producer_properties["compression_type"] = self._compression
+
+        if not super()._open_channel():
+            return False
+
+        if data_producer_missing and (self._data_producer is not None):
+            self._compression_selector = CompressionSelector(
+                self._compression, self._network_bandwidth_mbps,
+                candidates=[candidate for candidate in KafkaCompressionCandidates
+                            if is_kafka_compression_supported(candidate, self._data_producer)]
+            )
+
+        return True
+
+    def _recreate_data_producer(self, compression: str) -> None:
+        """
+        The KafkaProducer does not support to change the compression type, hence the records
+        sent so far are flushed and a new producer is created with the selected compression.
+        The selection changes rarely, since the selector switches only to a significantly
+        better candidate.
+        """
+
+        self._data_producer.flush()
+        self._data_producer.close()
+
+        self._data_producer_properties["compression_type"] = None if "none" == compression else compression
+        self._data_producer = KafkaProducer(**self._data_producer_properties)
+
+    def _write_records(self, records: Any):
+        if (self._codec is None) or (not isinstance(records, (list, ColumnBatch))):
+            return super()._write_records(to_dicts(records))
+
+        try:
+            converted_records = self._codec.encode_batch(records)
+        except Exception:
+            converted_records = None
+
+        if converted_records is None:
+            # The generic path logs and explains the invalid record
+            return super()._write_records(to_dicts(records))
+
+        for converted_record in converted_records:
+            self._data_producer.send(
+                self._data_topic_name,
+                key=str(self._round_robin_partition_idx),
+                value=converted_record,
+                partition=self._round_robin_partition_idx,
+            )
+
+            if 1 < self._target_partition_count:
+                self._round_robin_partition_idx += 1
+
+                if self._round_robin_partition_idx == self._target_partition_count:
+                    self._round_robin_partition_idx = 0
+
+        if self._compression_selector.adaptive:
+            selected = self._compression_selector.selected
+
+            self._compression_selector.sample(b"".join(converted_records))
+
+            if selected != self._compression_selector.selected:
+                self._recreate_data_producer(self._compression_selector.selected)
+
+        self._health_check_payload.update(self._compression_selector.get_statistics())
+
+
+class PartitionedKafkaChannelReader(SchemaKafkaChannelReader):
+    """
+    Kafka channel reader, which consumes multiple partitions in parallel. By default, the
+    data topic has one partition per reader replica. If the channel configuration
+    "consumer_worker_count" is set to N, then the topic is created with N partitions per
+    replica, and each replica consumes its N partitions with N worker threads, each owning
+    one partition with its own consumer. The workers decode the records and put them into
+    a shared bounded queue, which is drained by _read_records(). The writers distribute the
+    records over all the partitions, hence one replica with N workers does the work of N
+    replicas with a single process and operator.
+
+    Each worker polls up to "worker_max_poll_records" records at once (default: the channel
+    configuration "max_poll_records", if specified, otherwise 500), so the records are fetched
+    and decoded batch-wise. Notice that the base reader polls a single record by default.
+
+    The offsets are tracked per partition. Every record returned by _read_records() is
+    counted as delivered, and the commit after the _on_running commits the delivered
+    offsets of every partition i.e., the records are acknowledged in the order of
+    their partitions, once the operator processed them.
+
+    Notice that the workers are threads, hence the decoding is limited by the GIL, but the
+    fetching from the brokers is parallel. Notice as well that all the replicas shall have the
+    same number of workers and in group mode (every replica reads every record) the topic
+    has a single partition, hence the workers are not applicable.
+    """
+
+    WorkerPollTimeoutInMs = 1000
+
+    DefaultWorkerMaxPollRecords = 500
+
+    def __init__(self, channel_name: str, context: "InputPortPlugin",
+                 executor: Optional[concurrent.futures.ThreadPoolExecutor] = None, **kwargs):
+        super().__init__(channel_name, context, executor, **kwargs)
+
+        self._consumer_worker_count: int = 1
+
+        self._worker_max_poll_records: int = PartitionedKafkaChannelReader.DefaultWorkerMaxPollRecords
+        """
+        Max number of records polled by a worker at once i.e., the size of the decoded batches
+        """
+
+        self._owned_partitions: list[TopicPartition] = []
+        """
+        Partitions of this replica, one per worker
+        """
+
+        self._delivered_offsets: dict[TopicPartition, int] = {}
+        """
+        Next offset per partition after the records returned by _read_records()
+        """
+
+        self._committed_offsets: dict[TopicPartition, int] = {}
+
+        self._worker_queue: Optional[queue.Queue] = None
+        """
+        Queue of (partition, next offset, records) entries produced by the workers
+        """
+
+        self._workers_stopped: threading.Event = threading.Event()
+
+        self._worker_executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+
+        self._worker_futures: list[concurrent.futures.Future] = []
+
+    def _is_partitioned(self) -> bool:
+        return 1 < self._consumer_worker_count
+
+    def _configure_channel(self, configuration: dict):
+        super()._configure_channel(configuration)
+
+        if "consumer_worker_count" in configuration:
+            if self._context.is_in_group_mode():
+                self._logger.warning("Consumer workers are not applicable in group mode")
+            else:
+                self._consumer_worker_count = configuration["consumer_worker_count"]
+                self._partition_count = self._context.get_group_size() * self._consumer_worker_count
+
+        if "worker_max_poll_records" in configuration:
+            self._worker_max_poll_records = configuration["worker_max_poll_records"]
+        elif "max_poll_records" in configuration:
+            self._worker_max_poll_records = configuration["max_poll_records"]
+
+    def _open_channel(self):
+        if not super()._open_channel():
+            return False
+
+        if self._is_partitioned() and (0 == len(self._owned_partitions)):
+            first_partition = self._context.get_group_index() * self._consumer_worker_count
+
+            self._owned_partitions = [
+                TopicPartition(self._data_topic_name, partition)
+                for partition in range(first_partition, first_partition + self._consumer_worker_count)
+            ]
+
+            # The consumer of the base class is used to retrieve and commit the offsets only
+            self._data_consumer.assign(self._owned_partitions)
+
+        return True
+
+    def _close_channel(self):
+        self._stop_workers()
+
+        return super()._close_channel()
+
+    def _load_input_record_offset(self) -> int:
+        if not self._is_partitioned():
+            return super()._load_input_record_offset()
+
+        for partition in self._owned_partitions:
+            offset_meta_data = self._data_consumer.committed(partition)
+
+            if isinstance(offset_meta_data, OffsetAndMetadata):
+                offset_meta_data = offset_meta_data.offset
+
+            self._committed_offsets[partition] = offset_meta_data or 0
+            self._delivered_offsets[partition] = self._committed_offsets[partition]
+
+        # The framework counts the records, hence the sum of the offsets is the equivalent
+        return sum(self._committed_offsets.values())
+
+    def _start_workers(self) -> None:
+        self._workers_stopped.clear()
+        self._worker_queue = queue.Queue(maxsize=2 * self._consumer_worker_count)
+        self._worker_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self._consumer_worker_count, thread_name_prefix=f"{self._unique_name}-consumer"
+        )
+        self._worker_futures = [
+            self._worker_executor.submit(self._consume_partition, worker_index, partition)
+            for worker_index, partition in enumerate(self._owned_partitions)
+        ]
+
+    def _stop_workers(self) -> None:
+        if self._worker_executor is None:
+            return
+
+        self._workers_stopped.set()
+        self._worker_executor.shutdown(wait=True)
+        self._worker_executor = None
+        self._worker_futures = []
+
+    def _consume_partition(self, worker_index: int, partition: TopicPartition) -> None:
+        consumer = KafkaConsumer(**{
+            **self._data_consumer_properties,
+            "client_id": f"{self._unique_name}-{worker_index}",
+            "max_poll_records": self._worker_max_poll_records,
+        })
+
+        try:
+            # The consumer starts from the committed offset of the group
+            consumer.assign([partition])
+
+            while not self._workers_stopped.is_set():
+                consumed_data_records = consumer.poll(timeout_ms=PartitionedKafkaChannelReader.WorkerPollTimeoutInMs)
+
+                for topic_partition, consumer_records in consumed_data_records.items():
+                    if 0 == len(consumer_records):
+                        continue
+
+                    records = self._decode_values([record.value for record in consumer_records])
+
+                    entry = (topic_partition, consumer_records[-1].offset + 1, records)
+
+                    # The bounded queue blocks the worker, if the operator falls behind
+                    while not self._workers_stopped.is_set():
+                        try:
+                            self._worker_queue.put(entry, timeout=0.1)
+                            break
+                        except queue.Full:
+                            pass
+        finally:
+            consumer.close(autocommit=False)
+
+    def _read_records(self):
+        if not self._is_partitioned():
+            return super()._read_records()
+
+        if self._worker_executor is None:
+            self._start_workers()
+
+        for future in self._worker_futures:
+            if future.done() and (future.exception() is not None):
+                raise future.exception()
+
+        batches = []
+
+        try:
+            entry = self._worker_queue.get(timeout=0.1)
+
+            # Every entry is a batch of up to worker_max_poll_records records of a worker
+            while entry is not None:
+                topic_partition, next_offset, records = entry
+
+                batches.append(records)
+                self._delivered_offsets[topic_partition] = next_offset
+
+                entry = self._worker_queue.get_nowait()
+        except queue.Empty:
+            pass
+
+        return concatenate_batches(batches)
+
+    def _commit_offset(self, offset: int) -> None:
+        if not self._is_partitioned():
+            return super()._commit_offset(offset)
+
+        # The offset calculated by the framework is not applicable to multiple partitions,
+        # hence the delivered offsets are committed per partition
+        offsets_to_commit = {
+            partition: OffsetAndMetadata(delivered_offset, "")
+            for partition, delivered_offset in self._delivered_offsets.items()
+            if delivered_offset != self._committed_offsets.get(partition)
+        }
+
+        if 0 < len(offsets_to_commit):
+            self._data_consumer.commit(offsets_to_commit)
+
+            for partition, offset_and_metadata in offsets_to_commit.items():
+                self._committed_offsets[partition] = offset_and_metadata.offset
+
+    def get_checkpoint_offsets(self) -> dict[str, int]:
+        if not self._is_partitioned():
+            return super().get_checkpoint_offsets()
+
+        return {str(partition.partition): offset for partition, offset in self._delivered_offsets.items()}
+
+    def seek_to_checkpoint_offsets(self, offsets: dict[str, int]) -> None:
+        if not self._is_partitioned():
+            return super().seek_to_checkpoint_offsets(offsets)
+
+        # The workers start from the committed offsets, hence they are restarted after the commit
+        self._stop_workers()
+
+        for partition in self._owned_partitions:
+            if str(partition.partition) in offsets:
+                self._delivered_offsets[partition] = offsets[str(partition.partition)]
+
+        # The argument is not used, since the delivered offsets are committed per partition
+        self._commit_offset(0)
+
+        self.set_initial_record_offset(sum(self._delivered_offsets.values()))
+
+    def get_consumer_lag(self) -> int:
+        if not self._is_partitioned():
+            return super().get_consumer_lag()
+
+        end_offsets = self._data_consumer.end_offsets(self._owned_partitions)
+
+        return sum(end_offset - self._delivered_offsets.get(partition, 0)
+                   for partition, end_offset in end_offsets.items())
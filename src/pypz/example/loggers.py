@@ -0,0 +1,266 @@
+# =============================================================================
+# Copyright (c) 2024 by Laszlo Anka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+import atexit
+import collections
+import logging
+import sys
+import threading
+import time
+from typing import Any, Optional
+
+from pypz.core.commons.loggers import DefaultContextLogger
+from pypz.core.commons.parameters import OptionalParameter
+from pypz.core.specs.plugin import LoggerPlugin, ExtendedPlugin
+
+from pypz.example.sync import ReplicableEvent, ReplicableLock
+
+
+class AsyncLoggerPlugin(LoggerPlugin, ExtendedPlugin):
+    """
+    This logger plugin is a non-blocking variant of the DefaultLoggerPlugin. The log
+    calls only check the level and the sampling, then put the unformatted message with
+    its arguments into a bounded queue. The message is formatted and written to stdout
+    in batches by a background thread, hence the processing loop neither builds strings
+    nor waits for the output. Use lazy arguments to benefit from it:
+
+        self.get_logger().debug("Received record: %s", record)
+
+    Notice that the arguments are formatted on the writer thread, hence they shall
+    not be modified after the log call. If the queue is full, the new log records
+    are dropped and the number of dropped records is reported with the next flush.
+
+    :param name: name of the instance, if not provided, it will be attempted to deduce from the variable's name
+    """
+
+    _log_level = OptionalParameter(str, alt_name="logLevel",
+                                   on_update=lambda instance, val: None if val is None else instance.set_log_level(val))
+    queue_size = OptionalParameter(int, alt_name="queueSize",
+                                   description="Max number of log records waiting to be written")
+    flush_interval_ms = OptionalParameter(int, alt_name="flushIntervalMs",
+                                          description="Max time between two flushes of the queue")
+    flush_batch_size = OptionalParameter(int, alt_name="flushBatchSize",
+                                         description="Number of queued records, which triggers a flush "
+                                                     "before the flush interval expires")
+    sample_rates = OptionalParameter(dict, alt_name="sampleRates",
+                                     description="Sampling per log level e.g., {\"DEBUG\": 100} logs only "
+                                                 "1 in 100 debug records. Not specified levels are not sampled")
+
+    def __init__(self, name: str = None, *args, **kwargs):
+        super().__init__(name, *args, **kwargs)
+
+        self._level: int = logging.INFO
+
+        self._log_level = "INFO"
+        self.queue_size = 10000
+        self.flush_interval_ms = 100
+        self.flush_batch_size = 1000
+        self.sample_rates = {}
+
+        self._sample_rates_by_level: dict[int, int] = {}
+        """
+        Sample rates resolved from the parameter, key is the numeric log level
+        """
+
+        self._sample_counters: dict[int, int] = collections.defaultdict(int)
+
+        self._queue: collections.deque = collections.deque()
+        """
+        deque.append() and deque.popleft() are atomic, so the log calls
+        and the writer thread do not need to synchronize
+        """
+
+        self._dropped_record_count: int = 0
+
+        self._formatter: logging.Formatter = DefaultContextLogger.ColoredFormatter(
+            "%(levelname)s | %(asctime)s | %(name)s | %(context)s | %(message)s"
+        )
+        """
+        Same format as the DefaultLoggerPlugin's
+        """
+
+        self._flush_requested: threading.Event = ReplicableEvent()
+        self._stopped: bool = False
+        self._writer_thread: Optional[threading.Thread] = None
+        self._writer_thread_lock: ReplicableLock = ReplicableLock()
+
+    # --------------------------
+    # Log record handling
+    # --------------------------
+
+    def set_log_level(self, log_level: str | int) -> None:
+        if isinstance(log_level, str):
+            self._level = logging.getLevelName(log_level.upper())
+        elif isinstance(log_level, int):
+            self._level = log_level
+        else:
+            raise TypeError(f"Invalid log_level type: {log_level}")
+
+    def is_enabled_for(self, level: int) -> bool:
+        """
+        Can be used to skip the preparation of the log records entirely e.g., a loop
+        that only logs, if the corresponding level is disabled.
+        """
+
+        return self._level <= level
+
+    def _enqueue(self, level: int, event: Optional[str], context_stack: Optional[list[str]], args: tuple) -> None:
+        if level < self._level:
+            return
+
+        sample_rate = self._sample_rates_by_level.get(level)
+
+        if sample_rate is not None:
+            self._sample_counters[level] += 1
+            if 0 != (self._sample_counters[level] % sample_rate):
+                return
+
+        if self.queue_size <= len(self._queue):
+            self._dropped_record_count += 1
+            return
+
+        if self._writer_thread is None:
+            self._start_writer_thread()
+
+        # Only references are stored, formatting happens on the writer thread
+        self._queue.append((level, time.time(), event, context_stack, args))
+
+        if self.flush_batch_size == len(self._queue):
+            self._flush_requested.set()
+
+    def _format(self, entry: tuple) -> str:
+        level, created, event, context_stack, args = entry
+
+        record = logging.LogRecord(self.get_full_name(), level, "", 0, event, args or None, None)
+        record.created = created
+        record.msecs = (created - int(created)) * 1000
+        record.context = " | ".join(context_stack) if context_stack is not None else None
+
+        return self._formatter.format(record)
+
+    def flush(self) -> None:
+        lines = []
+
+        while True:
+            try:
+                entry = self._queue.popleft()
+            except IndexError:
+                break
+
+            try:
+                lines.append(self._format(entry))
+            except Exception as e:
+                # Invalid arguments shall not break the writer thread
+                lines.append(f"Failed to format log record {entry}: {e}")
+
+            if self.flush_batch_size <= len(lines):
+                self._write(lines)
+                lines = []
+
+        if 0 < self._dropped_record_count:
+            dropped_record_count = self._dropped_record_count
+            self._dropped_record_count -= dropped_record_count
+            lines.append(self._format((logging.WARNING, time.time(),
+                                       f"Log queue full, dropped records: {dropped_record_count}", None, ())))
+
+        if 0 < len(lines):
+            self._write(lines)
+
+    @staticmethod
+    def _write(lines: list[str]) -> None:
+        lines.append("")
+        sys.stdout.write("\n".join(lines))
+        sys.stdout.flush()
+
+    def _writer_loop(self) -> None:
+        while not self._stopped:
+            self._flush_requested.wait(self.flush_interval_ms / 1000)
+            self._flush_requested.clear()
+            self.flush()
+
+    def _start_writer_thread(self) -> None:
+        with self._writer_thread_lock:
+            if self._writer_thread is None:
+                self._stopped = False
+                self._writer_thread = threading.Thread(target=self._writer_loop, name="async-logger", daemon=True)
+                self._writer_thread.start()
+                atexit.register(self._stop_writer_thread)
+
+    def _stop_writer_thread(self) -> None:
+        with self._writer_thread_lock:
+            if self._writer_thread is not None:
+                self._stopped = True
+                self._flush_requested.set()
+                self._writer_thread.join()
+                self._writer_thread = None
+                atexit.unregister(self._stop_writer_thread)
+
+        # Records logged after the thread stopped
+        self.flush()
+
+    # --------------------------
+    # ContextLoggerInterface
+    # --------------------------
+
+    def _error(self, event: Optional[str] = None, context_stack: list[str] = None, *args: Any, **kw: Any) -> Any:
+        self._enqueue(logging.ERROR, event, context_stack, args)
+
+    def _warning(self, event: Optional[str] = None, context_stack: list[str] = None, *args: Any, **kw: Any) -> Any:
+        self._enqueue(logging.WARNING, event, context_stack, args)
+
+    def _info(self, event: Optional[str] = None, context_stack: list[str] = None, *args: Any, **kw: Any) -> Any:
+        self._enqueue(logging.INFO, event, context_stack, args)
+
+    def _debug(self, event: Optional[str] = None, context_stack: list[str] = None, *args: Any, **kw: Any) -> Any:
+        self._enqueue(logging.DEBUG, event, context_stack, args)
+
+    # --------------------------
+    # Plugin lifecycle
+    # --------------------------
+
+    def _pre_execution(self) -> None:
+        self._sample_rates_by_level = {
+            logging.getLevelName(level_name.upper()): int(sample_rate)
+            for level_name, sample_rate in self.sample_rates.items()
+            if 1 < int(sample_rate)
+        }
+
+    def _post_execution(self) -> None:
+        self._stop_writer_thread()
+
+    def _on_interrupt(self, system_signal: int = None) -> None:
+        pass
+
+    def _on_error(self, source: Any, exception: Exception) -> None:
+        pass
+
+
+def is_log_level_enabled(logger_plugin: LoggerPlugin, level: int) -> bool:
+    """
+    Checks the level by the parameter "logLevel" of the logger plugin. Unlike the
+    AsyncLoggerPlugin.is_enabled_for(), it works with the logger plugins of pypz as
+    well, since they provide the same parameter. Without the parameter, every level
+    is considered enabled.
+    """
+
+    if not logger_plugin.has_parameter("logLevel"):
+        return True
+
+    log_level = logger_plugin.get_parameter("logLevel")
+
+    if isinstance(log_level, str):
+        log_level = logging.getLevelName(log_level.upper())
+
+    return (not isinstance(log_level, int)) or (log_level <= level)
@@ -0,0 +1,497 @@
+# =============================================================================
+# Copyright (c) 2024 by Laszlo Anka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+import collections
+import concurrent.futures
+import threading
+import time
+from typing import Any, Optional, TYPE_CHECKING
+
+from pypz.abstracts.channel_ports import ChannelInputPort, ChannelOutputPort
+from pypz.core.channels.io import ChannelReader, ChannelWriter
+
+from pypz.example.records import ColumnBatch, concatenate_batches
+
+if TYPE_CHECKING:
+    from pypz.core.specs.plugin import InputPortPlugin, OutputPortPlugin
+
+
+class RingBuffer:
+    """
+    Bounded FIFO buffer to transfer data between threads of the same process.
+    It relies on the fact that deque.append() and deque.popleft() are atomic,
+    hence neither the producers nor the consumers need to acquire a lock.
+    Notice that the capacity is a soft limit, concurrent producers can exceed
+    it by at most the number of producers.
+
+    :param capacity: max number of entries in the buffer
+    """
+
+    def __init__(self, capacity: int):
+        self._capacity: int = capacity
+        self._entries: collections.deque = collections.deque()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def offer(self, entry: Any) -> bool:
+        """
+        :return: True, if the entry has been added, False if the buffer is full
+        """
+
+        if self._capacity <= len(self._entries):
+            return False
+
+        self._entries.append(entry)
+
+        return True
+
+    def poll(self) -> Optional[Any]:
+        """
+        :return: the oldest entry or None, if the buffer is empty
+        """
+
+        try:
+            return self._entries.popleft()
+        except IndexError:
+            return None
+
+
+class MemoryChannelStatistics:
+    """
+    Statistics of a memory channel, which are kept even after the resources of
+    the channel have been deleted, so they can be evaluated after the execution.
+    """
+
+    def __init__(self):
+        self.written_record_count: int = 0
+
+        self.queue_read_record_counts: dict[str, int] = {}
+        """
+        Number of records read per data queue. In group mode, every reader replica has its
+        own queue and reads every record.
+        """
+
+        self.first_write_time_ns: int = 0
+        self.last_read_time_ns: int = 0
+
+        self.latency_samples: list[tuple[int, int]] = []
+        """
+        Latency between writing and reading a batch as (latency in ns, record count) pairs
+        """
+
+    @property
+    def read_record_count(self) -> int:
+        """
+        :return: number of records read, every record is counted once, even if it is read by
+                 every reader replica in group mode
+        """
+
+        return max(self.queue_read_record_counts.values(), default=0)
+
+
+class MemoryChannelResource:
+    """
+    This class represents the resources of a memory channel i.e., the data queues
+    and the status streams. Like in case of the RMQ channels, there is one data
+    queue for each reader replica in group mode, otherwise one shared queue.
+    """
+
+    def __init__(self, data_queue_names: list[str], capacity: int):
+        self.data_queues: dict[str, RingBuffer] = {name: RingBuffer(capacity) for name in data_queue_names}
+
+        self.writer_status_stream: list[str] = []
+        """
+        Append-only list of the writer status messages. Readers maintain their own
+        position in the stream, similar to a Kafka topic.
+        """
+
+        self.reader_status_stream: list[str] = []
+
+        self.statistics: MemoryChannelStatistics = MemoryChannelStatistics()
+
+        self.statistics_lock: threading.Lock = threading.Lock()
+        """
+        The statistics are updated by every writer and reader replica
+        """
+
+
+_resources: dict[str, MemoryChannelResource] = {}
+"""
+Process-wide registry of the memory channel resources, key is the location and the channel name
+"""
+
+_resources_lock = threading.Lock()
+"""
+Only resource creation and deletion is synchronized, the data transfer is lock-free. The
+statistics are guarded by the lock of their resource.
+"""
+
+_statistics: dict[str, MemoryChannelStatistics] = {}
+
+
+def get_channel_statistics() -> dict[str, MemoryChannelStatistics]:
+    """
+    :return: the statistics of every memory channel of the process, key is the location and the channel name
+    """
+
+    return dict(_statistics)
+
+
+def reset_channel_statistics() -> None:
+    _statistics.clear()
+
+
+def _get_resource_key(location: str, channel_name: str) -> str:
+    return f"{location}/{channel_name}"
+
+
+class MemoryChannelWriter(ChannelWriter):
+    """
+    Channel writer, which transfers the records via in-process ring buffers. Since
+    the records are passed by reference (in group mode to every reader replica),
+    they shall not be modified neither after sending nor after retrieving.
+    """
+
+    def __init__(self, channel_name: str, context: "OutputPortPlugin",
+                 executor: Optional[concurrent.futures.ThreadPoolExecutor] = None, **kwargs):
+        super().__init__(channel_name, context, executor, **kwargs)
+
+        self._context: "OutputPortPlugin" = context
+
+        self._resource: Optional[MemoryChannelResource] = None
+
+        self._reader_status_position: int = 0
+        """
+        Position of the next status message to be retrieved from the reader status stream
+        """
+
+        self._writer_status_position: int = 0
+
+        self._config_write_timeout_sec: float = 60
+        """
+        Configuration parameter to specify, how long a write shall wait for free space in the buffer
+        """
+
+        self._config_full_buffer_backoff_sec: float = 0.0005
+
+    def _create_resources(self) -> bool:
+        # Resources are created by the reader like in case of the RMQ channels
+        return True
+
+    def _delete_resources(self) -> bool:
+        return True
+
+    def _open_channel(self) -> bool:
+        if self.get_location() is None:
+            raise ValueError(f"Missing channel location for channel: {self._channel_name}")
+
+        self._resource = _resources.get(_get_resource_key(self.get_location(), self._channel_name))
+
+        return self._resource is not None
+
+    def can_close(self) -> bool:
+        return True
+
+    def _close_channel(self) -> bool:
+        self._resource = None
+
+        return True
+
+    def _configure_channel(self, channel_configuration: dict) -> None:
+        if "write_timeout_sec" in channel_configuration:
+            self._config_write_timeout_sec = channel_configuration["write_timeout_sec"]
+
+        if "full_buffer_backoff_sec" in channel_configuration:
+            self._config_full_buffer_backoff_sec = channel_configuration["full_buffer_backoff_sec"]
+
+    def _write_records(self, records: list[Any]) -> None:
+        if not isinstance(records, (list, ColumnBatch)):
+            raise TypeError(f"Invalid record type: {type(records)}. List of records or ColumnBatch is expected.")
+
+        if 0 == len(records):
+            return
+
+        write_time_ns = time.perf_counter_ns()
+        entry = (write_time_ns, records)
+
+        # In group mode every reader replica has its own queue and gets all the records
+        for data_queue in self._resource.data_queues.values():
+            deadline = time.monotonic() + self._config_write_timeout_sec
+
+            while not data_queue.offer(entry):
+                if deadline < time.monotonic():
+                    raise TimeoutError(f"Buffer of channel {self._channel_name} is full for "
+                                       f"{self._config_write_timeout_sec} [s]")
+
+                time.sleep(self._config_full_buffer_backoff_sec)
+
+        statistics = self._resource.statistics
+
+        with self._resource.statistics_lock:
+            if 0 == statistics.first_write_time_ns:
+                statistics.first_write_time_ns = write_time_ns
+
+            statistics.written_record_count += len(records)
+
+    def _send_status_message(self, message: str) -> None:
+        self._resource.writer_status_stream.append(message)
+
+    def _retrieve_status_messages(self) -> Optional[list]:
+        retrieved_messages = self._resource.reader_status_stream[self._reader_status_position:]
+        self._reader_status_position += len(retrieved_messages)
+
+        # The principal needs to be aware of its replicas as well
+        if (1 < self._context.get_group_size()) and self._context.is_principal():
+            writer_messages = self._resource.writer_status_stream[self._writer_status_position:]
+            self._writer_status_position += len(writer_messages)
+            retrieved_messages.extend(writer_messages)
+
+        return retrieved_messages
+
+
+class MemoryChannelReader(ChannelReader):
+    """
+    Channel reader, which receives the records via in-process ring buffers.
+    """
+
+    def __init__(self, channel_name: str, context: "InputPortPlugin",
+                 executor: Optional[concurrent.futures.ThreadPoolExecutor] = None, **kwargs):
+        super().__init__(channel_name, context, executor, **kwargs)
+
+        self._context: "InputPortPlugin" = context
+
+        self._data_queue_name: str = (
+            channel_name
+            if (not self._context.is_in_group_mode()) or (self._context.is_principal())
+            else f"{channel_name}-{self._context.get_group_index()}"
+        )
+
+        self._resource: Optional[MemoryChannelResource] = None
+
+        self._data_queue: Optional[RingBuffer] = None
+
+        self._writer_status_position: int = 0
+        """
+        Position of the next status message to be retrieved from the writer status stream
+        """
+
+        self._reader_status_position: int = 0
+
+        self._config_capacity: int = 1024
+        """
+        Configuration parameter to specify the max number of batches in a data queue
+        """
+
+        self._config_max_poll_records: int = 1000
+        """
+        Configuration parameter to specify the max number of records to process in one go
+        """
+
+        self._config_idle_sleep_sec: float = 0.0005
+        """
+        Configuration parameter to specify, how long to wait, if there is no record available
+        """
+
+        self._config_latency_tracking: bool = False
+        """
+        Configuration parameter to enable the collection of latency samples
+        """
+
+    def _get_data_queue_names(self) -> list[str]:
+        data_queue_names: list = [self._channel_name]
+
+        if self._context.is_in_group_mode():
+            data_queue_names.extend([f"{self._channel_name}-{idx}" for idx in range(1, self._context.get_group_size())])
+
+        return data_queue_names
+
+    def _create_resources(self) -> bool:
+        if self.get_location() is None:
+            raise ValueError(f"Missing channel location for channel: {self._channel_name}")
+
+        resource_key = _get_resource_key(self.get_location(), self._channel_name)
+
+        with _resources_lock:
+            if resource_key not in _resources:
+                _resources[resource_key] = MemoryChannelResource(self._get_data_queue_names(), self._config_capacity)
+                _statistics[resource_key] = _resources[resource_key].statistics
+
+        return True
+
+    def _delete_resources(self) -> bool:
+        resource_key = _get_resource_key(self.get_location(), self._channel_name)
+
+        with _resources_lock:
+            resource = _resources.pop(resource_key, None)
+
+        if resource is not None:
+            for data_queue_name, data_queue in resource.data_queues.items():
+                if 0 < len(data_queue):
+                    self._logger.error(f"Queue deleted, but was not empty: {data_queue_name}")
+
+        return True
+
+    def _open_channel(self) -> bool:
+        if self.get_location() is None:
+            raise ValueError(f"Missing channel location for channel: {self._channel_name}")
+
+        self._resource = _resources.get(_get_resource_key(self.get_location(), self._channel_name))
+
+        if self._resource is None:
+            return False
+
+        # Silent readers (e.g., sniffer) shall not consume the data
+        if not self._silent_mode:
+            self._data_queue = self._resource.data_queues[self._data_queue_name]
+
+        return True
+
+    def _close_channel(self) -> bool:
+        self._data_queue = None
+        self._resource = None
+
+        return True
+
+    def _configure_channel(self, channel_configuration: dict) -> None:
+        if "capacity" in channel_configuration:
+            self._config_capacity = channel_configuration["capacity"]
+
+        if "max_poll_records" in channel_configuration:
+            self._config_max_poll_records = channel_configuration["max_poll_records"]
+
+        if "idle_sleep_sec" in channel_configuration:
+            self._config_idle_sleep_sec = channel_configuration["idle_sleep_sec"]
+
+        if "latency_tracking" in channel_configuration:
+            self._config_latency_tracking = channel_configuration["latency_tracking"]
+
+    def _load_input_record_offset(self) -> int:
+        """
+        Offset has no meaning in memory queues, nevertheless the value -1 is necessary,
+        since if it signalizes that no offset ever was committed.
+        """
+        return -1
+
+    def _commit_offset(self, offset: int) -> None:
+        pass
+
+    def can_close(self) -> bool:
+        if (not self._context.is_principal()) or (self._context.get_group_name() is None):
+            return True
+
+        self.invoke_sync_status_update()
+
+        if 0 == self.retrieve_all_connected_channel_count():
+            return True
+
+        finished_replica_count = len(
+            self.retrieve_connected_channel_unique_names(
+                lambda flt: (flt.get_channel_group_name() == self._context.get_group_name()) and
+                            ((not flt.is_channel_healthy()) or flt.is_channel_stopped() or flt.is_channel_closed())
+            )
+        )
+
+        return finished_replica_count == (self._context.get_group_size() - 1)
+
+    def has_records(self) -> bool:
+        return (self._data_queue is not None) and (0 < len(self._data_queue))
+
+    def get_consumer_lag(self) -> int:
+        """
+        :return: number of records written, but not yet read
+        """
+
+        statistics = self._resource.statistics
+
+        with self._resource.statistics_lock:
+            return statistics.written_record_count - statistics.queue_read_record_counts.get(self._data_queue_name, 0)
+
+    def _read_records(self) -> list[Any]:
+        if self._data_queue is None:
+            return []
+
+        entry = self._data_queue.poll()
+
+        if entry is None:
+            time.sleep(self._config_idle_sleep_sec)
+            return []
+
+        read_time_ns = time.perf_counter_ns()
+        statistics = self._resource.statistics
+
+        batches = []
+        record_count = 0
+        latency_samples = []
+
+        # Batches are passed as they were written, but they are merged up to the max poll records
+        while entry is not None:
+            write_time_ns, records = entry
+
+            if self._config_latency_tracking:
+                latency_samples.append((read_time_ns - write_time_ns, len(records)))
+
+            batches.append(records)
+            record_count += len(records)
+
+            if self._config_max_poll_records <= record_count:
+                break
+
+            entry = self._data_queue.poll()
+
+        output_records = batches[0] if 1 == len(batches) else concatenate_batches(batches)
+
+        with self._resource.statistics_lock:
+            statistics.queue_read_record_counts[self._data_queue_name] = \
+                statistics.queue_read_record_counts.get(self._data_queue_name, 0) + len(output_records)
+            statistics.last_read_time_ns = max(statistics.last_read_time_ns, read_time_ns)
+            statistics.latency_samples.extend(latency_samples)
+
+        return output_records
+
+    def _send_status_message(self, message: str) -> None:
+        self._resource.reader_status_stream.append(message)
+
+    def _retrieve_status_messages(self) -> Optional[list]:
+        retrieved_messages = self._resource.writer_status_stream[self._writer_status_position:]
+        self._writer_status_position += len(retrieved_messages)
+
+        # The principal needs to be aware of its replicas as well
+        if (1 < self._context.get_group_size()) and self._context.is_principal():
+            reader_messages = self._resource.reader_status_stream[self._reader_status_position:]
+            self._reader_status_position += len(reader_messages)
+            retrieved_messages.extend(reader_messages)
+
+        return retrieved_messages
+
+
+class MemoryChannelInputPort(ChannelInputPort):
+    """
+    Input port mirroring the KafkaChannelInputPort, but the data is transferred in-process.
+    Hence, it can only be used, if the connected operators are executed in the same process
+    e.g., by the PipelineExecutor.
+    """
+
+    def __init__(self, name: str = None, schema: Any = None, group_mode: bool = False, *args, **kwargs):
+        super().__init__(name, schema, group_mode, MemoryChannelReader, *args, **kwargs)
+
+
+class MemoryChannelOutputPort(ChannelOutputPort):
+    """
+    Output port mirroring the KafkaChannelOutputPort, but the data is transferred in-process.
+    """
+
+    def __init__(self, name: str = None, schema: Optional[Any] = None, *args, **kwargs):
+        super().__init__(name, schema, MemoryChannelWriter, *args, **kwargs)
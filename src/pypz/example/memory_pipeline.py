@@ -0,0 +1,78 @@
+# =============================================================================
+# Copyright (c) 2024 by Laszlo Anka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+"""
+This module provides the demo operators and pipelines with in-memory channels. Those
+can be executed by the PipelineExecutor without any broker, which makes it possible
+to measure the overhead of the framework isolated from the overhead of the broker.
+Notice that the PipelineExecutor executes only the principal operators, hence these
+pipelines have no replicas.
+"""
+
+from pypz.core.specs.pipeline import Pipeline
+
+from pypz.example.memory_io import MemoryChannelInputPort, MemoryChannelOutputPort
+from pypz.example.reader import DemoReaderOperator
+from pypz.example.rmq_pipeline import RMQDemoReaderOperator, RMQDemoWriterOperator
+from pypz.example.writer import DemoWriterOperator
+
+
+class MemoryDemoWriterOperator(DemoWriterOperator):
+    OutputPortType = MemoryChannelOutputPort
+
+
+class MemoryDemoReaderOperator(DemoReaderOperator):
+    InputPortType = MemoryChannelInputPort
+
+
+class MemoryRMQDemoWriterOperator(RMQDemoWriterOperator):
+    OutputPortType = MemoryChannelOutputPort
+
+
+class MemoryRMQDemoReaderOperator(RMQDemoReaderOperator):
+    InputPortType = MemoryChannelInputPort
+
+
+class MemoryDemoPipeline(Pipeline):
+    """
+    DemoPipeline with in-memory channels
+    """
+
+    def __init__(self, name: str, *args, **kwargs):
+        super().__init__(name, *args, **kwargs)
+
+        self.reader = MemoryDemoReaderOperator()
+        self.writer = MemoryDemoWriterOperator()
+
+        self.reader.input_port.connect(self.writer.output_port)
+
+        """ The location of the memory channels is only a namespace in the process """
+        self.set_parameter(">>channelLocation", "memory")
+
+
+class MemoryRMQDemoPipeline(Pipeline):
+    """
+    RMQDemoPipeline with in-memory channels
+    """
+
+    def __init__(self, name: str, *args, **kwargs):
+        super().__init__(name, *args, **kwargs)
+
+        self.reader = MemoryRMQDemoReaderOperator()
+        self.writer = MemoryRMQDemoWriterOperator()
+
+        self.reader.input_port.connect(self.writer.output_port)
+
+        self.set_parameter(">>channelLocation", "memory")
@@ -0,0 +1,223 @@
+# =============================================================================
+# Copyright (c) 2024 by Laszlo Anka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+import time
+from typing import Any, Optional
+
+from pypz.core.specs.plugin import InputPortPlugin
+
+from pypz.example.records import concatenate_batches
+
+
+class TokenBucket:
+    """
+    This class realizes a token bucket to pace the emission of records. Tokens
+    are refilled continuously with the specified rate up to the capacity of
+    the bucket, and each emitted record consumes one token. Since the refill
+    is continuous, the resulting rate is steady instead of bursting once per
+    second like a fixed sleep would.
+
+    :param rate: number of tokens refilled per second, non-positive value disables pacing
+    :param capacity: max number of tokens the bucket can hold, defaults to the rate
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self._rate: float = rate
+        """
+        Number of tokens refilled per second
+        """
+
+        self._capacity: float = max(1.0, float(rate if capacity is None else capacity))
+        """
+        Max number of tokens, which also limits the size of a burst
+        """
+
+        self._tokens: float = self._capacity
+        """
+        Number of currently available tokens
+        """
+
+        self._last_refill: float = time.monotonic()
+        """
+        Timestamp of the last refill
+        """
+
+    def is_enabled(self) -> bool:
+        return 0 < self._rate
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self._capacity, self._tokens + (now - self._last_refill) * self._rate)
+        self._last_refill = now
+
+    def acquire(self, count: int, max_wait_sec: float = 0) -> int:
+        """
+        Attempts to acquire the specified number of tokens. If there are not enough
+        tokens available, then it waits until either enough tokens are refilled or
+        the max wait time expires. In the latter case only the available tokens
+        will be acquired, which can be 0 as well.
+
+        :param count: number of tokens to acquire
+        :param max_wait_sec: max time to wait for the tokens
+        :return: number of acquired tokens
+        """
+
+        if not self.is_enabled():
+            return count
+
+        deadline = time.monotonic() + max_wait_sec
+
+        # It makes no sense to wait for more tokens than the bucket can hold
+        count = min(count, int(self._capacity))
+
+        self._refill()
+
+        while self._tokens < count:
+            remaining_time = deadline - time.monotonic()
+
+            if 0 >= remaining_time:
+                break
+
+            time.sleep(min(remaining_time, (count - self._tokens) / self._rate))
+
+            self._refill()
+
+        acquired = min(count, int(self._tokens))
+        self._tokens -= acquired
+
+        return acquired
+
+
+class IdleBackoff:
+    """
+    This class realizes an adaptive idle strategy for polling loops. The first few idle
+    iterations spin i.e., return immediately, since new data is likely to arrive soon.
+    Then the thread yields its time slice for a few iterations, and finally it sleeps
+    with exponentially increasing time up to the specified max. This way, a busy reader
+    reacts immediately, while an idle reader does not burn a core. The backoff shall be
+    reset, once data arrives.
+
+    :param spin_count: number of idle iterations without waiting
+    :param yield_count: number of idle iterations, which only yield the time slice
+    :param min_sleep_sec: sleep time of the first sleeping iteration
+    :param max_sleep_sec: max sleep time of an iteration
+    """
+
+    def __init__(self, spin_count: int = 100, yield_count: int = 10,
+                 min_sleep_sec: float = 0.001, max_sleep_sec: float = 0.1):
+        self._spin_count: int = spin_count
+        self._yield_count: int = yield_count
+        self._min_sleep_sec: float = min_sleep_sec
+        self._max_sleep_sec: float = max_sleep_sec
+
+        self._idle_count: int = 0
+        """
+        Number of idle iterations since the last reset
+        """
+
+    def is_sleeping(self) -> bool:
+        """
+        :return: True, if the next idle iteration would sleep
+        """
+        return (self._spin_count + self._yield_count) <= self._idle_count
+
+    def get_sleep_time_sec(self) -> float:
+        """
+        :return: the sleep time of the next idle iteration
+        """
+
+        if not self.is_sleeping():
+            return 0
+
+        # The exponent is limited to prevent overflow, the max sleep time is reached way before anyway
+        exponent = min(32, self._idle_count - self._spin_count - self._yield_count)
+
+        return min(self._max_sleep_sec, self._min_sleep_sec * (2 ** exponent))
+
+    def idle(self, max_wait_sec: Optional[float] = None) -> None:
+        """
+        Performs an idle iteration.
+
+        :param max_wait_sec: max time to sleep e.g., the remaining time of a timeout
+        """
+
+        if self._spin_count <= self._idle_count:
+            sleep_time_sec = self.get_sleep_time_sec()
+
+            if max_wait_sec is not None:
+                sleep_time_sec = min(sleep_time_sec, max(0.0, max_wait_sec))
+
+            # Notice that sleep(0) yields the time slice
+            time.sleep(sleep_time_sec)
+
+        self._idle_count += 1
+
+    def reset(self) -> None:
+        self._idle_count = 0
+
+
+def wait_and_retrieve(input_port: InputPortPlugin, timeout_ms: int, min_record_count: int = 1,
+                      idle_backoff: Optional[IdleBackoff] = None) -> Any:
+    """
+    Blocking version of the retrieve() method of the input ports. It retrieves the records
+    repeatedly until either at least the specified number of records are retrieved, the
+    timeout expires, or the port cannot retrieve anymore (i.e., all the writers finished).
+    Between the empty retrievals, the idle backoff is applied.
+
+    :param input_port: the input port to retrieve from
+    :param timeout_ms: max time to wait for the records
+    :param min_record_count: number of records to wait for
+    :param idle_backoff: the backoff applied between the empty retrievals, the state of it
+                         is kept between the calls, so a long idle reader stays in sleeping
+                         mode. A new one is created for every call, if not provided.
+    :return: the retrieved records, which is the result of retrieve() as is, if only one
+             retrieval returned records, otherwise the concatenation of the retrieved batches
+             i.e., a ColumnBatch, if every batch was a ColumnBatch, or the list of the records
+    """
+
+    if idle_backoff is None:
+        idle_backoff = IdleBackoff()
+
+    deadline = time.monotonic() + timeout_ms / 1000
+
+    retrieved_batches = []
+    retrieved_record_count = 0
+
+    while True:
+        records = input_port.retrieve()
+
+        if (records is not None) and (0 < len(records)):
+            idle_backoff.reset()
+            retrieved_batches.append(records)
+            retrieved_record_count += len(records)
+
+            if min_record_count <= retrieved_record_count:
+                break
+
+        remaining_time_sec = deadline - time.monotonic()
+
+        if 0 >= remaining_time_sec:
+            break
+
+        # The check is expensive for some channels, hence it is performed only before sleeping
+        if idle_backoff.is_sleeping() and (not input_port.can_retrieve()):
+            break
+
+        idle_backoff.idle(remaining_time_sec)
+
+    if 1 == len(retrieved_batches):
+        return retrieved_batches[0]
+
+    return concatenate_batches(retrieved_batches)
@@ -0,0 +1,222 @@
+# =============================================================================
+# Copyright (c) 2024 by Laszlo Anka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+"""
+This module implements a compiled representation of the parameter cascading. The
+Instance.set_parameter() resolves the templates and walks the nested instances on every
+call. The replicas of an operator are nested instances of the pipeline as well, but they
+route every call to the original, hence a cascaded parameter e.g., ">>channelLocation"
+is set on the original operator and on its plugins once per replica i.e., 51 times for
+a replication factor of 50.
+
+The ParameterTable walks the instance tree once and stores every distinct instance in a
+flat, indexed table, where the replicas and their plugins are mapped to the entries of
+the original. The targets of a cascaded parameter name are calculated once and cached,
+the value is resolved once and only the instances are updated, where the value
+actually changes:
+
+    parameter_table = ParameterTable(pipeline)
+    parameter_table.set_parameter(">>channelLocation", "KAFKA_BROKER_URL")
+
+The cached targets are invalidated, if the structure of the tree changes e.g., if the
+replication factor of an operator is updated.
+"""
+
+from typing import Any, Optional
+
+from pypz.core.commons.parameters import allowed_param_types
+from pypz.core.commons.utils import TemplateResolver, is_type_allowed
+from pypz.core.specs.instance import Instance
+from pypz.core.specs.operator import Operator
+from pypz.core.specs.utils import ExcludedCascadingParameterPrefix, IncludedCascadingParameterPrefix, Internals
+
+StructuralParameterNames = {"replicationFactor"}
+"""
+Parameters, which change the nested instances, hence invalidate the compiled targets
+"""
+
+
+class ParameterTable:
+    """
+    Flat table of the distinct instances of an instance tree to set cascaded parameters
+    without redundant work.
+
+    :param instance: the root of the tree, usually the pipeline
+    """
+
+    def __init__(self, instance: Instance):
+        self.instance: Instance = instance
+
+        self._instances: list[Instance] = []
+        """
+        Distinct instances, the root has the index 0
+        """
+
+        self._nested_indices: list[list[int]] = []
+        """
+        Indices of the nested instances per instance, the replicas are excluded
+        """
+
+        self._indices_by_name: dict[str, int] = {}
+        """
+        Index by full name, the names of the replicas and of their plugins are mapped to the
+        index of the original
+        """
+
+        self._targets: dict[tuple[int, str], list[tuple[int, str]]] = {}
+        """
+        Cache of the (instance index, parameter name) targets by (instance index, cascaded name)
+        """
+
+        self._structure_key: tuple = ()
+
+        self._template_resolver: TemplateResolver = TemplateResolver("${", "}")
+
+        self.compile()
+
+    def _calculate_structure_key(self) -> tuple:
+        return tuple(len(Internals(instance).nested_instances) for instance in self._instances)
+
+    def compile(self) -> None:
+        """
+        Walks the instance tree and rebuilds the table. It is called automatically, if the
+        structure changes.
+        """
+
+        self._instances = []
+        self._nested_indices = []
+        self._indices_by_name = {}
+        self._targets = {}
+
+        self._add_instance(self.instance)
+
+        # The replicas are resolved after the walk, since their originals shall be indexed
+        for instance in list(self._instances):
+            if isinstance(instance, Operator) and instance.is_principal():
+                for replica in instance.get_replicas():
+                    self._add_replica_names(replica, instance)
+
+        self._structure_key = self._calculate_structure_key()
+
+    def _add_instance(self, instance: Instance) -> int:
+        index = len(self._instances)
+
+        self._instances.append(instance)
+        self._nested_indices.append([])
+        self._indices_by_name[instance.get_full_name()] = index
+
+        for nested_instance in Internals(instance).nested_instances.values():
+            if not isinstance(nested_instance, Operator.Replica):
+                self._nested_indices[index].append(self._add_instance(nested_instance))
+
+        return index
+
+    def _add_replica_names(self, replica: Operator.Replica, original: Operator) -> None:
+        original_index = self._indices_by_name[original.get_full_name()]
+
+        self._indices_by_name[replica.get_full_name()] = original_index
+
+        for nested_index in self._nested_indices[original_index]:
+            self._indices_by_name[f"{replica.get_full_name()}.{self._instances[nested_index].get_simple_name()}"] = \
+                nested_index
+
+    def _calculate_targets(self, index: int, name: str) -> list[tuple[int, str]]:
+        """
+        Same cascading logic as in Instance.set_parameter() with deduplication.
+        """
+
+        targets = self._targets.get((index, name))
+
+        if targets is not None:
+            return targets
+
+        targets = []
+
+        if name.startswith(ExcludedCascadingParameterPrefix):
+            for nested_index in self._nested_indices[index]:
+                targets.extend(self._calculate_targets(nested_index, name[1:]))
+        elif name.startswith(IncludedCascadingParameterPrefix):
+            targets.append((index, name.replace(IncludedCascadingParameterPrefix, "")
+                            .replace(ExcludedCascadingParameterPrefix, "")))
+            for nested_index in self._nested_indices[index]:
+                targets.extend(self._calculate_targets(nested_index, name[1:]))
+        else:
+            targets.append((index, name))
+
+        targets = list(dict.fromkeys(targets))
+
+        self._targets[(index, name)] = targets
+
+        return targets
+
+    def get_index(self, full_name: str) -> int:
+        """
+        :param full_name: full name of an instance or of a replica
+        :return: index of the instance in the table
+        """
+
+        return self._indices_by_name[full_name]
+
+    def get_parameter(self, full_name: str, name: str, default: Any = None) -> Any:
+        """
+        :param full_name: full name of an instance or of a replica
+        :param name: name of the parameter
+        :param default: returned, if the parameter is not set
+        :return: the current value of the parameter
+        """
+
+        instance = self._instances[self._indices_by_name[full_name]]
+
+        return instance.get_parameter(name) if instance.has_parameter(name) else default
+
+    def set_parameter(self, name: str, value: Any, full_name: Optional[str] = None) -> int:
+        """
+        Sets the parameter like Instance.set_parameter() would do.
+
+        :param name: name of the parameter including the cascading prefixes
+        :param value: value of the parameter
+        :param full_name: full name of the instance, by default the root
+        :return: number of instances, where the parameter has been changed
+        """
+
+        if self._structure_key != self._calculate_structure_key():
+            self.compile()
+
+        resolved_value = self._template_resolver.resolve(value)
+
+        if not is_type_allowed(resolved_value, allowed_param_types):
+            raise TypeError(f"Invalid parameter value type for '{name}': {type(resolved_value)}. "
+                            f"Allowed types: {allowed_param_types}")
+
+        index = 0 if full_name is None else self._indices_by_name[full_name]
+
+        changed_count = 0
+
+        for target_index, param_name in self._calculate_targets(index, name):
+            instance = self._instances[target_index]
+
+            if instance.has_parameter(param_name) and (instance.get_parameter(param_name) == resolved_value):
+                continue
+
+            instance.set_parameter(param_name, resolved_value)
+            changed_count += 1
+
+            if param_name in StructuralParameterNames:
+                self._structure_key = ()
+
+        return changed_count
+
+    def set_parameters(self, parameters: dict, full_name: Optional[str] = None) -> int:
+        return sum(self.set_parameter(name, value, full_name) for name, value in parameters.items())
@@ -0,0 +1,215 @@
+# =============================================================================
+# Copyright (c) 2024 by Laszlo Anka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+"""
+This module contains the port plugins of the examples. The ports refer to their channel
+reader and writer implementations by name, which are resolved, once the port creates the
+channel i.e., at execution. This way, the transport libraries (kafka-python, avro, amqp)
+and the pypz transport plugins are not imported, if the pipeline is only created e.g.,
+to deploy it, to print the parameter schema or to execute an operator, which does not
+use that transport.
+
+Notice that the spec name of a port is its location in this module e.g.,
+"pypz.example.ports:SchemaKafkaChannelInputPort", hence the configurations created
+with the ports located in kafka_io.py or rmq_io.py shall be recreated.
+"""
+
+import importlib
+import json
+from typing import Any, Optional, Union
+
+from pypz.abstracts.channel_ports import ChannelInputPort, ChannelOutputPort
+from pypz.core.commons.parameters import OptionalParameter
+
+from pypz.example.records import DictRecordType
+
+
+def resolve_class(class_name: str) -> type:
+    """
+    :param class_name: name of the class in the same format as in the instance specs
+                       i.e., "module:class" e.g., "pypz.example.kafka_io:SchemaKafkaChannelReader"
+    :return: the class
+    """
+
+    module_name, qualified_name = class_name.split(":")
+
+    resolved = importlib.import_module(module_name)
+    for attribute_name in qualified_name.split("."):
+        resolved = getattr(resolved, attribute_name)
+
+    return resolved
+
+
+class LazyClass:
+    """
+    Placeholder of a class, which is imported at the first call. It can be used as
+    channel reader and writer type of the ports, since the ports only call them.
+
+    :param class_name: name of the class in "module:class" format
+    """
+
+    def __init__(self, class_name: str):
+        self.class_name: str = class_name
+
+        self._resolved_class: Optional[type] = None
+
+    def resolve(self) -> type:
+        if self._resolved_class is None:
+            self._resolved_class = resolve_class(self.class_name)
+
+        return self._resolved_class
+
+    def __call__(self, *args, **kwargs) -> Any:
+        return self.resolve()(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        return f"LazyClass({self.class_name})"
+
+
+def get_projected_field_names(projection: Union[list[str], str]) -> list[str]:
+    """
+    :param projection: list of field names or a reader schema as JSON string, whose fields
+                       are a subset of the writer schema's fields
+    :return: the field names of the projection
+    """
+
+    if isinstance(projection, str):
+        return [field["name"] for field in json.loads(projection)["fields"]]
+
+    return list(projection)
+
+
+class SchemaKafkaChannelInputPort(ChannelInputPort):
+    """
+    Drop-in replacement of the KafkaChannelInputPort using the schema registry.
+
+    If only some fields of the records are needed, the port can be created with a projection
+    i.e., a list of field names or a reader schema. The other fields are skipped at byte
+    level by the decoder, hence they are neither decoded nor kept in memory. The types of
+    the fields are always the ones of the writer schema, i.e. the reader schema only selects
+    the fields. The projection can be changed by the parameter "projectedFields" as well.
+
+        self.input_port = SchemaKafkaChannelInputPort(schema=WideSchema, projection=["id", "text"])
+
+    The records are retrieved as dicts by default. To reduce the memory of large batches, they
+    can be retrieved as rows or as ColumnBatch instead, see records.py and the parameter
+    "recordType".
+    """
+
+    ChannelReaderType = LazyClass("pypz.example.kafka_io:SchemaKafkaChannelReader")
+
+    projected_fields = OptionalParameter(list, alt_name="projectedFields",
+                                         description="Name of the record fields to be decoded, the other "
+                                                     "fields are skipped. None decodes every field")
+    record_type = OptionalParameter(str, alt_name="recordType",
+                                    description="Representation of the retrieved records: 'dict', 'row' "
+                                                "(tuple with named fields) or 'columns' (ColumnBatch)")
+
+    def __init__(self, name: str = None, schema: Any = None, group_mode: bool = False, *args,
+                 projection: Optional[Union[list[str], str]] = None, record_type: str = DictRecordType, **kwargs):
+        super().__init__(name, schema, group_mode, self.ChannelReaderType, *args, **kwargs)
+
+        self.projected_fields = None if projection is None else get_projected_field_names(projection)
+
+        self.record_type = record_type
+
+
+class CompressionChannelOutputPort(ChannelOutputPort):
+    """
+    Base of the output ports, which compress the batches, see compression.py. The compression
+    is specified by the parameter "compression": "none", "gzip", "lz4", "zstd" (optionally
+    with level e.g., "zstd:9") or "adaptive". In adaptive mode, the codec is selected by the
+    compression ratio and encoding cost sampled from the batches and by the parameter
+    "networkBandwidthMbps". The statistics of the compression are exposed in the health
+    check payload of the channels, hence they are visible in the sniffer.
+    """
+
+    compression = OptionalParameter(str, description="Compression of the batches: 'none', 'gzip', 'lz4', 'zstd' "
+                                                     "with optional level (e.g., 'zstd:9') or 'adaptive'")
+    network_bandwidth_mbps = OptionalParameter(int, alt_name="networkBandwidthMbps",
+                                               description="Network bandwidth in Mbit/s between the operators, "
+                                                           "used to select the codec in adaptive mode")
+
+    def __init__(self, name: str = None, schema: Optional[Any] = None, channel_writer_type: Any = None, *args,
+                 compression: str = "none", **kwargs):
+        super().__init__(name, schema, channel_writer_type, *args, **kwargs)
+
+        self.compression = compression
+
+        self.network_bandwidth_mbps = 1000
+
+
+class SchemaKafkaChannelOutputPort(CompressionChannelOutputPort):
+    """
+    Drop-in replacement of the KafkaChannelOutputPort using the schema registry. Besides
+    the list of dicts, it accepts the list of rows and the ColumnBatch, see records.py.
+    The batches are compressed by the Kafka producer, see the parameter "compression".
+    """
+
+    def __init__(self, name: str = None, schema: Optional[Any] = None, *args, **kwargs):
+        super().__init__(name, schema, LazyClass("pypz.example.kafka_io:SchemaKafkaChannelWriter"), *args, **kwargs)
+
+
+class PartitionedKafkaChannelInputPort(SchemaKafkaChannelInputPort):
+    """
+    Drop-in replacement of the KafkaChannelInputPort, which can consume multiple partitions
+    in parallel. Use the channel configuration "consumer_worker_count" to specify the number
+    of partitions and workers per replica.
+    """
+
+    ChannelReaderType = LazyClass("pypz.example.kafka_io:PartitionedKafkaChannelReader")
+
+
+class FlowControlRMQChannelInputPort(ChannelInputPort):
+    """
+    Drop-in replacement of the RMQChannelInputPort with configurable prefetch window.
+    """
+
+    def __init__(self, name: str = None, schema: Any = None, group_mode: bool = False, *args, **kwargs):
+        super().__init__(name, schema, group_mode, LazyClass("pypz.example.rmq_io:FlowControlRMQChannelReader"),
+                         *args, **kwargs)
+
+
+class FlowControlRMQChannelOutputPort(ChannelOutputPort):
+    """
+    Drop-in replacement of the RMQChannelOutputPort with publisher confirms and credit based
+    backpressure, see FlowControlRMQChannelWriter for the channel configuration.
+    """
+
+    def __init__(self, name: str = None, schema: Optional[Any] = None, *args, **kwargs):
+        super().__init__(name, schema, LazyClass("pypz.example.rmq_io:FlowControlRMQChannelWriter"), *args, **kwargs)
+
+
+class FrameRMQChannelInputPort(ChannelInputPort):
+    """
+    Drop-in replacement of the RMQChannelInputPort to receive binary frames. The retrieve()
+    method returns a list-like view of the records as memoryview objects. Use bytes(record),
+    if the record shall be stored beyond the processing of the current batch.
+    """
+
+    def __init__(self, name: str = None, group_mode: bool = False, *args, **kwargs):
+        super().__init__(name, None, group_mode, LazyClass("pypz.example.rmq_io:FrameRMQChannelReader"),
+                         *args, **kwargs)
+
+
+class FrameRMQChannelOutputPort(CompressionChannelOutputPort):
+    """
+    Drop-in replacement of the RMQChannelOutputPort to send the batches of binary records
+    as frames. The send() method accepts bytes, bytearray, memoryview and str records.
+    The frames can be compressed, see the parameter "compression".
+    """
+
+    def __init__(self, name: str = None, *args, **kwargs):
+        super().__init__(name, None, LazyClass("pypz.example.rmq_io:FrameRMQChannelWriter"), *args, **kwargs)
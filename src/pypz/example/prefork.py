@@ -0,0 +1,309 @@
+# =============================================================================
+# Copyright (c) 2024 by Laszlo Anka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+import argparse
+import gc
+import importlib
+import json
+import os
+import signal
+import sys
+import time
+import traceback
+from typing import Any, Optional
+
+"""
+This module implements a pre-fork launcher for the operator replicas. The standard
+startup (pypz-startup.sh -> pypz.runnables.operator) imports pypz, the plugins and the
+example modules and builds the entire pipeline from the configuration in every replica
+from scratch. The launcher does it only once, then forks one worker process per
+replica, so the workers start with everything imported and built and share those
+memory pages copy-on-write with the launcher:
+
+    python -m pypz.example.prefork pipeline.yml reader --group-indices 0 1 2 --timings-output timings.json
+
+The time spent in each phase (import, parse, build, fork) is reported and each worker
+reports the time from the fork until its executor was ready.
+
+Notice that only the stdlib is imported at module level, so the import phase can be
+measured. Notice as well that the launcher shall be started before any other thread,
+since the threads are not inherited by the forked workers.
+"""
+
+CoreModuleNames = (
+    "yaml",
+    "pypz.core.specs.pipeline",
+    "pypz.executors.operator.executor",
+    "pypz.example.specs",
+)
+"""
+Modules imported by every operator regardless of the pipeline configuration
+"""
+
+
+def collect_spec_module_names(instance_dto: dict) -> list[str]:
+    """
+    :param instance_dto: dict representation of an instance DTO
+    :return: name of the modules, where the classes of the instance and its nested
+             instances are located (e.g., "pypz.example.reader:DemoReaderOperator")
+    """
+
+    module_names = []
+
+    spec_name = instance_dto.get("spec", {}).get("name")
+    if (spec_name is not None) and (":" in spec_name):
+        module_names.append(spec_name.split(":")[0])
+
+    for nested_instance_dto in instance_dto.get("spec", {}).get("nestedInstances") or []:
+        module_names.extend(collect_spec_module_names(nested_instance_dto))
+
+    return list(dict.fromkeys(module_names))
+
+
+def preload_modules(module_names: list[str] | tuple[str, ...]) -> dict[str, float]:
+    """
+    Imports the specified modules.
+
+    :param module_names: modules to import
+    :return: import time per module in seconds. Notice that the time of a module
+             includes its dependencies, if they were not imported before.
+    """
+
+    import_times = {}
+
+    for module_name in module_names:
+        start_time = time.perf_counter()
+        importlib.import_module(module_name)
+        import_times[module_name] = time.perf_counter() - start_time
+
+    return import_times
+
+
+class PreforkLauncher:
+    """
+    Builds the pipeline once and executes the specified replicas of an operator in forked
+    worker processes. The group index 0 is the principal, the group index i is the (i-1)th
+    replica, so the indices match the ones in the channel names and in the logs.
+
+    :param config_source: pipeline configuration in YAML or in the compact format
+    :param operator_name: simple name of the original operator
+    :param group_indices: group indices of the replicas to be executed, None means all
+    :param exec_mode: value of the ExecutionMode
+    :param preload_module_names: additional modules to import before the build
+    """
+
+    def __init__(self, config_source: str, operator_name: str, group_indices: Optional[list[int]] = None,
+                 exec_mode: str = "Standard", preload_module_names: Optional[list[str]] = None):
+        self.config_source: str = config_source
+        self.operator_name: str = operator_name
+        self.group_indices: Optional[list[int]] = group_indices
+        self.exec_mode: str = exec_mode
+        self.preload_module_names: list[str] = preload_module_names or []
+
+        self.phase_times: dict[str, float] = {}
+        """
+        Time spent in the launcher's phases in seconds
+        """
+
+        self.import_times: dict[str, float] = {}
+
+        self.worker_results: dict[str, dict[str, Any]] = {}
+        """
+        Reported timings and exit code per replica name
+        """
+
+        self._operators: list[Any] = []
+        """
+        Materialized replicas to be executed, one per worker
+        """
+
+        self._worker_pids: dict[int, str] = {}
+
+    def prepare(self) -> None:
+        """
+        Imports every required module and builds the pipeline and the replicas, so
+        the workers have nothing left, but to start the executor.
+        """
+
+        self.import_times.update(preload_modules(CoreModuleNames))
+
+        from pypz.core.specs.dtos import PipelineInstanceDTO
+        from pypz.core.specs.pipeline import Pipeline
+        from pypz.core.specs.utils import Internals
+        from pypz.example.specs import parse_spec
+
+        start_time = time.perf_counter()
+        pipeline_dto = parse_spec(self.config_source)
+        self.phase_times["parse"] = time.perf_counter() - start_time
+
+        self.import_times.update(preload_modules(
+            [module_name for module_name in collect_spec_module_names(pipeline_dto) + self.preload_module_names
+             if module_name not in sys.modules]
+        ))
+        self.phase_times["import"] = sum(self.import_times.values())
+
+        start_time = time.perf_counter()
+
+        pipeline = Pipeline.create_from_dto(PipelineInstanceDTO(**pipeline_dto), mock_nonexistent=True)
+        operator = Internals(pipeline).nested_instances[self.operator_name]
+
+        group = [operator, *operator.get_replicas()]
+        group_indices = range(len(group)) if self.group_indices is None else self.group_indices
+
+        # The materialization is done here, otherwise every executor would do it
+        self._operators = [group[index] if 0 == index else group[index].materialize() for index in group_indices]
+
+        self.phase_times["build"] = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+
+        # Moves the objects into the permanent generation, so the garbage collection in
+        # the workers does not touch, hence does not copy the shared pages
+        gc.collect()
+        gc.freeze()
+
+        self.phase_times["freeze"] = time.perf_counter() - start_time
+
+    def _execute_worker(self, operator: Any, report_fd: int, fork_time: float) -> int:
+        from pypz.executors.commons import ExecutionMode
+        from pypz.executors.operator.executor import OperatorExecutor
+
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+        executor = OperatorExecutor(operator)
+
+        os.write(report_fd, (json.dumps({
+            "name": operator.get_simple_name(),
+            "pid": os.getpid(),
+            "forkToReadySec": time.perf_counter() - fork_time,
+        }) + "\n").encode())
+        os.close(report_fd)
+
+        return executor.execute(ExecutionMode(self.exec_mode))
+
+    def _forward_signal(self, system_signal: int, _frame) -> None:
+        for pid in self._worker_pids:
+            try:
+                os.kill(pid, system_signal)
+            except ProcessLookupError:
+                pass
+
+    def launch(self) -> int:
+        """
+        Forks the workers and waits for them.
+
+        :return: the first non-zero exit code of the workers or 0
+        """
+
+        if 0 == len(self._operators):
+            self.prepare()
+
+        report_read_fd, report_write_fd = os.pipe()
+
+        start_time = time.perf_counter()
+
+        for operator in self._operators:
+            fork_time = time.perf_counter()
+            pid = os.fork()
+
+            if 0 == pid:
+                os.close(report_read_fd)
+                exit_code = 1
+                try:
+                    exit_code = self._execute_worker(operator, report_write_fd, fork_time)
+                except BaseException:
+                    traceback.print_exc()
+                finally:
+                    sys.stdout.flush()
+                    sys.stderr.flush()
+                    # The worker shall not return into the launcher's code
+                    os._exit(exit_code)
+
+            self._worker_pids[pid] = operator.get_simple_name()
+            self.worker_results[operator.get_simple_name()] = {"pid": pid}
+
+        os.close(report_write_fd)
+
+        self.phase_times["fork"] = time.perf_counter() - start_time
+
+        signal.signal(signal.SIGTERM, self._forward_signal)
+        signal.signal(signal.SIGINT, self._forward_signal)
+
+        # Reads the reports until every worker has written or closed the pipe
+        with os.fdopen(report_read_fd) as report_file:
+            for report_line in report_file:
+                report = json.loads(report_line)
+                self.worker_results[report["name"]]["forkToReadySec"] = report["forkToReadySec"]
+
+        self.phase_times["workersReady"] = time.perf_counter() - start_time
+
+        exit_codes = []
+
+        while 0 < len(self._worker_pids):
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+
+            exit_code = os.waitstatus_to_exitcode(status)
+            self.worker_results[self._worker_pids.pop(pid)]["exitCode"] = exit_code
+            exit_codes.append(exit_code)
+
+        return next((exit_code for exit_code in exit_codes if 0 != exit_code), 0)
+
+    def get_timings(self) -> dict:
+        return {
+            "operatorName": self.operator_name,
+            "workerCount": len(self._operators),
+            "phaseTimesSec": self.phase_times,
+            "importTimesSec": self.import_times,
+            "workers": self.worker_results,
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Executes the replicas of an operator in forked processes")
+    parser.add_argument("config_path", help="Path of the pipeline configuration (YAML or compact format)")
+    parser.add_argument("operator_name", help="Simple name of the original operator")
+    parser.add_argument("--group-indices", type=int, nargs="+",
+                        help="Group indices of the replicas to execute (0 is the principal), default is all")
+    parser.add_argument("--exec-mode", default="Standard")
+    parser.add_argument("--preload", nargs="*", default=[], help="Additional modules to import before the build")
+    parser.add_argument("--timings-output", help="Path of a JSON file to store the timings")
+    arguments = parser.parse_args()
+
+    with open(arguments.config_path) as config_file:
+        launcher = PreforkLauncher(config_file.read(), arguments.operator_name, arguments.group_indices,
+                                   arguments.exec_mode, arguments.preload)
+
+    launcher.prepare()
+
+    launcher_exit_code = launcher.launch()
+
+    timings = launcher.get_timings()
+
+    print(f"Operator: {timings['operatorName']}; Workers: {timings['workerCount']}")
+    for phase_name, phase_time in timings["phaseTimesSec"].items():
+        print(f"  {phase_name}: {phase_time * 1000:.1f} ms")
+    for worker_name, worker_result in timings["workers"].items():
+        print(f"  {worker_name}: ready after {worker_result.get('forkToReadySec', float('nan')) * 1000:.1f} ms; "
+              f"exit code {worker_result.get('exitCode')}")
+
+    if arguments.timings_output is not None:
+        with open(arguments.timings_output, "w") as timings_file:
+            json.dump(timings, timings_file, indent=2)
+
+    sys.exit(launcher_exit_code)
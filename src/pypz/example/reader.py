@@ -13,12 +13,19 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 # =============================================================================
+import logging
 from typing import Optional, Any
 
 from pypz.core.commons.parameters import OptionalParameter
 from pypz.core.specs.operator import Operator
-from pypz.plugins.kafka_io.ports import KafkaChannelInputPort
-from pypz.plugins.loggers.default import DefaultLoggerPlugin
+
+from pypz.example.checkpoint import CheckpointPlugin
+from pypz.example.columnar import retrieve_field_names, to_columns
+from pypz.example.instrumentation import InstrumentationPlugin
+from pypz.example.ports import PartitionedKafkaChannelInputPort
+from pypz.example.loggers import AsyncLoggerPlugin, is_log_level_enabled
+from pypz.example.pacing import IdleBackoff, wait_and_retrieve
+from pypz.example.schemas import DemoRecordSchemaString
 
 
 class DemoReaderOperator(Operator):
@@ -27,17 +34,11 @@ class DemoReaderOperator(Operator):
     operator and logs it to the stdout.
     """
 
-    AvroSchemaString = """
-    {
-        "type": "record",
-        "name": "DemoRecord",
-        "fields": [
-            {
-                "name": "text",
-                "type": "string"
-            }
-        ]
-    }
+    AvroSchemaString = DemoRecordSchemaString
+
+    InputPortType = PartitionedKafkaChannelInputPort
+    """
+    Type of the input port, subclasses can override it to use a different channel technology
     """
 
     raise_error_after_record_count = OptionalParameter(int,
@@ -45,11 +46,23 @@ class DemoReaderOperator(Operator):
                                                        description="If set to a non-negative value, the operator will"
                                                                    "raise an error after it received the specified"
                                                                    "number of records")
+    columnar_mode_enabled = OptionalParameter(bool,
+                                              alt_name="columnarModeEnabled",
+                                              description="If set to True, the retrieved records will be converted "
+                                                          "into columns and processed as batch by process_batch()")
+    retrieve_timeout_ms = OptionalParameter(int, alt_name="retrieveTimeoutMs",
+                                            description="Specifies, how long an iteration waits for records")
+    min_retrieve_record_count = OptionalParameter(int, alt_name="minRetrieveRecordCount",
+                                                  description="Specifies the number of records an iteration "
+                                                              "waits for, before the timeout expires")
+    max_idle_sleep_ms = OptionalParameter(int, alt_name="maxIdleSleepMs",
+                                          description="Specifies the max sleep time between two retrievals, "
+                                                      "if no records available")
 
     def __init__(self, name: str = None, *args, **kwargs):
         super().__init__(name, *args, **kwargs)
 
-        self.input_port = KafkaChannelInputPort(schema=DemoReaderOperator.AvroSchemaString)
+        self.input_port = self.InputPortType(schema=DemoReaderOperator.AvroSchemaString)
         """
         An input port enables the operator to receive data from other operators' output port.
         The connection is usually established on the pipeline level.
@@ -57,10 +70,24 @@ class DemoReaderOperator(Operator):
         will use the variable's name as operator instance name.
         """
 
-        self.logger = DefaultLoggerPlugin()
+        self.logger = AsyncLoggerPlugin()
+        """
+        A logger plugin enables the framework to handle logs from the framework. The async
+        logger puts the messages to stdout from a background thread, so logging does not
+        block the processing.
+        """
+
+        self.instrumentation = InstrumentationPlugin()
         """
-        A logger plugin enables the framework to handle logs from the framework. The default
-        logger puts the messages to stdout.
+        The instrumentation plugin measures the hot path of the operator. The metrics can be
+        exposed via HTTP (parameter "port") or file (parameter "exportFilePath").
+        """
+
+        self.checkpoint = CheckpointPlugin()
+        """
+        The checkpoint plugin persists the received record count and the input offsets, so a
+        restarted operator continues, where it stopped. It is enabled by the parameter
+        "storeLocation".
         """
 
         self.logger.set_parameter("logLevel", "DEBUG")
@@ -75,11 +102,52 @@ class DemoReaderOperator(Operator):
 
         self.raise_error_after_record_count = None
 
+        self.columnar_mode_enabled = False
+        """
+        By default, the records are processed one by one.
+        """
+
+        self.retrieve_timeout_ms = 1000
+        """
+        By default, an iteration waits at most 1 second for records, so the executor gets
+        the control back regularly.
+        """
+
+        self.min_retrieve_record_count = 1
+
+        self.max_idle_sleep_ms = 100
+
+        self._idle_backoff: Optional[IdleBackoff] = None
+        """
+        Keeps the idle state between the iterations, so an idle reader keeps sleeping
+        instead of polling. It is created at init, since the parameters are not yet
+        known at construction time.
+        """
+
+        self._debug_enabled: bool = False
+        """
+        Set at init from the level of the logger plugin, so the records are only
+        prepared for logging, if they are logged
+        """
+
+        self._field_names: list[str] = retrieve_field_names(DemoReaderOperator.AvroSchemaString)
+        """
+        Name of the record fields, which will be converted into columns in columnar mode
+        """
+
     def _on_init(self) -> bool:
         """
         This method shall implement the logic to initialize the operation.
         :return: True succeeded, False if more iteration required (to not block the execution)
         """
+        self._idle_backoff = IdleBackoff(max_sleep_sec=self.max_idle_sleep_ms / 1000)
+        self._debug_enabled = is_log_level_enabled(self.logger, logging.DEBUG)
+
+        # If the input port projects the records, only the projected fields are available
+        projected_fields = getattr(self.input_port, "projected_fields", None)
+        if projected_fields is not None:
+            self._field_names = [field_name for field_name in self._field_names if field_name in projected_fields]
+
         return True
 
     def _on_running(self) -> Optional[bool]:
@@ -88,7 +156,11 @@ class DemoReaderOperator(Operator):
         :return: True succeeded, False if more iteration required (to not block the execution), None if
         framework shall decide
         """
-        records = self.input_port.retrieve()
+        """ Instead of returning immediately, if no records available, the retrieval
+            waits for the records with adaptive backoff, so idle readers do not
+            burn the CPU by polling. """
+        records = wait_and_retrieve(self.input_port, self.retrieve_timeout_ms,
+                                    self.min_retrieve_record_count, self._idle_backoff)
 
         self.received_record_count += len(records)
 
@@ -97,14 +169,44 @@ class DemoReaderOperator(Operator):
             raise BrokenPipeError(f"Test error after received the specified record count: "
                                   f"{self.raise_error_after_record_count} / {self.received_record_count}")
 
-        for record in records:
-            self.get_logger().debug(f"Received record: {record}")
+        if self.columnar_mode_enabled:
+            if 0 < len(records):
+                self.process_batch(to_columns(records, self._field_names))
+        elif self._debug_enabled:
+            # The loop is skipped entirely, if it would not log anything
+            for record in records:
+                self.get_logger().debug("Received record: %s", record)
 
         return None
 
         # Returning None is equivalent to the following:
         # return not self.input_port.can_retrieve()
 
+    def process_batch(self, columns: dict[str, Any]) -> None:
+        """
+        This method shall implement the vectorized processing logic in columnar mode.
+        It is called once per retrieved batch, hence per-batch summary shall be logged
+        instead of per-record information.
+        :param columns: dict, where key is the field name and value is the column (NumPy array, if available)
+        """
+        texts = columns["text"]
+
+        self.get_logger().debug("Received batch: %d records; First: %s; Last: %s", len(texts), texts[0], texts[-1])
+
+    def get_checkpoint_state(self) -> dict:
+        """
+        This method is called by the CheckpointPlugin to capture the state of the operator.
+        :return: JSON serializable state
+        """
+        return {"receivedRecordCount": self.received_record_count}
+
+    def restore_checkpoint_state(self, state: dict) -> None:
+        """
+        This method is called by the CheckpointPlugin to restore the state after restart.
+        :param state: the state returned by get_checkpoint_state()
+        """
+        self.received_record_count = state["receivedRecordCount"]
+
     def _on_shutdown(self) -> bool:
         """
         This method shall implement the logic to shut down the operation.
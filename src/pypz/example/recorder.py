@@ -0,0 +1,461 @@
+# =============================================================================
+# Copyright (c) 2024 by Laszlo Anka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+import argparse
+import array
+import concurrent.futures
+import datetime
+import functools
+import os
+import struct
+import threading
+import time
+from typing import Any, Iterator, Optional
+
+from pypz.abstracts.channel_ports import ChannelInputPort, ChannelOutputPort
+from pypz.core.channels.status import ChannelStatus, ChannelStatusMessage
+from pypz.core.specs.pipeline import Pipeline
+from pypz.core.specs.utils import Internals
+from pypz.sniffer.sniffer import ChannelSniffer, PipelineSniffer
+
+"""
+This module implements a headless alternative of the PipelineSnifferViewer. The recorder
+samples the status messages of every port of every replica at the specified interval and
+appends the changed values into a compact binary file, which can be replayed offline:
+
+    python -m pypz.example.recorder record --config pipeline.yml --output pipeline.pzsr --interval-sec 5
+    python -m pypz.example.recorder replay pipeline.pzsr
+
+The recording is a sequence of entries:
+
+    | "S" | series id (uint16) | name length (uint16) | name |   -> declares a series
+    | "T" | timestamp in ms (int64) |                          -> starts a sample
+    | "V" | series id (uint16) | value (float64) |             -> value of the series in the sample
+
+A series is a metric of a port e.g., "pipeline.reader_0.input_port#receivedRecordCount".
+The status of the ports is stored in the series "<port>#status" as the index of the
+ChannelStatus. Only the values changed since the previous sample are written, the
+file is never rewritten, so it can be read, while it is being recorded, and a new
+recorder continues the existing file.
+"""
+
+RecordingMagic = b"PZSR1\n"
+
+SeriesEntryType = b"S"
+SampleEntryType = b"T"
+ValueEntryType = b"V"
+
+SeriesEntryHeader = struct.Struct("<HH")
+SampleEntryBody = struct.Struct("<q")
+ValueEntryBody = struct.Struct("<Hd")
+
+StatusMetricName = "status"
+
+ChannelStatuses = list(ChannelStatus)
+
+StateChannelStatuses = (ChannelStatus.Opened, ChannelStatus.Started, ChannelStatus.Stopped,
+                        ChannelStatus.Closed, ChannelStatus.Error)
+"""
+Statuses, which change the state of the port. The other messages e.g., HealthCheck,
+only carry payload.
+"""
+
+
+def iterate_entries(content: bytes | memoryview) -> Iterator[tuple[bytes, int, Any, int]]:
+    """
+    Parses the entries of the recording. Notice that an incomplete entry at the end of the
+    content e.g., which is being written at the moment, is ignored.
+
+    :param content: content of the recording
+    :return: iterator of (entry type, series id or timestamp in ms, series name or value,
+             end offset of the entry) tuples
+    """
+
+    content = memoryview(content)
+
+    if RecordingMagic != bytes(content[:len(RecordingMagic)]):
+        raise ValueError("Not a recording, magic not found")
+
+    position = len(RecordingMagic)
+
+    try:
+        while position < len(content):
+            entry_type = bytes(content[position:position + 1])
+            position += 1
+
+            if ValueEntryType == entry_type:
+                series_id, value = ValueEntryBody.unpack_from(content, position)
+                position += ValueEntryBody.size
+                yield entry_type, series_id, value, position
+            elif SampleEntryType == entry_type:
+                timestamp_ms, = SampleEntryBody.unpack_from(content, position)
+                position += SampleEntryBody.size
+                yield entry_type, timestamp_ms, None, position
+            elif SeriesEntryType == entry_type:
+                series_id, name_length = SeriesEntryHeader.unpack_from(content, position)
+                position += SeriesEntryHeader.size
+                if len(content) < position + name_length:
+                    return
+                position += name_length
+                yield entry_type, series_id, bytes(content[position - name_length:position]).decode(), position
+            else:
+                raise ValueError(f"Invalid entry type at {position - 1}: {entry_type}")
+    except struct.error:
+        return
+
+
+def read_recording(file_path: str) -> Iterator[tuple[int, dict[str, float]]]:
+    """
+    :param file_path: path of the recording
+    :return: iterator of (timestamp in ms, changed values by series name) tuples
+    """
+
+    with open(file_path, "rb") as recording_file:
+        content = recording_file.read()
+
+    series_names: dict[int, str] = {}
+    timestamp_ms: Optional[int] = None
+    values: dict[str, float] = {}
+
+    for entry_type, key, value, _ in iterate_entries(content):
+        if ValueEntryType == entry_type:
+            values[series_names[key]] = value
+        elif SampleEntryType == entry_type:
+            if timestamp_ms is not None:
+                yield timestamp_ms, values
+            timestamp_ms, values = key, {}
+        else:
+            series_names[key] = value
+
+    if timestamp_ms is not None:
+        yield timestamp_ms, values
+
+
+def to_columns(file_path: str) -> tuple[array.array, dict[str, array.array]]:
+    """
+    Converts the recording into columns, where the changes are resolved i.e., every series
+    has a value in every sample. NaN denotes that the series had no value yet.
+
+    :param file_path: path of the recording
+    :return: timestamps in ms and the values by series name
+    """
+
+    timestamps = array.array("q")
+    columns: dict[str, array.array] = {}
+    last_values: dict[str, float] = {}
+
+    for timestamp_ms, values in read_recording(file_path):
+        last_values.update(values)
+
+        for series_name in last_values.keys() - columns.keys():
+            columns[series_name] = array.array("d", [float("nan")] * len(timestamps))
+
+        timestamps.append(timestamp_ms)
+
+        for series_name, column in columns.items():
+            column.append(last_values[series_name])
+
+    return timestamps, columns
+
+
+class RecordingWriter:
+    """
+    Appends the samples to the recording. If the file exists, then the series declared
+    in the file are loaded, so the recording is continued after its last complete entry.
+
+    :param file_path: path of the recording
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path: str = file_path
+
+        self._series_ids: dict[str, int] = {}
+
+        self._last_values: dict[str, float] = {}
+        """
+        The last written value of every series to write only the changes
+        """
+
+        if os.path.exists(file_path) and (0 < os.path.getsize(file_path)):
+            with open(file_path, "rb") as recording_file:
+                content = recording_file.read()
+
+            series_names: dict[int, str] = {}
+            end_position = len(RecordingMagic)
+
+            for entry_type, key, value, end_position in iterate_entries(content):
+                if SeriesEntryType == entry_type:
+                    series_names[key] = value
+                    self._series_ids[value] = key
+                elif ValueEntryType == entry_type:
+                    self._last_values[series_names[key]] = value
+
+            self._file = open(file_path, "ab")
+
+            # An incomplete entry at the end e.g., after the previous recorder was killed while
+            # writing, is cut off, otherwise the new entries would continue inside of it
+            if end_position < len(content):
+                self._file.truncate(end_position)
+        else:
+            self._file = open(file_path, "wb")
+            self._file.write(RecordingMagic)
+
+    def write_sample(self, timestamp_ms: int, values: dict[str, float]) -> int:
+        """
+        Appends a sample with the values changed since the last sample.
+
+        :param timestamp_ms: time of the sample
+        :param values: the current values by series name
+        :return: number of the written values
+        """
+
+        entries = [SampleEntryType, SampleEntryBody.pack(timestamp_ms)]
+
+        for series_name, value in values.items():
+            if self._last_values.get(series_name) == value:
+                continue
+
+            series_id = self._series_ids.get(series_name)
+
+            if series_id is None:
+                series_id = len(self._series_ids)
+                self._series_ids[series_name] = series_id
+
+                encoded_name = series_name.encode()
+                entries.extend([SeriesEntryType, SeriesEntryHeader.pack(series_id, len(encoded_name)), encoded_name])
+
+            entries.extend([ValueEntryType, ValueEntryBody.pack(series_id, value)])
+            self._last_values[series_name] = value
+
+        # One write per sample, so a reader sees either the entire sample or an incomplete entry at the end
+        self._file.write(b"".join(entries))
+        self._file.flush()
+
+        return (len(entries) - 2) // 2
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class SnifferRecorder:
+    """
+    Headless sniffer, which records the status and the numeric payload (e.g., sent and
+    received record count) of the status messages of every port of every replica. The
+    status messages are retrieved by one ChannelSniffer per channel at the specified
+    interval, so the recording does not depend on a GUI or on its refresh rate.
+
+    :param pipeline: the pipeline to record
+    :param file_path: path of the recording
+    :param interval_sec: time between two samples
+    :param max_workers: number of channels sniffed concurrently
+    """
+
+    def __init__(self, pipeline: Pipeline, file_path: str, interval_sec: float = 5.0, max_workers: int = 8):
+        self.interval_sec: float = interval_sec
+
+        self._channel_sniffers: dict[str, ChannelSniffer] = {}
+        """
+        Sniffers by channel id, see PipelineSniffer.get_channel_id()
+        """
+
+        self._writer: RecordingWriter = RecordingWriter(file_path)
+
+        self._executor: concurrent.futures.ThreadPoolExecutor = concurrent.futures.ThreadPoolExecutor(max_workers)
+
+        self._current_values: dict[str, float] = {}
+        """
+        The latest values by series name updated by the status messages
+        """
+
+        self._current_values_lock: threading.Lock = threading.Lock()
+
+        self._stopped: threading.Event = threading.Event()
+
+        for operator in Internals(pipeline).nested_instances.values():
+            if operator.is_principal():
+                self._subscribe(operator)
+
+    def _subscribe(self, operator: Any) -> None:
+        # The replicas have the same ports, but their status messages have their own context name
+        group_names = [operator.get_full_name()] + [replica.get_full_name() for replica in operator.get_replicas()]
+
+        for port in Internals(operator).nested_instances.values():
+            if isinstance(port, ChannelInputPort):
+                channel_ports = [(port, output_port) for output_port in port.get_connected_ports()
+                                 if isinstance(output_port, ChannelOutputPort)]
+            elif isinstance(port, ChannelOutputPort):
+                channel_ports = [(input_port, port) for input_port in port.get_connected_ports()
+                                 if isinstance(input_port, ChannelInputPort)]
+            else:
+                continue
+
+            for input_port, output_port in channel_ports:
+                channel_id = PipelineSniffer.get_channel_id(input_port, output_port)
+
+                if channel_id not in self._channel_sniffers:
+                    self._channel_sniffers[channel_id] = ChannelSniffer(input_port, output_port)
+
+                for group_name in group_names:
+                    port_name = f"{group_name}.{port.get_simple_name()}"
+                    self._channel_sniffers[channel_id].subscribe(
+                        port_name, functools.partial(self._on_status_message, port_name)
+                    )
+
+    def _on_status_message(self, port_name: str, status_message: ChannelStatusMessage) -> None:
+        with self._current_values_lock:
+            if status_message.status in StateChannelStatuses:
+                self._current_values[f"{port_name}#{StatusMetricName}"] = \
+                    float(ChannelStatuses.index(status_message.status))
+
+            if isinstance(status_message.payload, dict):
+                for metric_name, value in status_message.payload.items():
+                    if isinstance(value, (int, float)) and not isinstance(value, bool):
+                        self._current_values[f"{port_name}#{metric_name}"] = float(value)
+
+    def sample(self) -> int:
+        """
+        Retrieves the status messages of every channel and appends the changes.
+
+        :return: number of the written values
+        """
+
+        for future in [self._executor.submit(channel_sniffer.sniff)
+                       for channel_sniffer in self._channel_sniffers.values()]:
+            future.result()
+
+        with self._current_values_lock:
+            current_values = dict(self._current_values)
+
+        return self._writer.write_sample(int(time.time() * 1000), current_values)
+
+    def run(self, duration_sec: Optional[float] = None) -> None:
+        """
+        Records until stop() is called or the duration expires.
+
+        :param duration_sec: max duration of the recording, None means no limit
+        """
+
+        end_time = None if duration_sec is None else (time.monotonic() + duration_sec)
+
+        try:
+            while not all([channel_sniffer.open() for channel_sniffer in self._channel_sniffers.values()]):
+                if self._stopped.wait(1):
+                    return
+
+            next_sample_time = time.monotonic()
+
+            while not self._stopped.is_set():
+                self.sample()
+
+                if (end_time is not None) and (end_time <= time.monotonic()):
+                    break
+
+                next_sample_time += self.interval_sec
+                self._stopped.wait(max(0.0, next_sample_time - time.monotonic()))
+        finally:
+            while not all([channel_sniffer.close() for channel_sniffer in self._channel_sniffers.values()]):
+                time.sleep(0.5)
+
+            self._executor.shutdown()
+            self._writer.close()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+
+def print_replay(file_path: str, at_time: Optional[datetime.datetime] = None) -> None:
+    """
+    Prints the summary of the recording and the values of the series at the specified
+    time, by default at the end of the recording.
+    """
+
+    timestamps, columns = to_columns(file_path)
+
+    if 0 == len(timestamps):
+        print("Empty recording")
+        return
+
+    sample_index = len(timestamps) - 1
+    if at_time is not None:
+        at_timestamp_ms = at_time.timestamp() * 1000
+        sample_index = max(0, max((index for index, timestamp in enumerate(timestamps)
+                                   if timestamp <= at_timestamp_ms), default=0))
+
+    duration_sec = (timestamps[-1] - timestamps[0]) / 1000
+
+    print(f"Samples: {len(timestamps)}; Series: {len(columns)}; "
+          f"From: {datetime.datetime.fromtimestamp(timestamps[0] / 1000)}; Duration: {duration_sec:.1f} s")
+    print(f"Values at {datetime.datetime.fromtimestamp(timestamps[sample_index] / 1000)}:")
+
+    for series_name in sorted(columns):
+        port_name, metric_name = series_name.rsplit("#", 1)
+        value = columns[series_name][sample_index]
+
+        if StatusMetricName == metric_name:
+            text = "-" if value != value else ChannelStatuses[int(value)].value
+        else:
+            text = f"{value:g}"
+
+            if metric_name.endswith("RecordCount") and (0 < sample_index):
+                # Rate of the records since the previous sample
+                previous_value = columns[series_name][sample_index - 1]
+                elapsed_sec = (timestamps[sample_index] - timestamps[sample_index - 1]) / 1000
+                if (previous_value == previous_value) and (0 < elapsed_sec):
+                    text += f" ({(value - previous_value) / elapsed_sec:.1f}/s)"
+
+        print(f"  {port_name} {metric_name}: {text}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Records the port states of a pipeline without GUI")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = subparsers.add_parser("record")
+    record_parser.add_argument("--config", help="Path of the pipeline configuration (YAML or compact format)")
+    record_parser.add_argument("--namespace", help="Kubernetes namespace of the deployed pipeline")
+    record_parser.add_argument("--pipeline-name", help="Name of the deployed pipeline")
+    record_parser.add_argument("--output", required=True, help="Path of the recording, appended, if exists")
+    record_parser.add_argument("--interval-sec", type=float, default=5.0)
+    record_parser.add_argument("--duration-sec", type=float)
+
+    replay_parser = subparsers.add_parser("replay")
+    replay_parser.add_argument("recording", help="Path of the recording")
+    replay_parser.add_argument("--at", type=datetime.datetime.fromisoformat,
+                               help="Local time in ISO format, default is the end of the recording")
+
+    arguments = parser.parse_args()
+
+    if "replay" == arguments.command:
+        print_replay(arguments.recording, arguments.at)
+    else:
+        if arguments.config is not None:
+            from pypz.example.specs import load_pipeline
+
+            with open(arguments.config) as config_file:
+                recorded_pipeline = load_pipeline(config_file.read())
+        elif arguments.pipeline_name is not None:
+            from pypz.deployers.k8s import KubernetesDeployer
+
+            recorded_pipeline = KubernetesDeployer(namespace=arguments.namespace) \
+                .retrieve_deployed_pipeline(arguments.pipeline_name)
+        else:
+            parser.error("Either --config or --pipeline-name shall be specified")
+
+        recorder = SnifferRecorder(recorded_pipeline, arguments.output, arguments.interval_sec)
+
+        try:
+            recorder.run(arguments.duration_sec)
+        except KeyboardInterrupt:
+            recorder.stop()
@@ -0,0 +1,169 @@
+# =============================================================================
+# Copyright (c) 2024 by Laszlo Anka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+"""
+This module contains the compact representations of the records, which can be produced by
+the schema-typed Kafka input ports (parameter "recordType") and accepted by the schema-typed
+Kafka output ports instead of the per-record dicts:
+
+- "dict": every record is a dict, which is the default
+- "row": every record is a row i.e., a tuple with named fields generated from the schema.
+  The rows have no per-instance dict, hence they take a fraction of the memory of a dict.
+- "columns": the batch is a ColumnBatch i.e., a struct-of-arrays with one list per field,
+  hence there is no per-record object at all and the garbage collector has to track only
+  a few objects regardless of the number of records.
+"""
+
+import collections
+from typing import Any, Iterable, Iterator, Union
+
+DictRecordType = "dict"
+
+RowRecordType = "row"
+
+ColumnsRecordType = "columns"
+
+RecordTypes = (DictRecordType, RowRecordType, ColumnsRecordType)
+
+
+def check_record_type(record_type: str) -> str:
+    if record_type not in RecordTypes:
+        raise ValueError(f"Invalid record type: {record_type}; Expected one of {RecordTypes}")
+
+    return record_type
+
+
+def create_row_type(record_name: str, field_names: list[str]) -> type:
+    """
+    Creates the row type of a record. Field names, which are not valid attribute names in
+    Python (e.g., keywords), are renamed to their position e.g., "_1", but the fields are
+    accessible by their index anyway.
+
+    :param record_name: name of the record, used as class name
+    :param field_names: name of the fields in the order of the schema
+    :return: the row type, which is a named tuple
+    """
+
+    # Named tuples define empty __slots__, hence the rows consist of the tuple of the values only
+    return collections.namedtuple(record_name, field_names, rename=True)
+
+
+def is_row(record: Any) -> bool:
+    return isinstance(record, tuple) and hasattr(record, "_fields")
+
+
+class ColumnBatch:
+    """
+    Batch of records stored as struct-of-arrays i.e., one list per field. It can be used
+    as the list of records, which are sent or retrieved by the ports, since it supports
+    len(), indexing and iteration. However, indexing and iteration create the records as
+    dicts on demand, hence the processing shall access the columns directly:
+
+        texts = batch.columns["text"]
+
+    :param columns: dict, where key is the field name and value is the list of the values
+    """
+
+    __slots__ = ("columns", "_length")
+
+    def __init__(self, columns: dict[str, list]):
+        column_lengths = {len(column) for column in columns.values()}
+
+        if 1 < len(column_lengths):
+            raise ValueError(f"Columns of different lengths: {sorted(column_lengths)}")
+
+        self.columns: dict[str, list] = columns
+
+        self._length: int = next(iter(column_lengths), 0)
+
+    @staticmethod
+    def from_records(records: Iterable[Any], field_names: list[str]) -> "ColumnBatch":
+        """
+        :param records: records as dicts
+        :param field_names: name of the fields to be converted into columns
+        """
+
+        records = list(records)
+
+        return ColumnBatch({field_name: [record[field_name] for record in records] for field_name in field_names})
+
+    def get_field_names(self) -> list[str]:
+        return list(self.columns)
+
+    def iter_rows(self) -> Iterator[tuple]:
+        """
+        :return: iterator of the records as tuples of the values in the order of the columns
+        """
+
+        return zip(*self.columns.values())
+
+    def to_records(self) -> list[dict]:
+        field_names = self.get_field_names()
+
+        return [dict(zip(field_names, values)) for values in self.iter_rows()]
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[dict, "ColumnBatch"]:
+        if isinstance(index, slice):
+            return ColumnBatch({field_name: column[index] for field_name, column in self.columns.items()})
+
+        return {field_name: column[index] for field_name, column in self.columns.items()}
+
+    def __iter__(self) -> Iterator[dict]:
+        field_names = self.get_field_names()
+
+        for values in self.iter_rows():
+            yield dict(zip(field_names, values))
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, ColumnBatch) and (self.columns == other.columns)
+
+    def __repr__(self) -> str:
+        return f"ColumnBatch(records={self._length}, fields={self.get_field_names()})"
+
+
+def concatenate_batches(batches: list[Any]) -> Any:
+    """
+    Concatenates the batches of records. If every batch is a ColumnBatch with the same
+    fields, the result is a ColumnBatch as well, otherwise a list of the records.
+    """
+
+    if batches and all(isinstance(batch, ColumnBatch) for batch in batches) and \
+            all(batch.columns.keys() == batches[0].columns.keys() for batch in batches):
+        columns = {field_name: [] for field_name in batches[0].columns}
+
+        for batch in batches:
+            for field_name, column in batch.columns.items():
+                columns[field_name].extend(column)
+
+        return ColumnBatch(columns)
+
+    return [record for batch in batches for record in batch]
+
+
+def to_dicts(records: Any) -> Any:
+    """
+    :return: the records as list of dicts, if they are rows or a ColumnBatch, otherwise as is
+    """
+
+    if isinstance(records, ColumnBatch):
+        return records.to_records()
+
+    if isinstance(records, list) and (0 < len(records)) and is_row(records[0]):
+        return [record._asdict() for record in records]
+
+    return records
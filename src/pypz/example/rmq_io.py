@@ -0,0 +1,461 @@
+# =============================================================================
+# Copyright (c) 2024 by Laszlo Anka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+import concurrent.futures
+import math
+import time
+from typing import Any, Optional, TYPE_CHECKING
+
+from amqp import Channel, Connection, NotFound
+from pypz.plugins.rmq_io.channels import RMQChannelReader, RMQChannelWriter
+from pypz.plugins.rmq_io.utils import MessageConsumer, MessageProducer
+
+from pypz.example.compression import CompressionSelector, decompress_payload, is_compressed
+from pypz.example.frames import RecordFrame, RecordFrameBatch, is_frame, pack_frame
+# The ports were located in this module, hence they are re-exported for the existing imports
+from pypz.example.ports import FlowControlRMQChannelInputPort, FlowControlRMQChannelOutputPort, \
+    FrameRMQChannelInputPort, FrameRMQChannelOutputPort  # noqa: F401
+
+if TYPE_CHECKING:
+    from pypz.core.specs.plugin import InputPortPlugin, OutputPortPlugin
+
+
+class ConfirmMessageProducer(MessageProducer):
+    """
+    Message producer with publisher confirms enabled. Unlike basic_publish_confirm() of
+    amqp, the publishing does not wait for the confirmation of every single message, the
+    confirmations are collected and can be awaited for an entire batch by wait_for_confirms().
+    """
+
+    def __init__(self, connection: Optional[Connection] = None, *args, **kwargs):
+        super().__init__(connection, *args, **kwargs)
+
+        self._published_count: int = 0
+        """
+        Number of published messages, which is the delivery tag of the last message as well
+        """
+
+        self._unconfirmed_delivery_tags: set[int] = set()
+
+        self._nacked_count: int = 0
+        """
+        Number of messages rejected by the broker since the last wait_for_confirms()
+        """
+
+        self._channel.events["basic_ack"].add(self._on_basic_ack)
+        self._channel.events["basic_nack"].add(self._on_basic_nack)
+        self._channel.confirm_select()
+
+    def _remove_delivery_tags(self, delivery_tag: int, multiple: bool) -> int:
+        if not multiple:
+            self._unconfirmed_delivery_tags.discard(delivery_tag)
+            return 1
+
+        confirmed_tags = {tag for tag in self._unconfirmed_delivery_tags if tag <= delivery_tag}
+        self._unconfirmed_delivery_tags -= confirmed_tags
+        return len(confirmed_tags)
+
+    def _on_basic_ack(self, delivery_tag: int, multiple: bool) -> None:
+        self._remove_delivery_tags(delivery_tag, multiple)
+
+    def _on_basic_nack(self, delivery_tag: int, multiple: bool) -> None:
+        self._nacked_count += self._remove_delivery_tags(delivery_tag, multiple)
+
+    def publish(self, message: str | bytes, queue_name: str = "", exchange_name: str = ""):
+        super().publish(message, queue_name, exchange_name)
+
+        self._published_count += 1
+        self._unconfirmed_delivery_tags.add(self._published_count)
+
+    def get_in_flight_count(self) -> int:
+        """
+        :return: number of published, but not yet confirmed messages
+        """
+        return len(self._unconfirmed_delivery_tags)
+
+    def wait_for_confirms(self, max_in_flight_count: int = 0, timeout_sec: Optional[float] = None) -> None:
+        """
+        Waits until the number of unconfirmed messages drops to the specified count.
+
+        :param max_in_flight_count: number of unconfirmed messages to wait for, 0 waits for all
+        :param timeout_sec: max time to wait, None to wait without limit
+        :raises TimeoutError: if the confirmations did not arrive in time
+        :raises ConnectionError: if the broker rejected any of the messages
+        """
+
+        deadline = None if timeout_sec is None else (time.monotonic() + timeout_sec)
+
+        while max_in_flight_count < len(self._unconfirmed_delivery_tags):
+            remaining_time = None if deadline is None else (deadline - time.monotonic())
+
+            if (remaining_time is not None) and (remaining_time <= 0):
+                raise TimeoutError(f"Confirmation of {len(self._unconfirmed_delivery_tags)} "
+                                   f"message(s) timed out")
+
+            self._connection.drain_events(timeout=remaining_time)
+
+        if 0 < self._nacked_count:
+            nacked_count, self._nacked_count = self._nacked_count, 0
+            raise ConnectionError(f"{nacked_count} message(s) rejected by the broker")
+
+
+class FlowControlRMQChannelWriter(RMQChannelWriter):
+    """
+    RMQ channel writer with publisher confirms and credit based backpressure. The following
+    channel configurations are available in addition to the ones of the RMQChannelWriter:
+
+    - confirm_batch_size: if set, publisher confirms are enabled and the writer waits for
+      the confirmations, once the specified number of messages are unconfirmed
+    - confirm_timeout_sec: max time to wait for the confirmations (default: 30)
+    - max_queued_message_count: if set, the writer has a credit of this many messages in the
+      data queues. The credit is consumed by the publishing and is given back, as the readers
+      consume the messages. If no credit left, the writer blocks until the readers catch up.
+      In case of multiple queues (group mode), the fullest queue determines the credit.
+    - credit_refresh_interval_sec: min time between two queries of the queue depths (default: 0.5)
+    - credit_wait_timeout_sec: max time to block for credit, None to block without limit (default)
+
+    The current credit and the number of unconfirmed messages are exposed through
+    get_flow_control_metrics() and in the health check payload of the channel.
+    """
+
+    def __init__(self, channel_name: str, context: "OutputPortPlugin",
+                 executor: Optional[concurrent.futures.ThreadPoolExecutor] = None, **kwargs):
+        super().__init__(channel_name, context, executor, **kwargs)
+
+        self._config_confirm_batch_size: Optional[int] = None
+        self._config_confirm_timeout_sec: float = 30
+        self._config_max_queued_message_count: Optional[int] = None
+        self._config_credit_refresh_interval_sec: float = 0.5
+        self._config_credit_wait_timeout_sec: Optional[float] = None
+
+        self._queued_message_count: int = 0
+        """
+        Estimated number of messages in the fullest data queue. It is sampled from the broker
+        and incremented by the published messages between two samples, hence it is an upper bound.
+        """
+
+        self._next_credit_refresh_time: float = 0
+
+        self._credit_connection: Optional[Connection] = None
+        """
+        Connection to query the depths of the data queues
+        """
+
+        self._credit_channel: Optional[Channel] = None
+
+        self._data_queue_names: Optional[list[str]] = None
+        """
+        Data queues bound to the exchange, discovered at the first credit refresh
+        """
+
+        self._credit_wait_time_sec: float = 0
+        """
+        Total time spent with waiting for credit
+        """
+
+    def _open_channel(self) -> bool:
+        # The producer is created here, so the base class does not create the default one
+        if (self._data_producer is None) and (self._config_confirm_batch_size is not None) and \
+                (self.get_location() is not None):
+            self._data_producer = ConfirmMessageProducer(host=self.get_location())
+
+        return super()._open_channel()
+
+    def _close_channel(self) -> bool:
+        if isinstance(self._data_producer, ConfirmMessageProducer):
+            self._data_producer.wait_for_confirms(0, self._config_confirm_timeout_sec)
+
+        if self._credit_connection is not None:
+            self._credit_connection.close()
+            self._credit_connection = None
+            self._credit_channel = None
+
+        return super()._close_channel()
+
+    def _configure_channel(self, channel_configuration: dict) -> None:
+        super()._configure_channel(channel_configuration)
+
+        if "confirm_batch_size" in channel_configuration:
+            self._config_confirm_batch_size = channel_configuration["confirm_batch_size"]
+
+        if "confirm_timeout_sec" in channel_configuration:
+            self._config_confirm_timeout_sec = channel_configuration["confirm_timeout_sec"]
+
+        if "max_queued_message_count" in channel_configuration:
+            self._config_max_queued_message_count = channel_configuration["max_queued_message_count"]
+
+        if "credit_refresh_interval_sec" in channel_configuration:
+            self._config_credit_refresh_interval_sec = channel_configuration["credit_refresh_interval_sec"]
+
+        if "credit_wait_timeout_sec" in channel_configuration:
+            self._config_credit_wait_timeout_sec = channel_configuration["credit_wait_timeout_sec"]
+
+    def _retrieve_queue_depth(self, queue_name: str) -> Optional[int]:
+        if (self._credit_channel is None) or (not self._credit_channel.is_open):
+            self._credit_channel = self._credit_connection.channel()
+
+        try:
+            return self._credit_channel.queue_declare(queue_name, passive=True).message_count
+        except NotFound:
+            # The broker closes the channel in this case, so a new one is opened next time
+            self._credit_channel = None
+            return None
+
+    def _refresh_queued_message_count(self) -> None:
+        if self._credit_connection is None:
+            self._credit_connection = Connection(host=self.get_location())
+            self._credit_connection.connect()
+
+        if self._data_queue_names is None:
+            # The readers create the data queues, in group mode one for every replica
+            # i.e., the writer does not know their number upfront
+            queue_names = [self._data_queue_name]
+            while self._retrieve_queue_depth(f"{self._data_queue_name}-{len(queue_names)}") is not None:
+                queue_names.append(f"{self._data_queue_name}-{len(queue_names)}")
+            self._data_queue_names = queue_names
+
+        queue_depths = [self._retrieve_queue_depth(queue_name) for queue_name in self._data_queue_names]
+
+        self._queued_message_count = max((depth for depth in queue_depths if depth is not None), default=0)
+        self._next_credit_refresh_time = time.monotonic() + self._config_credit_refresh_interval_sec
+
+    def _acquire_credit(self, message_count: int) -> None:
+        """
+        Blocks until the credit is enough to publish the specified number of messages. If
+        the queues are empty, the messages are published regardless of the credit, so
+        batches larger than the credit are not blocked forever.
+        """
+
+        if self._config_max_queued_message_count is None:
+            return
+
+        # Refreshed regularly, even if credit is available, to keep the metrics up-to-date
+        if self._next_credit_refresh_time <= time.monotonic():
+            self._refresh_queued_message_count()
+
+        wait_start_time = time.monotonic()
+
+        while (0 < self._queued_message_count) and \
+                (self.get_credit() < message_count):
+            current_time = time.monotonic()
+
+            if current_time < self._next_credit_refresh_time:
+                time.sleep(self._next_credit_refresh_time - current_time)
+            elif (self._config_credit_wait_timeout_sec is not None) and \
+                    (self._config_credit_wait_timeout_sec < (current_time - wait_start_time)):
+                raise TimeoutError(f"No credit to publish {message_count} message(s) in "
+                                   f"{self._config_credit_wait_timeout_sec} seconds")
+            else:
+                self._refresh_queued_message_count()
+
+        self._credit_wait_time_sec += time.monotonic() - wait_start_time
+
+    def _calculate_message_count(self, records: list[Any]) -> int:
+        return len(records)
+
+    def _publish_records(self, records: list[Any]) -> None:
+        super()._write_records(records)
+
+    def _write_records(self, records: list[Any]) -> None:
+        message_count = self._calculate_message_count(records)
+
+        self._acquire_credit(message_count)
+
+        self._publish_records(records)
+
+        self._queued_message_count += message_count
+
+        if (self._config_confirm_batch_size is not None) and \
+                (self._config_confirm_batch_size <= self._data_producer.get_in_flight_count()):
+            self._data_producer.wait_for_confirms(0, self._config_confirm_timeout_sec)
+
+        self._health_check_payload.update(self.get_flow_control_metrics())
+
+    def get_credit(self) -> Optional[int]:
+        """
+        :return: number of messages, which can be published without blocking, None if no limit
+        """
+
+        if self._config_max_queued_message_count is None:
+            return None
+
+        return max(0, self._config_max_queued_message_count - self._queued_message_count)
+
+    def get_in_flight_count(self) -> int:
+        """
+        :return: number of published, but not yet confirmed messages
+        """
+
+        if isinstance(self._data_producer, ConfirmMessageProducer):
+            return self._data_producer.get_in_flight_count()
+
+        return 0
+
+    def get_flow_control_metrics(self) -> dict[str, Any]:
+        return {
+            "credit": self.get_credit(),
+            "inFlightMessageCount": self.get_in_flight_count(),
+            "queuedMessageCount": self._queued_message_count,
+            "creditWaitTimeSec": self._credit_wait_time_sec,
+        }
+
+
+class FlowControlRMQChannelReader(RMQChannelReader):
+    """
+    RMQ channel reader with configurable prefetch window. The channel configuration
+    "prefetch_count" specifies the max number of unacknowledged messages the broker pushes
+    to the reader. By default, it is the same as "max_poll_records". A larger window
+    improves the throughput, a smaller one distributes the messages more evenly between the
+    replicas. If it is smaller than "max_poll_records", then "max_poll_records" is reduced to
+    it, since otherwise every poll would wait for messages the broker does not deliver.
+    """
+
+    def __init__(self, channel_name: str, context: "InputPortPlugin",
+                 executor: Optional[concurrent.futures.ThreadPoolExecutor] = None, **kwargs):
+        super().__init__(channel_name, context, executor, **kwargs)
+
+        self._config_prefetch_count: Optional[int] = None
+
+    def _configure_channel(self, channel_configuration: dict) -> None:
+        super()._configure_channel(channel_configuration)
+
+        if "prefetch_count" in channel_configuration:
+            self._config_prefetch_count = channel_configuration["prefetch_count"]
+            self._config_max_poll_records = min(self._config_max_poll_records, self._config_prefetch_count)
+
+        self._health_check_payload["prefetchCount"] = self._config_prefetch_count or self._config_max_poll_records
+
+    def _open_channel(self) -> bool:
+        data_consumer_missing = self._data_consumer is None
+
+        if not super()._open_channel():
+            return False
+
+        if data_consumer_missing and (self._data_consumer is not None) and (self._config_prefetch_count is not None):
+            set_prefetch_count(self._data_consumer, self._config_prefetch_count)
+
+        return True
+
+
+def set_prefetch_count(consumer: MessageConsumer, prefetch_count: int) -> None:
+    """
+    The MessageConsumer sets the prefetch count to its max_poll_record and does not provide
+    a way to change it, hence it is set on its channel directly.
+    """
+
+    consumer._channel.basic_qos(0, prefetch_count, False)
+
+
+class FrameRMQChannelWriter(FlowControlRMQChannelWriter):
+    """
+    RMQ channel writer, which packs the batch of binary records into frames (see frames.py)
+    and publishes one message per frame instead of one message per record. The records
+    shall be bytes-like objects or strings, the latter are encoded as UTF-8.
+
+    The channel configuration "max_frame_record_count" can be used to limit the size of
+    the frames, by default the entire batch is packed into one frame.
+
+    The frames are compressed as specified by the parameter "compression" of the port, see
+    compression.py. The statistics of the compression are exposed in the health check payload.
+    """
+
+    def __init__(self, channel_name: str, context: "OutputPortPlugin",
+                 executor: Optional[concurrent.futures.ThreadPoolExecutor] = None, **kwargs):
+        super().__init__(channel_name, context, executor, **kwargs)
+
+        self._config_max_frame_record_count: Optional[int] = None
+        """
+        Configuration parameter to specify the max number of records packed into one frame
+        """
+
+        self._compression_selector: CompressionSelector = CompressionSelector(
+            getattr(context, "compression", "none"), getattr(context, "network_bandwidth_mbps", 1000)
+        )
+
+    def _calculate_message_count(self, records: list[Any]) -> int:
+        if self._config_max_frame_record_count is None:
+            return min(1, len(records))
+
+        return math.ceil(len(records) / self._config_max_frame_record_count)
+
+    def _publish_records(self, records: list[Any]) -> None:
+        if 0 == len(records):
+            return
+
+        frame_record_count = self._config_max_frame_record_count or len(records)
+
+        for start_index in range(0, len(records), frame_record_count):
+            self._data_producer.publish(
+                message=self._compression_selector.compress(
+                    pack_frame(records[start_index:start_index + frame_record_count])
+                ),
+                exchange_name=self._data_exchange_name
+            )
+
+        self._health_check_payload.update(self._compression_selector.get_statistics())
+
+    def _configure_channel(self, channel_configuration: dict) -> None:
+        super()._configure_channel(channel_configuration)
+
+        if "max_frame_record_count" in channel_configuration:
+            self._config_max_frame_record_count = channel_configuration["max_frame_record_count"]
+
+
+class FrameRMQChannelReader(FlowControlRMQChannelReader):
+    """
+    RMQ channel reader, which receives the frames sent by the FrameRMQChannelWriter. The
+    records are not copied into separate objects, the reader returns a RecordFrameBatch,
+    which provides memoryview slices of the received messages. Messages, which are not
+    frames (e.g., sent by a RMQChannelWriter) are returned as single records. Compressed
+    frames are decompressed, independently of the compression of the reader's port.
+
+    Notice that the channel configuration "max_poll_records" limits the number of frames
+    i.e., messages and not the number of records retrieved at once.
+    """
+
+    def __init__(self, channel_name: str, context: "InputPortPlugin",
+                 executor: Optional[concurrent.futures.ThreadPoolExecutor] = None, **kwargs):
+        super().__init__(channel_name, context, executor, **kwargs)
+
+    def _read_records(self) -> RecordFrameBatch:
+        messages = self._data_consumer.poll(self._config_data_consumer_timeout_sec)
+
+        return RecordFrameBatch([to_record_frame(message) for message in messages])
+
+
+def to_record_frame(message: str | bytes) -> RecordFrame:
+    """
+    :return: the frame sent by the FrameRMQChannelWriter, decompressed if necessary, or a frame
+             with the message as single record, if the message is not a (compressed) frame. Only
+             a compressed frame is decompressed, a plain message starting with the same bytes as
+             the compression header is returned as is.
+    """
+
+    # Bodies published as strings (e.g., by a RMQChannelWriter) are received as strings
+    if isinstance(message, str):
+        return RecordFrame(pack_frame([message]))
+
+    if is_compressed(message):
+        try:
+            decompressed = decompress_payload(message)
+
+            if is_frame(decompressed):
+                return RecordFrame(decompressed)
+        except ValueError:
+            pass
+    elif is_frame(message):
+        return RecordFrame(message)
+
+    return RecordFrame(pack_frame([message]))
@@ -13,18 +13,29 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 # =============================================================================
-from typing import Optional, Any
+import logging
+from typing import Any, Generator, Optional
 
 from pypz.core.commons.parameters import RequiredParameter, OptionalParameter
 from pypz.core.specs.operator import Operator
 from pypz.core.specs.pipeline import Pipeline
-from pypz.plugins.loggers.default import DefaultLoggerPlugin
-from pypz.plugins.rmq_io.ports import RMQChannelOutputPort, RMQChannelInputPort
 
+from pypz.example.generators import GeneratorOperator
+from pypz.example.loggers import AsyncLoggerPlugin, is_log_level_enabled
+from pypz.example.pacing import IdleBackoff, wait_and_retrieve
+from pypz.example.ports import FrameRMQChannelInputPort, FrameRMQChannelOutputPort, \
+    FlowControlRMQChannelInputPort, FlowControlRMQChannelOutputPort
 
-class RMQDemoWriterOperator(Operator):
+
+class RMQDemoWriterOperator(GeneratorOperator):
+    """
+    This operator sends string records to the receiving operators. The records are yielded
+    by the _on_running generator, see GeneratorOperator.
+    """
+
+    OutputPortType = FlowControlRMQChannelOutputPort
     """
-    This operator sends avro records to the receiving operators.
+    Type of the output port, subclasses can override it to use a different channel technology
     """
 
     record_count = RequiredParameter(int, alt_name="recordCount",
@@ -34,7 +45,7 @@ class RMQDemoWriterOperator(Operator):
     def __init__(self, name: str = None, *args, **kwargs):
         super().__init__(name, *args, **kwargs)
 
-        self.output_port = RMQChannelOutputPort()
+        self.output_port = self.OutputPortType()
         """
         An output port enables the operator to send data to other operators. 
         The connection is usually established on the pipeline level.
@@ -42,10 +53,11 @@ class RMQDemoWriterOperator(Operator):
 
         self.output_record_count: int = 0
 
-        self.logger = DefaultLoggerPlugin()
+        self.logger = AsyncLoggerPlugin()
         """
-        A logger plugin enables the framework to handle logs from the framework. The default
-        logger puts the messages to stdout.
+        A logger plugin enables the framework to handle logs from the framework. The async
+        logger puts the messages to stdout from a background thread, so logging does not
+        block the processing.
         """
 
         self.record_count = None
@@ -66,25 +78,24 @@ class RMQDemoWriterOperator(Operator):
         """
         return True
 
-    def _on_running(self) -> Optional[bool]:
+    def _on_running(self) -> Generator[str, None, bool]:
         """
-        This method shall implement the actual processing logic.
+        This method shall implement the actual processing logic. Since it is a generator,
+        the yielded records are collected and sent by the GeneratorOperator.
 
         :return: True succeeded, False if more iteration required (to not block the execution), None if
         framework shall decide
         """
-        record_to_send = f"{self.message}_{self.output_record_count}"
+        while self.output_record_count < self.record_count:
+            record_to_send = f"{self.message}_{self.output_record_count}"
 
-        self.get_logger().info(f"Generated record: {record_to_send}")
+            self.get_logger().info("Generated record: %s", record_to_send)
 
-        self.output_port.send([record_to_send])
+            self.output_record_count += 1
 
-        self.output_record_count += 1
+            yield record_to_send
 
-        if self.record_count == self.output_record_count:
-            return True
-
-        return False
+        return True
 
     def _on_shutdown(self) -> bool:
         """
@@ -118,16 +129,29 @@ class RMQDemoReaderOperator(Operator):
     operator and logs it to the stdout.
     """
 
+    InputPortType = FlowControlRMQChannelInputPort
+    """
+    Type of the input port, subclasses can override it to use a different channel technology
+    """
+
     raise_error_after_record_count = OptionalParameter(int,
                                                        alt_name="raiseErrorAfterRecordCount",
                                                        description="If set to a non-negative value, the operator will"
                                                                    "raise an error after it received the specified"
                                                                    "number of records")
+    retrieve_timeout_ms = OptionalParameter(int, alt_name="retrieveTimeoutMs",
+                                            description="Specifies, how long an iteration waits for records")
+    min_retrieve_record_count = OptionalParameter(int, alt_name="minRetrieveRecordCount",
+                                                  description="Specifies the number of records an iteration "
+                                                              "waits for, before the timeout expires")
+    max_idle_sleep_ms = OptionalParameter(int, alt_name="maxIdleSleepMs",
+                                          description="Specifies the max sleep time between two retrievals, "
+                                                      "if no records available")
 
     def __init__(self, name: str = None, *args, **kwargs):
         super().__init__(name, *args, **kwargs)
 
-        self.input_port = RMQChannelInputPort()
+        self.input_port = self.InputPortType()
         """
         An input port enables the operator to receive data from other operators' output port.
         The connection is usually established on the pipeline level.
@@ -135,10 +159,11 @@ class RMQDemoReaderOperator(Operator):
         will use the variable's name as operator instance name.
         """
 
-        self.logger = DefaultLoggerPlugin()
+        self.logger = AsyncLoggerPlugin()
         """
-        A logger plugin enables the framework to handle logs from the framework. The default
-        logger puts the messages to stdout.
+        A logger plugin enables the framework to handle logs from the framework. The async
+        logger puts the messages to stdout from a background thread, so logging does not
+        block the processing.
         """
 
         self.logger.set_parameter("logLevel", "DEBUG")
@@ -153,11 +178,37 @@ class RMQDemoReaderOperator(Operator):
 
         self.raise_error_after_record_count = None
 
+        self.retrieve_timeout_ms = 1000
+        """
+        By default, an iteration waits at most 1 second for records, so the executor gets
+        the control back regularly.
+        """
+
+        self.min_retrieve_record_count = 1
+
+        self.max_idle_sleep_ms = 100
+
+        self._idle_backoff: Optional[IdleBackoff] = None
+        """
+        Keeps the idle state between the iterations, so an idle reader keeps sleeping
+        instead of polling. It is created at init, since the parameters are not yet
+        known at construction time.
+        """
+
+        self._debug_enabled: bool = False
+        """
+        Set at init from the level of the logger plugin, so the records are only
+        prepared for logging, if they are logged
+        """
+
     def _on_init(self) -> bool:
         """
         This method shall implement the logic to initialize the operation.
         :return: True succeeded, False if more iteration required (to not block the execution)
         """
+        self._idle_backoff = IdleBackoff(max_sleep_sec=self.max_idle_sleep_ms / 1000)
+        self._debug_enabled = is_log_level_enabled(self.logger, logging.DEBUG)
+
         return True
 
     def _on_running(self) -> Optional[bool]:
@@ -166,7 +217,11 @@ class RMQDemoReaderOperator(Operator):
         :return: True succeeded, False if more iteration required (to not block the execution), None if
         framework shall decide
         """
-        records = self.input_port.retrieve()
+        """ Instead of returning immediately, if no records available, the retrieval
+            waits for the records with adaptive backoff, so idle readers do not
+            burn the CPU by polling. """
+        records = wait_and_retrieve(self.input_port, self.retrieve_timeout_ms,
+                                    self.min_retrieve_record_count, self._idle_backoff)
 
         self.received_record_count += len(records)
 
@@ -175,14 +230,18 @@ class RMQDemoReaderOperator(Operator):
             raise BrokenPipeError(f"Test error after received the specified record count: "
                                   f"{self.raise_error_after_record_count} / {self.received_record_count}")
 
-        for record in records:
-            self.get_logger().debug(f"Received record: {record}")
+        if self._debug_enabled:
+            self._log_records(records)
 
         return None
 
         # Returning None is equivalent to the following:
         # return not self.input_port.can_retrieve()
 
+    def _log_records(self, records: list[Any]) -> None:
+        for record in records:
+            self.get_logger().debug("Received record: %s", record)
+
     def _on_shutdown(self) -> bool:
         """
         This method shall implement the logic to shut down the operation.
@@ -207,6 +266,34 @@ class RMQDemoReaderOperator(Operator):
         pass
 
 
+class RMQBinaryDemoWriterOperator(RMQDemoWriterOperator):
+    """
+    This operator sends the records as binary frames i.e., the records sent at once (see
+    the parameter "flushRecordCount") are packed into one message instead of sending one
+    message per record. The string records are encoded by the channel.
+    """
+
+    OutputPortType = FrameRMQChannelOutputPort
+
+    def __init__(self, name: str = None, *args, **kwargs):
+        super().__init__(name, *args, **kwargs)
+
+        self.flush_record_count = 100
+
+
+class RMQBinaryDemoReaderOperator(RMQDemoReaderOperator):
+    """
+    This operator receives the binary frames sent by the RMQBinaryDemoWriterOperator. The
+    records are memoryview slices of the received frames.
+    """
+
+    InputPortType = FrameRMQChannelInputPort
+
+    def _log_records(self, records: list[Any]) -> None:
+        for record in records:
+            self.get_logger().debug("Received record: %s", bytes(record))
+
+
 class RMQDemoPipeline(Pipeline):
     """
     A pipeline includes a set of operators that are (usually) connected to each other.
@@ -235,3 +322,43 @@ class RMQDemoPipeline(Pipeline):
             replicas will be created i.e., 4 operator instances will be created."""
         self.writer.set_parameter("replicationFactor", 3)
         self.reader.set_parameter("replicationFactor", 50)
+
+        """ The writers block, if there are more than 10000 messages in the queue i.e., the
+            readers fall behind. Publisher confirms are awaited for every 100 messages. The
+            small prefetch window distributes the messages evenly between the readers."""
+        self.writer.output_port.set_parameter("channelConfig", {
+            "max_queued_message_count": 10000,
+            "confirm_batch_size": 100,
+        })
+        self.reader.input_port.set_parameter("channelConfig", {
+            "prefetch_count": 10,
+        })
+
+
+class RMQBinaryDemoPipeline(Pipeline):
+    """
+    Same as the RMQDemoPipeline, but the records are sent in binary frames.
+    """
+
+    def __init__(self, name: str, *args, **kwargs):
+        super().__init__(name, *args, **kwargs)
+
+        self.reader = RMQBinaryDemoReaderOperator()
+        self.writer = RMQBinaryDemoWriterOperator()
+
+        self.reader.input_port.connect(self.writer.output_port)
+
+        self.reader.set_parameter("operatorImageName", "accessible-repository/pypz-example")
+        self.writer.set_parameter("operatorImageName", "accessible-repository/pypz-example")
+
+        self.writer.set_parameter("replicationFactor", 3)
+        self.reader.set_parameter("replicationFactor", 50)
+
+        # Notice that the credit and the prefetch window are counted in frames
+        self.writer.output_port.set_parameter("channelConfig", {
+            "max_queued_message_count": 100,
+            "confirm_batch_size": 10,
+        })
+        self.reader.input_port.set_parameter("channelConfig", {
+            "prefetch_count": 2,
+        })
@@ -0,0 +1,208 @@
+# =============================================================================
+# Copyright (c) 2024 by Laszlo Anka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+import hashlib
+import json
+import threading
+from typing import Iterable, Optional, TYPE_CHECKING
+
+from pypz.example.records import DictRecordType, RowRecordType, create_row_type
+
+if TYPE_CHECKING:
+    from avro.io import DatumReader, DatumWriter
+    from avro.schema import Schema
+
+    from pypz.example.avro_codegen import AvroCodec
+
+# The Avro library and the code generator are imported, once the first schema is registered
+# i.e., when a port creates its channel, so importing the operators does not load them.
+
+
+class CompiledSchema:
+    """
+    This class holds the compiled representation of an Avro schema. The datum
+    reader and writer are stateless w.r.t. the processed records, hence they
+    can be shared by every port and channel of the process.
+
+    :param fingerprint: content fingerprint of the schema
+    :param schema_string: the schema as JSON string
+    :param parsed_schema: the parsed Avro schema
+    """
+
+    def __init__(self, fingerprint: str, schema_string: str, parsed_schema: "Schema"):
+        from avro.io import DatumReader, DatumWriter
+
+        self.fingerprint: str = fingerprint
+        self.schema_string: str = schema_string
+        self.parsed_schema: "Schema" = parsed_schema
+
+        self.datum_reader: "DatumReader" = DatumReader(parsed_schema)
+        self.datum_writer: "DatumWriter" = DatumWriter(parsed_schema)
+
+        self._validator = None
+        """
+        The validator is only required to explain invalid records, hence it is created lazily
+        """
+
+        self._codecs: dict[tuple[Optional[tuple[str, ...]], str], Optional["AvroCodec"]] = {}
+        """
+        Generated codecs per projection and record type, the projection is None, if every
+        field is decoded
+        """
+
+        self._row_types: dict[Optional[tuple[str, ...]], type] = {}
+
+    def get_validator(self):
+        if self._validator is None:
+            from avro_validator.schema import Schema as ValidatorSchema
+
+            self._validator = ValidatorSchema(self.schema_string).parse()
+
+        return self._validator
+
+    def get_codec(self, projected_field_names: Optional[Iterable[str]] = None,
+                  record_type: str = DictRecordType) -> Optional["AvroCodec"]:
+        """
+        :param projected_field_names: if specified, the decoder of the codec returns only
+                                      these fields of the records
+        :param record_type: representation of the decoded records, see records.py
+        :return: the encoder and decoder generated for the schema or None, if the schema is
+                 not supported by the generator. It is generated at the first call, hence
+                 only the processes using it pay for the generation.
+        """
+
+        projection_key = None if projected_field_names is None else tuple(sorted(projected_field_names))
+
+        if (projection_key, record_type) not in self._codecs:
+            from pypz.example.avro_codegen import compile_codec
+
+            row_type = self.get_row_type(projection_key) if RowRecordType == record_type else None
+
+            self._codecs[(projection_key, record_type)] = compile_codec(self.parsed_schema, projection_key,
+                                                                        record_type, row_type)
+
+        return self._codecs[(projection_key, record_type)]
+
+    def get_row_type(self, projected_field_names: Optional[Iterable[str]] = None) -> type:
+        """
+        :param projected_field_names: if specified, the row consists of these fields only
+        :return: the row type of the record schema, which can be used to create the records
+                 as well e.g., get_demo_record_schema().get_row_type()(text="HelloWorld_0")
+        """
+
+        projection_key = None if projected_field_names is None else tuple(sorted(projected_field_names))
+
+        if projection_key not in self._row_types:
+            from pypz.example.avro_codegen import check_projection
+
+            field_names = [field.name for field in self.parsed_schema.fields] if projection_key is None else \
+                check_projection(self.parsed_schema, projection_key)
+
+            self._row_types[projection_key] = create_row_type(self.parsed_schema.name, field_names)
+
+        return self._row_types[projection_key]
+
+
+class SchemaRegistry:
+    """
+    This class realizes a process-wide registry of compiled Avro schemas keyed by
+    the fingerprint of their content. Hence, the same schema declared by different
+    operators, ports and replicas is parsed only once per process.
+    """
+
+    def __init__(self):
+        self._schemas_by_fingerprint: dict[str, CompiledSchema] = {}
+
+        self._schemas_by_string: dict[str, CompiledSchema] = {}
+        """
+        The same schema string is usually looked up many times, this map
+        spares the normalization of the JSON string in those cases
+        """
+
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def fingerprint(schema_string: str) -> str:
+        """
+        Calculates the fingerprint of the schema. The JSON is normalized before
+        hashing, so whitespace and key order have no effect on the result.
+        """
+
+        normalized = json.dumps(json.loads(schema_string), sort_keys=True, separators=(",", ":"))
+
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+    def register(self, schema_string: str) -> CompiledSchema:
+        """
+        Returns the compiled schema. If the schema is not yet registered, then
+        it will be parsed and compiled.
+
+        :param schema_string: Avro schema as JSON string
+        :return: the compiled schema
+        """
+
+        compiled_schema = self._schemas_by_string.get(schema_string)
+
+        if compiled_schema is not None:
+            return compiled_schema
+
+        with self._lock:
+            fingerprint = SchemaRegistry.fingerprint(schema_string)
+
+            compiled_schema = self._schemas_by_fingerprint.get(fingerprint)
+
+            if compiled_schema is None:
+                from avro.schema import parse
+
+                compiled_schema = CompiledSchema(fingerprint, schema_string, parse(schema_string))
+                self._schemas_by_fingerprint[fingerprint] = compiled_schema
+
+            self._schemas_by_string[schema_string] = compiled_schema
+
+        return compiled_schema
+
+    def get(self, fingerprint: str) -> Optional[CompiledSchema]:
+        return self._schemas_by_fingerprint.get(fingerprint)
+
+
+schema_registry = SchemaRegistry()
+"""
+Process-wide schema registry
+"""
+
+DemoRecordSchemaString = """
+{
+    "type": "record",
+    "name": "DemoRecord",
+    "fields": [
+        {
+            "name": "text",
+            "type": "string"
+        }
+    ]
+}
+"""
+"""
+Schema of the records exchanged by the demo operators
+"""
+
+
+def get_demo_record_schema() -> CompiledSchema:
+    """
+    :return: the compiled schema of the demo records, which is registered at the first call,
+             so importing the operators does not parse it
+    """
+
+    return schema_registry.register(DemoRecordSchemaString)
@@ -0,0 +1,150 @@
+# =============================================================================
+# Copyright (c) 2024 by Laszlo Anka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+import argparse
+import json
+import time
+from typing import Callable
+
+import yaml
+from pypz.core.specs.dtos import PipelineInstanceDTO
+from pypz.core.specs.pipeline import Pipeline
+
+from pypz.example.parameters import ParameterTable
+from pypz.example.reader import DemoReaderOperator
+from pypz.example.specs import PipelineSpecCache, YamlLoader, dumps_compact, parse_spec
+from pypz.example.writer import DemoWriterOperator
+
+"""
+This example compares the loading time of large generated pipelines in YAML and in the
+compact format as well as with the cache of PipelineSpecCache. It compares as well the
+time of a cascaded parameter update with Instance.set_parameter() and with the
+ParameterTable.
+
+    python -m pypz.example.spec_benchmark --pair-count 1 10 50 --replication-factor 3
+"""
+
+
+class GeneratedPipeline(Pipeline):
+    """
+    Pipeline with the specified number of connected writer-reader operator pairs. Notice
+    that the operators are not created, if the pipeline is created from its DTO, since
+    they are injected from the DTO in that case.
+
+    :param pair_count: number of writer-reader pairs
+    :param replication_factor: replication factor of every operator
+    """
+
+    def __init__(self, name: str, pair_count: int = 0, replication_factor: int = 0, *args, **kwargs):
+        super().__init__(name, *args, **kwargs)
+
+        for index in range(pair_count):
+            setattr(self, f"writer_{index}", DemoWriterOperator(f"writer_{index}"))
+            setattr(self, f"reader_{index}", DemoReaderOperator(f"reader_{index}"))
+
+            writer = getattr(self, f"writer_{index}")
+            reader = getattr(self, f"reader_{index}")
+
+            reader.input_port.connect(writer.output_port)
+
+            writer.set_parameter("replicationFactor", replication_factor)
+            reader.set_parameter("replicationFactor", replication_factor)
+
+
+def measure_min_time_sec(function: Callable[[], None], repeat_count: int) -> float:
+    elapsed_times = []
+
+    for _ in range(repeat_count):
+        start_time = time.perf_counter()
+        function()
+        elapsed_times.append(time.perf_counter() - start_time)
+
+    return min(elapsed_times)
+
+
+def run_benchmark(pair_count: int, replication_factor: int, repeat_count: int) -> dict:
+    pipeline = GeneratedPipeline("pipeline", pair_count, replication_factor)
+
+    yaml_source = pipeline.__str__()
+    compact_source = dumps_compact(pipeline)
+
+    if Pipeline.create_from_dto(PipelineInstanceDTO(**parse_spec(compact_source))).__str__() != yaml_source:
+        raise AssertionError("The pipeline created from the compact format differs from the original")
+
+    cache = PipelineSpecCache()
+
+    loaders: dict[str, tuple[str, Callable[[], None]]] = {
+        "yaml": (yaml_source, lambda: Pipeline.create_from_string(yaml_source)),
+        "yaml-libyaml": (yaml_source, lambda: Pipeline.create_from_dto(
+            PipelineInstanceDTO(**yaml.load(yaml_source, Loader=YamlLoader))
+        )),
+        "compact": (compact_source, lambda: Pipeline.create_from_dto(
+            PipelineInstanceDTO(**parse_spec(compact_source))
+        )),
+        "compact-cached": (compact_source, lambda: cache.load(compact_source)),
+        "yaml-cached": (yaml_source, lambda: cache.load(yaml_source)),
+        "yaml-cached-shared": (yaml_source, lambda: cache.load(yaml_source, shared=True)),
+    }
+
+    results = {
+        "pairCount": pair_count,
+        "replicationFactor": replication_factor,
+        "formats": {},
+    }
+
+    for loader_name, (source, loader) in loaders.items():
+        results["formats"][loader_name] = {
+            "sizeBytes": len(source.encode()),
+            "loadTimeMs": measure_min_time_sec(loader, repeat_count) * 1000,
+        }
+
+    cascade_values = iter(range(1_000_000_000))
+    parameter_table = ParameterTable(pipeline)
+
+    results["cascades"] = {
+        "plainMs": measure_min_time_sec(
+            lambda: pipeline.set_parameter(">>channelLocation", f"location_{next(cascade_values)}"), repeat_count
+        ) * 1000,
+        "tableMs": measure_min_time_sec(
+            lambda: parameter_table.set_parameter(">>channelLocation", f"location_{next(cascade_values)}"),
+            repeat_count
+        ) * 1000,
+    }
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compares the loading time of the pipeline spec formats")
+    parser.add_argument("--pair-count", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--replication-factor", type=int, default=3)
+    parser.add_argument("--repeat-count", type=int, default=5)
+    parser.add_argument("--output", help="Path of a JSON file to store the results e.g., for regression checks")
+    arguments = parser.parse_args()
+
+    benchmark_results = [run_benchmark(pair_count, arguments.replication_factor, arguments.repeat_count)
+                         for pair_count in arguments.pair_count]
+
+    for result in benchmark_results:
+        print(f"Operator pairs: {result['pairCount']}; Replication factor: {result['replicationFactor']}")
+        for format_name, format_result in result["formats"].items():
+            print(f"  {format_name}: {format_result['sizeBytes'] / 1024:.1f} KiB; "
+                  f"{format_result['loadTimeMs']:.2f} ms")
+        print(f"  cascaded parameter: {result['cascades']['plainMs']:.2f} ms; "
+              f"with ParameterTable: {result['cascades']['tableMs']:.2f} ms")
+
+    if arguments.output is not None:
+        with open(arguments.output, "w") as output_file:
+            json.dump(benchmark_results, output_file, indent=2)
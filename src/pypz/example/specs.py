@@ -0,0 +1,282 @@
+# =============================================================================
+# Copyright (c) 2024 by Laszlo Anka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+"""
+This module provides a compact serialization format of the instances and a cache to
+speed up the loading of pipelines. The default YAML representation repeats the entire
+spec (expected parameters, types) for every nested instance. The compact format is a
+JSON document, which stores every spec once and the instances refer to it by name:
+
+    {
+      "format": "pypz-compact-spec",
+      "version": 1,
+      "specs": {"pypz.example.reader:DemoReaderOperator": {...}},
+      "instance": {"name": "pipeline", "spec": "pypz.example.reader:...", "nestedInstances": [...]}
+    }
+
+Notice that the "currentValue" of the expected parameters is not stored, since it is
+the same as the instance's parameter value and the instances do not use it for the
+reconstruction. It is set from the parameters, if available, when the compact format
+is expanded.
+"""
+
+import collections
+import hashlib
+import json
+import threading
+from typing import Any, Optional
+
+import yaml
+from pypz.core.commons.utils import convert_to_dict
+from pypz.core.specs.dtos import PipelineInstanceDTO
+from pypz.core.specs.instance import Instance
+from pypz.core.specs.pipeline import Pipeline
+
+CompactSpecFormatName = "pypz-compact-spec"
+CompactSpecFormatVersion = 1
+
+try:
+    # The libyaml based loader is significantly faster, if available
+    YamlLoader = yaml.CSafeLoader
+except AttributeError:
+    YamlLoader = yaml.SafeLoader
+
+
+def to_compact(instance_dto: dict) -> dict:
+    """
+    Converts the dict representation of an instance DTO into the compact format.
+
+    :param instance_dto: DTO of the instance as dict e.g., convert_to_dict(instance.get_dto())
+    :return: the compact representation
+    """
+
+    specs: dict[str, dict] = {}
+
+    def register_spec(spec: dict) -> str:
+        # Specs with the same name differ only, if different versions
+        # of the same class are included, hence it is a rare case
+        key = spec["name"]
+        suffix = 1
+
+        while (key in specs) and (specs[key] != spec):
+            suffix += 1
+            key = f"{spec['name']}#{suffix}"
+
+        specs[key] = spec
+
+        return key
+
+    def compact_instance(instance: dict) -> dict:
+        compact = {key: value for key, value in instance.items() if "spec" != key}
+
+        if instance.get("spec") is None:
+            return compact
+
+        spec = {key: value for key, value in instance["spec"].items() if "nestedInstances" != key}
+
+        if spec.get("expectedParameters") is not None:
+            spec["expectedParameters"] = {
+                parameter_name: {key: value for key, value in description.items() if "currentValue" != key}
+                for parameter_name, description in spec["expectedParameters"].items()
+            }
+
+        compact["spec"] = register_spec(spec)
+
+        if instance["spec"].get("nestedInstances") is not None:
+            compact["nestedInstances"] = [compact_instance(nested) for nested in instance["spec"]["nestedInstances"]]
+
+        return compact
+
+    compact_root = compact_instance(instance_dto)
+
+    return {
+        "format": CompactSpecFormatName,
+        "version": CompactSpecFormatVersion,
+        "specs": specs,
+        "instance": compact_root,
+    }
+
+
+def from_compact(compact: dict) -> dict:
+    """
+    Converts the compact format back to the dict representation of the instance DTO.
+
+    :param compact: the compact representation
+    :return: DTO of the instance as dict, which can be provided to the DTO's ctor
+    """
+
+    if (CompactSpecFormatName != compact.get("format")) or (CompactSpecFormatVersion != compact.get("version")):
+        raise ValueError(f"Unsupported spec format: {compact.get('format')} - {compact.get('version')}")
+
+    specs: dict[str, dict] = compact["specs"]
+
+    def expand_instance(instance: dict) -> dict:
+        expanded = {key: value for key, value in instance.items() if key not in ("spec", "nestedInstances")}
+
+        if "spec" not in instance:
+            return expanded
+
+        spec = dict(specs[instance["spec"]])
+        parameters = instance.get("parameters") or {}
+
+        if spec.get("expectedParameters") is not None:
+            spec["expectedParameters"] = {
+                parameter_name: {**description, "currentValue": parameters.get(parameter_name)}
+                for parameter_name, description in spec["expectedParameters"].items()
+            }
+
+        spec["nestedInstances"] = None if "nestedInstances" not in instance else \
+            [expand_instance(nested) for nested in instance["nestedInstances"]]
+
+        expanded["spec"] = spec
+
+        return expanded
+
+    return expand_instance(compact["instance"])
+
+
+def dumps_compact(instance: Instance) -> str:
+    """
+    Serializes the instance into the compact format.
+    """
+
+    return json.dumps(to_compact(convert_to_dict(instance.get_dto())), separators=(",", ":"))
+
+
+def parse_spec(source: str | bytes) -> dict:
+    """
+    Parses the source either in compact or in YAML format (JSON is valid YAML as well).
+
+    :return: DTO of the instance as dict
+    """
+
+    if isinstance(source, bytes):
+        source = source.decode()
+
+    if source.lstrip().startswith("{"):
+        parsed = json.loads(source)
+
+        if CompactSpecFormatName == parsed.get("format"):
+            return from_compact(parsed)
+
+        return parsed
+
+    return yaml.load(source, Loader=YamlLoader)
+
+
+class PipelineSpecCache:
+    """
+    Cache of the parsed pipeline specs keyed by the hash of their content. The parsed DTO
+    is stored as JSON string, which is much faster to load than to parse the original
+    source, while every load still gets its own objects. Optionally, the reconstructed
+    pipeline itself can be shared i.e., the same instance is returned for the same source,
+    which is useful for read-only usage like in the deployers. Shared pipelines shall not
+    be modified.
+
+    :param max_size: max number of cached specs, the least recently used ones are evicted
+    """
+
+    def __init__(self, max_size: int = 64):
+        self.max_size: int = max_size
+
+        self.hit_count: int = 0
+        self.miss_count: int = 0
+
+        self._parsed_specs: collections.OrderedDict[str, str] = collections.OrderedDict()
+
+        self._shared_pipelines: collections.OrderedDict[tuple, Pipeline] = collections.OrderedDict()
+
+        self._lock: threading.Lock = threading.Lock()
+
+    @staticmethod
+    def calculate_key(source: str | bytes) -> str:
+        return hashlib.sha256(source.encode() if isinstance(source, str) else source).hexdigest()
+
+    def _retrieve_parsed_spec(self, key: str, source: str | bytes) -> dict:
+        with self._lock:
+            parsed_spec = self._parsed_specs.get(key)
+
+            if parsed_spec is not None:
+                self._parsed_specs.move_to_end(key)
+                self.hit_count += 1
+                return json.loads(parsed_spec)
+
+            self.miss_count += 1
+
+        instance_dto = parse_spec(source)
+
+        with self._lock:
+            self._parsed_specs[key] = json.dumps(instance_dto)
+            while self.max_size < len(self._parsed_specs):
+                self._parsed_specs.popitem(last=False)
+
+        return instance_dto
+
+    def load(self, source: str | bytes, shared: bool = False, **kwargs) -> Pipeline:
+        """
+        Creates the pipeline from the source in compact or in YAML format.
+
+        :param source: the pipeline spec
+        :param shared: if True, the same pipeline instance is returned for the same source
+        :param kwargs: arguments of Pipeline.create_from_dto() e.g., mock_nonexistent
+        """
+
+        key = PipelineSpecCache.calculate_key(source)
+        shared_key: Optional[tuple] = (key, tuple(sorted(kwargs.items()))) if shared else None
+
+        if shared:
+            with self._lock:
+                pipeline = self._shared_pipelines.get(shared_key)
+                if pipeline is not None:
+                    self._shared_pipelines.move_to_end(shared_key)
+                    return pipeline
+
+        pipeline = Pipeline.create_from_dto(PipelineInstanceDTO(**self._retrieve_parsed_spec(key, source)), **kwargs)
+
+        if shared:
+            with self._lock:
+                pipeline = self._shared_pipelines.setdefault(shared_key, pipeline)
+                while self.max_size < len(self._shared_pipelines):
+                    self._shared_pipelines.popitem(last=False)
+
+        return pipeline
+
+    def clear(self) -> None:
+        with self._lock:
+            self._parsed_specs.clear()
+            self._shared_pipelines.clear()
+
+
+pipeline_spec_cache = PipelineSpecCache()
+"""
+Process-wide cache, which is used by load_pipeline()
+"""
+
+
+def load_pipeline(source: str | bytes, shared: bool = False, use_cache: bool = True, **kwargs: Any) -> Pipeline:
+    """
+    Drop-in replacement of Pipeline.create_from_string(), which accepts both the YAML and
+    the compact format and uses the process-wide cache.
+
+    :param source: the pipeline spec
+    :param shared: if True, the same pipeline instance is returned for the same source, see PipelineSpecCache
+    :param use_cache: if False, the source is always parsed
+    :param kwargs: arguments of Pipeline.create_from_dto() e.g., mock_nonexistent
+    """
+
+    if use_cache:
+        return pipeline_spec_cache.load(source, shared, **kwargs)
+
+    return Pipeline.create_from_dto(PipelineInstanceDTO(**parse_spec(source)), **kwargs)
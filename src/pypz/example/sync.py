@@ -0,0 +1,44 @@
+# =============================================================================
+# Copyright (c) 2024 by Laszlo Anka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+"""
+The operator replicas are materialized by deep copying the attributes of the original
+operator and of its plugins, which fails for the synchronization primitives. These
+variants create a new, independent primitive, if copied, since the state of the
+original shall not be shared with the replicas anyway.
+"""
+
+import threading
+
+
+class ReplicableEvent(threading.Event):
+
+    def __deepcopy__(self, memo: dict) -> "ReplicableEvent":
+        return ReplicableEvent()
+
+
+class ReplicableLock:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> bool:
+        return self._lock.acquire()
+
+    def __exit__(self, *args) -> None:
+        self._lock.release()
+
+    def __deepcopy__(self, memo: dict) -> "ReplicableLock":
+        return ReplicableLock()
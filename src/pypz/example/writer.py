@@ -13,41 +13,51 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 # =============================================================================
-import time
-from typing import Optional, Any
+from typing import Any, Generator, Optional, Union
 
 from pypz.core.commons.parameters import OptionalParameter, RequiredParameter
-from pypz.core.specs.operator import Operator
-from pypz.plugins.kafka_io.ports import KafkaChannelOutputPort
-from pypz.plugins.loggers.default import DefaultLoggerPlugin
 
+from pypz.example.generators import GeneratorOperator
+from pypz.example.instrumentation import InstrumentationPlugin
+from pypz.example.ports import SchemaKafkaChannelOutputPort
+from pypz.example.loggers import AsyncLoggerPlugin
+from pypz.example.pacing import TokenBucket
+from pypz.example.records import ColumnBatch, ColumnsRecordType, DictRecordType, RowRecordType, check_record_type
+from pypz.example.schemas import DemoRecordSchemaString, get_demo_record_schema
 
-class DemoWriterOperator(Operator):
+
+class DemoWriterOperator(GeneratorOperator):
     """
-    This operator sends avro records to the receiving operators.
+    This operator sends avro records to the receiving operators. The records are yielded
+    by the _on_running generator, see GeneratorOperator.
     """
 
-    AvroSchemaString = """
-    {
-        "type": "record",
-        "name": "DemoRecord",
-        "fields": [
-            {
-                "name": "text",
-                "type": "string"
-            }
-        ]
-    }
+    AvroSchemaString = DemoRecordSchemaString
+
+    OutputPortType = SchemaKafkaChannelOutputPort
+    """
+    Type of the output port, subclasses can override it to use a different channel technology
     """
 
     record_count = RequiredParameter(int, alt_name="recordCount",
                                      description="Specifies number of records to send")
     message = OptionalParameter(str, description="Specifies the message prefix for the record")
+    batch_size = OptionalParameter(int, alt_name="batchSize",
+                                   description="Specifies the max number of records sent in one iteration")
+    target_records_per_second = OptionalParameter(int, alt_name="targetRecordsPerSecond",
+                                                  description="Specifies the emission rate of each operator "
+                                                              "instance. Non-positive value disables pacing")
+    max_batch_latency_ms = OptionalParameter(int, alt_name="maxBatchLatencyMs",
+                                             description="Specifies, how long an iteration waits to fill a "
+                                                         "batch before sending the records generated so far")
+    record_type = OptionalParameter(str, alt_name="recordType",
+                                    description="Representation of the sent records: 'dict', 'row' (tuple with "
+                                                "named fields) or 'columns' (ColumnBatch)")
 
     def __init__(self, name: str = None, *args, **kwargs):
         super().__init__(name, *args, **kwargs)
 
-        self.output_port = KafkaChannelOutputPort(schema=DemoWriterOperator.AvroSchemaString)
+        self.output_port = self.OutputPortType(schema=DemoWriterOperator.AvroSchemaString)
         """
         An output port enables the operator to send data to other operators. 
         The connection is usually established on the pipeline level.
@@ -55,10 +65,17 @@ class DemoWriterOperator(Operator):
 
         self.output_record_count: int = 0
 
-        self.logger = DefaultLoggerPlugin()
+        self.logger = AsyncLoggerPlugin()
         """
-        A logger plugin enables the framework to handle logs from the framework. The default
-        logger puts the messages to stdout.
+        A logger plugin enables the framework to handle logs from the framework. The async
+        logger puts the messages to stdout from a background thread, so logging does not
+        block the processing.
+        """
+
+        self.instrumentation = InstrumentationPlugin()
+        """
+        The instrumentation plugin measures the hot path of the operator. The metrics can be
+        exposed via HTTP (parameter "port") or file (parameter "exportFilePath").
         """
 
         self.record_count = None
@@ -71,37 +88,94 @@ class DemoWriterOperator(Operator):
         This is an optional parameter, the default value is the initial value of the variable.
         """
 
+        self.batch_size = 1
+        """
+        By default, every iteration sends a single record.
+        """
+
+        self.target_records_per_second = 1
+        """
+        By default, one record per second is sent.
+        """
+
+        self.max_batch_latency_ms = 1000
+        """
+        By default, an iteration waits at most 1 second for the records of a batch.
+        """
+
+        self.record_type = DictRecordType
+        """
+        By default, every record is a dict. The rows and the ColumnBatch spare the per-record
+        dicts, see records.py.
+        """
+
+        self._row_type: Optional[type] = None
+
+        self._token_bucket: Optional[TokenBucket] = None
+        """
+        Paces the emission of the records. It is created at init, since the parameters
+        are not yet known at construction time.
+        """
+
     def _on_init(self) -> bool:
         """
         This method shall implement the logic to initialize the operation.
 
         :return: True succeeded, False if more iteration required (to not block the execution)
         """
+        if 0 >= self.batch_size:
+            raise ValueError(f"Invalid batch size: {self.batch_size}")
+
+        self._token_bucket = TokenBucket(self.target_records_per_second, self.batch_size)
+
+        if RowRecordType == check_record_type(self.record_type):
+            self._row_type = get_demo_record_schema().get_row_type()
+
         return True
 
-    def _on_running(self) -> Optional[bool]:
+    def _on_running(self) -> Generator[Optional[Union[list, ColumnBatch]], None, bool]:
         """
-        This method shall implement the actual processing logic.
+        This method shall implement the actual processing logic. Since it is a generator,
+        the yielded records are collected and sent by the GeneratorOperator.
 
         :return: True succeeded, False if more iteration required (to not block the execution), None if
         framework shall decide
         """
-        record_to_send = {
-            "text": f"{self.message}_{self.output_record_count}"
-        }
+        while self.output_record_count < self.record_count:
+            """ The token bucket blocks until either the entire batch can be sent or
+                the max batch latency expires, in the latter case a partial batch is sent. """
+            record_count_to_send = self._token_bucket.acquire(
+                min(self.batch_size, self.record_count - self.output_record_count),
+                self.max_batch_latency_ms / 1000
+            )
 
-        self.get_logger().info(f"Generated record: {record_to_send}")
+            if 0 == record_count_to_send:
+                yield None
+                continue
 
-        self.output_port.send([record_to_send])
+            texts = [
+                f"{self.message}_{record_idx}"
+                for record_idx in range(self.output_record_count, self.output_record_count + record_count_to_send)
+            ]
 
-        self.output_record_count += 1
+            if ColumnsRecordType == self.record_type:
+                records_to_send = ColumnBatch({"text": texts})
+            elif RowRecordType == self.record_type:
+                records_to_send = list(map(self._row_type, texts))
+            else:
+                records_to_send = [{"text": text} for text in texts]
 
-        if self.record_count == self.output_record_count:
-            return True
+            self.get_logger().info("Generated records: %d; Last: %s", record_count_to_send, records_to_send[-1])
 
-        time.sleep(1)
+            self.output_record_count += record_count_to_send
 
-        return False
+            yield records_to_send
+
+            if self._token_bucket.is_enabled():
+                # The next batch is paced anyway, so the records are sent right away
+                yield None
+
+        return True
 
     def _on_shutdown(self) -> bool:
         """
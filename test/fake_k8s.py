@@ -0,0 +1,430 @@
+# =============================================================================
+# Copyright (c) 2024 by Laszlo Anka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+import collections
+import copy
+import json
+import threading
+import time
+import uuid
+from typing import Any, Callable, Iterator, Optional
+
+from kubernetes.client import ApiClient, ApiException, V1PodList, V1SecretList
+
+
+class FakeApiResponse:
+    """
+    Minimal response object, which can be deserialized by the ApiClient
+    """
+
+    def __init__(self, data: Any):
+        self.data: str = json.dumps(data)
+
+
+class FakeStreamResponse:
+    """
+    Minimal streaming response object, which can be consumed by kubernetes.watch.Watch
+    i.e., the same way as a response requested with _preload_content=False.
+
+    :param data_generator_factory: creates the generator of the data to be streamed,
+        the generator shall stop after the response is closed
+    """
+
+    def __init__(self, data_generator_factory: Callable[["FakeStreamResponse", Optional[int]], Iterator[bytes]]):
+        self.closed: bool = False
+        self._data_generator_factory = data_generator_factory
+
+    def stream(self, amt: int = None, decode_content: bool = False) -> Iterator[bytes]:
+        yield from self._data_generator_factory(self, amt)
+
+    def close(self) -> None:
+        self.closed = True
+
+    def release_conn(self) -> None:
+        pass
+
+
+def match_label_selector(labels: Optional[dict], label_selector: Optional[str]) -> bool:
+    """
+    Evaluates equality based label selectors e.g., "a=b,c!=d,e".
+    """
+
+    if not label_selector:
+        return True
+
+    labels = labels or {}
+
+    for term in label_selector.split(","):
+        term = term.strip()
+        if "!=" in term:
+            key, value = term.split("!=", 1)
+            if labels.get(key) == value:
+                return False
+        elif "=" in term:
+            key, value = term.split("=", 1)
+            if labels.get(key.rstrip("=")) != value:
+                return False
+        elif term not in labels:
+            return False
+
+    return True
+
+
+class FakeCoreV1Api:
+    """
+    In-memory replacement of the CoreV1Api, which implements the methods used by the
+    KubernetesDeployer and its extensions. It can be injected into the deployers to
+    test them without a cluster. The objects are stored in their serialized form and
+    returned as kubernetes client models, hence the deployers cannot differentiate it
+    from the real API.
+
+    Created pods are in "Pending" phase, which can be changed by set_pod_phase(). The
+    latency of the API calls can be simulated and the number of calls as well as the
+    max number of concurrent calls are recorded.
+
+    Pod lists can be watched via kubernetes.watch.Watch. If the requested resource
+    version is older than the kept event history or the watcher falls behind it, the
+    watch fails with 410 Gone.
+
+    :param latency_sec: simulated duration of each API call
+    :param max_event_count: number of pod events kept for watch requests
+    """
+
+    def __init__(self, latency_sec: float = 0, max_event_count: int = 10000):
+        self.latency_sec: float = latency_sec
+
+        self.call_counts: dict[str, int] = collections.defaultdict(int)
+
+        self.max_concurrent_call_count: int = 0
+
+        self._concurrent_call_count: int = 0
+
+        self._pods: dict[str, dict[str, dict]] = collections.defaultdict(dict)
+        """
+        Serialized pods per namespace
+        """
+
+        self._secrets: dict[str, dict[str, dict]] = collections.defaultdict(dict)
+        """
+        Serialized secrets per namespace
+        """
+
+        self._pod_logs: dict[str, dict[str, str]] = collections.defaultdict(dict)
+
+        self._resource_version: int = 0
+
+        self._pod_events: collections.deque = collections.deque(maxlen=max_event_count)
+        """
+        History of (resource version, event type, namespace, pod) to serve watch requests
+        """
+
+        self._lock: threading.RLock = threading.RLock()
+
+        self._changed: threading.Condition = threading.Condition(self._lock)
+
+        self._api_client: ApiClient = ApiClient()
+
+    # --------------------------
+    # Helpers
+    # --------------------------
+
+    def _call(self, method_name: str) -> None:
+        with self._lock:
+            self.call_counts[method_name] += 1
+            self._concurrent_call_count += 1
+            self.max_concurrent_call_count = max(self.max_concurrent_call_count, self._concurrent_call_count)
+
+        try:
+            if 0 < self.latency_sec:
+                time.sleep(self.latency_sec)
+        finally:
+            with self._lock:
+                self._concurrent_call_count -= 1
+
+    def _next_resource_version(self) -> str:
+        self._resource_version += 1
+        return str(self._resource_version)
+
+    def _record_pod_event(self, event_type: str, namespace: str, pod: dict) -> None:
+        # Called with the lock held, after the resource version of the pod has been updated
+        self._pod_events.append((self._resource_version, event_type, namespace, copy.deepcopy(pod)))
+        self._changed.notify_all()
+
+    def _generate_pod_events(self, response: FakeStreamResponse, namespace: str, label_selector: Optional[str],
+                             resource_version: Optional[str], timeout_seconds: Optional[int]) -> Iterator[bytes]:
+        deadline = None if timeout_seconds is None else time.monotonic() + timeout_seconds
+
+        with self._lock:
+            if resource_version is None:
+                # Like the real API, the watch starts with the current state
+                last_resource_version = self._resource_version
+                events = [(last_resource_version, "ADDED", namespace, copy.deepcopy(pod))
+                          for pod in self._pods[namespace].values()]
+            else:
+                last_resource_version = int(resource_version)
+                events = []
+
+        while not response.closed:
+            for event_resource_version, event_type, event_namespace, pod in events:
+                last_resource_version = max(last_resource_version, event_resource_version)
+                if (namespace == event_namespace) and \
+                        match_label_selector(pod["metadata"].get("labels"), label_selector):
+                    yield (json.dumps({"type": event_type, "object": pod}) + "\n").encode()
+
+            with self._lock:
+                # Events missed by the watcher have been already dropped from the history
+                expired = (0 < len(self._pod_events)) and (last_resource_version < self._pod_events[0][0] - 1)
+
+                if not expired:
+                    events = [event for event in self._pod_events if last_resource_version < event[0]]
+
+            if expired:
+                yield (json.dumps({"type": "ERROR", "object": {
+                    "code": 410, "reason": "Expired", "message": f"Too old resource version: {last_resource_version}"
+                }}) + "\n").encode()
+                return
+
+            with self._lock:
+                if 0 == len(events):
+                    remaining_sec = None if deadline is None else deadline - time.monotonic()
+
+                    if (remaining_sec is not None) and (remaining_sec <= 0):
+                        return
+
+                    self._changed.wait(0.1 if remaining_sec is None else min(0.1, remaining_sec))
+
+    def _serialize(self, body: Any) -> dict:
+        return copy.deepcopy(self._api_client.sanitize_for_serialization(body))
+
+    def _deserialize(self, data: Any, response_type: str) -> Any:
+        return self._api_client.deserialize(FakeApiResponse(data), response_type)
+
+    @staticmethod
+    def _not_found(kind: str, name: str) -> ApiException:
+        return ApiException(status=404, reason=f"{kind} not found: {name}")
+
+    # --------------------------
+    # Test helpers
+    # --------------------------
+
+    def set_pod_phase(self, name: str, namespace: str, phase: str) -> None:
+        with self._lock:
+            if name not in self._pods[namespace]:
+                raise FakeCoreV1Api._not_found("Pod", name)
+
+            pod = self._pods[namespace][name]
+            pod["status"] = {"phase": phase}
+
+            if "Running" == phase:
+                pod["status"]["containerStatuses"] = [{
+                    "name": container["name"], "image": container["image"], "imageID": "",
+                    "ready": True, "restartCount": 0, "started": True
+                } for container in pod["spec"]["containers"]]
+            pod["metadata"]["resourceVersion"] = self._next_resource_version()
+            self._record_pod_event("MODIFIED", namespace, pod)
+
+    def set_pod_log(self, name: str, namespace: str, log: str) -> None:
+        with self._lock:
+            self._pod_logs[namespace][name] = log
+
+    def append_pod_log(self, name: str, namespace: str, log: str) -> None:
+        with self._lock:
+            self._pod_logs[namespace][name] = self._pod_logs[namespace].get(name, "") + log
+            self._changed.notify_all()
+
+    # --------------------------
+    # Secrets
+    # --------------------------
+
+    def create_namespaced_secret(self, namespace: str, body: Any, **kwargs) -> Any:
+        self._call("create_namespaced_secret")
+
+        secret = self._serialize(body)
+        name = secret["metadata"]["name"]
+
+        with self._lock:
+            if name in self._secrets[namespace]:
+                raise ApiException(status=409, reason=f"Secret already exists: {name}")
+
+            secret["metadata"]["namespace"] = namespace
+            secret["metadata"]["resourceVersion"] = self._next_resource_version()
+            self._secrets[namespace][name] = secret
+
+            return self._deserialize(secret, "V1Secret")
+
+    def read_namespaced_secret(self, name: str, namespace: str, **kwargs) -> Any:
+        self._call("read_namespaced_secret")
+
+        with self._lock:
+            if name not in self._secrets[namespace]:
+                raise FakeCoreV1Api._not_found("Secret", name)
+
+            return self._deserialize(self._secrets[namespace][name], "V1Secret")
+
+    def list_namespaced_secret(self, namespace: str, label_selector: str = None, **kwargs) -> V1SecretList:
+        self._call("list_namespaced_secret")
+
+        with self._lock:
+            return self._deserialize({
+                "items": [secret for secret in self._secrets[namespace].values()
+                          if match_label_selector(secret["metadata"].get("labels"), label_selector)]
+            }, "V1SecretList")
+
+    def delete_namespaced_secret(self, name: str, namespace: str, **kwargs) -> None:
+        self._call("delete_namespaced_secret")
+
+        with self._lock:
+            if self._secrets[namespace].pop(name, None) is None:
+                raise FakeCoreV1Api._not_found("Secret", name)
+
+    # --------------------------
+    # Pods
+    # --------------------------
+
+    def create_namespaced_pod(self, namespace: str, body: Any, **kwargs) -> Any:
+        self._call("create_namespaced_pod")
+
+        pod = self._serialize(body)
+        name = pod["metadata"]["name"]
+
+        with self._lock:
+            if name in self._pods[namespace]:
+                raise ApiException(status=409, reason=f"Pod already exists: {name}")
+
+            pod["metadata"]["namespace"] = namespace
+            pod["metadata"]["uid"] = str(uuid.uuid4())
+            pod["metadata"]["resourceVersion"] = self._next_resource_version()
+            pod["status"] = {"phase": "Pending"}
+            self._pods[namespace][name] = pod
+            self._record_pod_event("ADDED", namespace, pod)
+
+            return self._deserialize(pod, "V1Pod")
+
+    def read_namespaced_pod(self, name: str, namespace: str, **kwargs) -> Any:
+        self._call("read_namespaced_pod")
+
+        with self._lock:
+            if name not in self._pods[namespace]:
+                raise FakeCoreV1Api._not_found("Pod", name)
+
+            return self._deserialize(self._pods[namespace][name], "V1Pod")
+
+    def list_namespaced_pod(self, namespace: str, label_selector: str = None, watch: bool = False,
+                            resource_version: str = None, timeout_seconds: int = None,
+                            **kwargs) -> V1PodList | FakeStreamResponse:
+        """
+        :return: V1PodList
+        """
+
+        self._call("list_namespaced_pod")
+
+        if watch:
+            return FakeStreamResponse(
+                lambda response, _: self._generate_pod_events(response, namespace, label_selector,
+                                                              resource_version, timeout_seconds)
+            )
+
+        with self._lock:
+            return self._deserialize({
+                "metadata": {"resourceVersion": str(self._resource_version)},
+                "items": [pod for pod in self._pods[namespace].values()
+                          if match_label_selector(pod["metadata"].get("labels"), label_selector)]
+            }, "V1PodList")
+
+    def patch_namespaced_pod(self, name: str, namespace: str, body: Any, **kwargs) -> Any:
+        """
+        Merges the metadata of the body into the stored pod, which is the only part
+        of a pod that can be patched without restrictions.
+        """
+
+        self._call("patch_namespaced_pod")
+
+        patch = self._serialize(body)
+
+        with self._lock:
+            if name not in self._pods[namespace]:
+                raise FakeCoreV1Api._not_found("Pod", name)
+
+            metadata = self._pods[namespace][name]["metadata"]
+            for key in ("labels", "annotations"):
+                if key in patch.get("metadata", {}):
+                    metadata.setdefault(key, {}).update(patch["metadata"][key])
+            metadata["resourceVersion"] = self._next_resource_version()
+            self._record_pod_event("MODIFIED", namespace, self._pods[namespace][name])
+
+            return self._deserialize(self._pods[namespace][name], "V1Pod")
+
+    def delete_namespaced_pod(self, name: str, namespace: str, **kwargs) -> None:
+        self._call("delete_namespaced_pod")
+
+        with self._lock:
+            pod = self._pods[namespace].pop(name, None)
+
+            if pod is None:
+                raise FakeCoreV1Api._not_found("Pod", name)
+
+            self._pod_logs[namespace].pop(name, None)
+
+            pod["metadata"]["resourceVersion"] = self._next_resource_version()
+            self._record_pod_event("DELETED", namespace, pod)
+
+    def _generate_pod_log(self, response: FakeStreamResponse, chunk_size: Optional[int], name: str,
+                          namespace: str, follow: bool, limit_bytes: Optional[int]) -> Iterator[bytes]:
+        chunk_size = chunk_size or 65536
+        position = 0
+
+        while not response.closed:
+            with self._lock:
+                log = self._pod_logs[namespace].get(name, "").encode()
+                pod = self._pods[namespace].get(name)
+
+                if limit_bytes is not None:
+                    log = log[:limit_bytes]
+
+                if len(log) <= position:
+                    # Following stops, once the pod terminated or has been deleted
+                    if (not follow) or (pod is None) or (pod["status"]["phase"] in ("Succeeded", "Failed")) or \
+                            ((limit_bytes is not None) and (limit_bytes <= position)):
+                        return
+
+                    self._changed.wait(0.1)
+                    continue
+
+            chunk = log[position:position + chunk_size]
+            position += len(chunk)
+            yield chunk
+
+    def read_namespaced_pod_log(self, name: str, namespace: str, follow: bool = False,
+                                limit_bytes: int = None, _preload_content: bool = True,
+                                **kwargs) -> str | FakeStreamResponse:
+        """
+        Notice that the time based filters (since_seconds, since_time) and the timestamps
+        are not supported, since the fake logs have no time information.
+        """
+
+        self._call("read_namespaced_pod_log")
+
+        with self._lock:
+            if name not in self._pods[namespace]:
+                raise FakeCoreV1Api._not_found("Pod", name)
+
+            if _preload_content:
+                log = self._pod_logs[namespace].get(name, "")
+                return log if limit_bytes is None else log.encode()[:limit_bytes].decode(errors="ignore")
+
+        return FakeStreamResponse(
+            lambda response, chunk_size: self._generate_pod_log(response, chunk_size, name, namespace,
+                                                                follow, limit_bytes)
+        )
@@ -0,0 +1,152 @@
+# =============================================================================
+# Copyright (c) 2024 by Laszlo Anka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+import io
+import json
+
+import avro.schema
+import pytest
+from avro.io import BinaryDecoder, BinaryEncoder, DatumReader, DatumWriter
+
+from pypz.example.avro_codegen import compile_codec
+from pypz.example.codec_benchmark import WideRecordProjection, WideRecordSchema, create_records
+from pypz.example.records import ColumnBatch, ColumnsRecordType, RowRecordType, to_dicts
+from pypz.example.schemas import get_demo_record_schema
+
+MixedRecordSchema = avro.schema.parse(json.dumps({
+    "type": "record",
+    "name": "MixedRecord",
+    "fields": [
+        {"name": "int_value", "type": "int"},
+        {"name": "float_value", "type": "float"},
+        {"name": "bytes_value", "type": "bytes"},
+        {"name": "fixed_value", "type": {"type": "fixed", "name": "Digest", "size": 4}},
+        {"name": "optional_child", "type": ["null", {
+            "type": "record", "name": "Child", "fields": [{"name": "name", "type": "string"}]
+        }]},
+        {"name": "children", "type": {"type": "array", "items": "Child"}},
+        {"name": "number", "type": ["null", "long", "string"]},
+    ],
+}))
+
+MixedRecords = [
+    {"int_value": -(1 << 31), "float_value": 0.5, "bytes_value": b"", "fixed_value": b"\x00\x01\x02\x03",
+     "optional_child": None, "children": [], "number": None},
+    {"int_value": (1 << 31) - 1, "float_value": -2.25, "bytes_value": b"\xff" * 300, "fixed_value": b"abcd",
+     "optional_child": {"name": "child"}, "children": [{"name": "a"}, {"name": "b"}], "number": -(1 << 40)},
+    {"int_value": 0, "float_value": 1e10, "bytes_value": b"bytes", "fixed_value": b"\xff\xfe\xfd\xfc",
+     "optional_child": {"name": ""}, "children": [{"name": "ü" * 100}], "number": "text"},
+]
+
+
+def encode_generic(schema, record) -> bytes:
+    buffer = io.BytesIO()
+    DatumWriter(schema).write(record, BinaryEncoder(buffer))
+    return buffer.getvalue()
+
+
+def decode_generic(schema, data: bytes):
+    return DatumReader(schema).read(BinaryDecoder(io.BytesIO(data)))
+
+
+@pytest.mark.parametrize("schema, records", [
+    (get_demo_record_schema().parsed_schema, create_records(get_demo_record_schema(), 100)),
+    (WideRecordSchema.parsed_schema, create_records(WideRecordSchema, 100)),
+    (MixedRecordSchema, MixedRecords),
+])
+def test_codec_matches_generic_avro(schema, records):
+    codec = compile_codec(schema)
+
+    encoded_records = codec.encode_batch(records)
+
+    assert [encode_generic(schema, record) for record in records] == encoded_records
+    assert [decode_generic(schema, data) for data in encoded_records] == codec.decode_batch(encoded_records)
+    assert records[0] == codec.decode(codec.encode(records[0]))
+
+
+def test_codec_rejects_invalid_records():
+    codec = compile_codec(get_demo_record_schema().parsed_schema)
+
+    # The error is not descriptive, the callers fall back to the generic path to explain it
+    with pytest.raises(Exception):
+        codec.encode_batch([{"text": 1}])
+
+    with pytest.raises(TypeError):
+        compile_codec(MixedRecordSchema).encode_batch([{**MixedRecords[0], "int_value": 1 << 31}])
+
+
+def test_codec_is_not_generated_for_unsupported_schemas():
+    schema = avro.schema.parse(json.dumps({
+        "type": "record",
+        "name": "LogicalRecord",
+        "fields": [{"name": "timestamp", "type": {"type": "long", "logicalType": "timestamp-millis"}}],
+    }))
+
+    assert compile_codec(schema) is None
+
+
+@pytest.mark.parametrize("schema, records, projected_field_names", [
+    (WideRecordSchema.parsed_schema, create_records(WideRecordSchema, 100), WideRecordProjection),
+    (WideRecordSchema.parsed_schema, create_records(WideRecordSchema, 100), ["position", "tags", "values"]),
+    (MixedRecordSchema, MixedRecords, ["number"]),
+    (MixedRecordSchema, MixedRecords, ["int_value", "children"]),
+])
+def test_projected_codec_skips_other_fields(schema, records, projected_field_names):
+    codec = compile_codec(schema, projected_field_names)
+
+    decoded_records = codec.decode_batch(codec.encode_batch(records))
+
+    assert [{field_name: record[field_name] for field_name in projected_field_names}
+            for record in records] == decoded_records
+    assert [field.name for field in schema.fields if field.name in projected_field_names] == \
+        list(decoded_records[0].keys())
+
+
+@pytest.mark.parametrize("projected_field_names", [[], ["unknown"], ["long_0", "unknown"]])
+def test_invalid_projection_is_rejected(projected_field_names):
+    with pytest.raises(ValueError):
+        compile_codec(WideRecordSchema.parsed_schema, projected_field_names)
+
+
+def test_projected_codec_is_shared_by_the_same_projections():
+    codec = WideRecordSchema.get_codec(["text_0", "long_0"])
+
+    assert codec is WideRecordSchema.get_codec(["long_0", "text_0"])
+    assert codec is not WideRecordSchema.get_codec()
+    assert ["long_0", "text_0"] == codec.projected_field_names
+
+
+@pytest.mark.parametrize("record_type", [RowRecordType, ColumnsRecordType])
+@pytest.mark.parametrize("projected_field_names", [None, WideRecordProjection])
+def test_compact_records_match_dicts(record_type, projected_field_names):
+    records = create_records(WideRecordSchema, 100)
+    dict_codec = compile_codec(WideRecordSchema.parsed_schema, projected_field_names)
+    codec = compile_codec(WideRecordSchema.parsed_schema, projected_field_names, record_type)
+
+    encoded_records = dict_codec.encode_batch(records)
+    decoded_records = codec.decode_batch(encoded_records)
+
+    assert dict_codec.decode_batch(encoded_records) == to_dicts(decoded_records)
+
+    if projected_field_names is None:
+        # The compact records can be encoded as well
+        assert encoded_records == codec.encode_batch(decoded_records)
+
+
+def test_columns_with_unknown_fields_are_rejected():
+    codec = compile_codec(get_demo_record_schema().parsed_schema)
+
+    with pytest.raises(TypeError):
+        codec.encode_batch(ColumnBatch({"text": ["a"], "unknown": ["b"]}))
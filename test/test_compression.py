@@ -0,0 +1,115 @@
+# =============================================================================
+# Copyright (c) 2024 by Laszlo Anka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+import json
+
+import pytest
+
+from pypz.example.compression import Codecs, CompressionSelector, compress_payload, decompress_payload, \
+    is_compressed, parse_compression
+
+
+def create_batch(offset: int = 0, record_count: int = 1000) -> bytes:
+    return json.dumps([{"text": f"HelloWorld_{index}"} for index in range(offset, offset + record_count)]).encode()
+
+
+@pytest.mark.parametrize("compression", [f"{codec_name}:1" if "none" != codec_name else codec_name
+                                         for codec_name in Codecs] + list(Codecs))
+def test_payload_round_trip(compression):
+    data = create_batch()
+    payload = compress_payload(data, compression)
+
+    assert ("none" != compression) == is_compressed(payload)
+    assert len(payload) <= len(data)
+    assert data == decompress_payload(payload)
+    assert data == decompress_payload(memoryview(payload))
+
+
+def test_incompressible_payload_is_not_compressed():
+    data = bytes(range(16))
+
+    assert data is compress_payload(data, "gzip")
+    assert data is decompress_payload(data)
+
+
+def test_corrupt_payload_is_rejected():
+    payload = compress_payload(create_batch(), "gzip")
+
+    with pytest.raises(ValueError):
+        decompress_payload(payload[:-10])
+
+    with pytest.raises(ValueError):
+        decompress_payload(b"PZC\x01\x10\x00\x00\x00" + bytes(16))
+
+
+def test_unknown_codec_is_rejected():
+    with pytest.raises(ValueError):
+        parse_compression("brotli")
+
+    with pytest.raises(ValueError):
+        CompressionSelector("brotli")
+
+    with pytest.raises(ValueError):
+        decompress_payload(b"PZC\xff" + bytes(16))
+
+
+def test_fixed_compression_is_always_selected():
+    selector = CompressionSelector("gzip:6", bandwidth_mbps=1_000_000)
+
+    for offset in range(0, 10000, 1000):
+        data = create_batch(offset)
+        payload = selector.compress(data)
+
+        assert "gzip:6" == selector.selected
+        assert data == decompress_payload(payload)
+
+    statistics = selector.get_statistics()
+
+    assert "gzip:6" == statistics["compression"]
+    assert 1 < statistics["compressionRatio"]
+    assert "compressionCandidates" not in statistics
+
+
+@pytest.mark.parametrize("bandwidth_mbps, expected_compression", [(1, "gzip:6"), (1_000_000_000, "none")])
+def test_adaptive_compression_follows_bandwidth(bandwidth_mbps, expected_compression):
+    selector = CompressionSelector("adaptive", bandwidth_mbps=bandwidth_mbps, candidates=["none", "gzip:6"],
+                                   sample_interval=5)
+
+    for offset in range(0, 20000, 1000):
+        data = create_batch(offset)
+
+        assert data == decompress_payload(selector.compress(data))
+
+    assert expected_compression == selector.selected
+    assert {"none", "gzip:6"} == selector.get_statistics()["compressionCandidates"].keys()
+
+
+def test_adaptive_compression_samples_without_compressing():
+    selector = CompressionSelector("adaptive", bandwidth_mbps=1, candidates=["none", "gzip:1", "gzip:9"])
+
+    for offset in range(0, 3000, 1000):
+        selector.sample(create_batch(offset))
+
+    statistics = selector.get_statistics()
+
+    assert "none" != selector.selected
+    assert all(1 == candidate["sampleCount"] for candidate in statistics["compressionCandidates"].values())
+    assert statistics["compressionRatio"] is None
+
+
+def test_unavailable_candidates_are_skipped():
+    selector = CompressionSelector("adaptive", candidates=["none", "gzip", "unknown:1"])
+
+    assert ["none", "gzip"] == selector.candidates
@@ -0,0 +1,203 @@
+# =============================================================================
+# Copyright (c) 2024 by Laszlo Anka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+import threading
+import time
+
+from pypz.core.specs.operator import Operator
+from pypz.core.specs.utils import Internals
+from pypz.deployers.base import DeploymentState
+from pypz.utils.k8s import sanitize
+
+from pypz.example.deployers import DiffKubernetesDeployer, PodOperation
+from pypz.example.k8s_pipeline import KubernetesRMQDemoPipeline
+from test.fake_k8s import FakeCoreV1Api
+
+Namespace = "test"
+
+
+class ExpiringFakeCoreV1Api(FakeCoreV1Api):
+    """
+    Modifies every pod right after the next pod list is retrieved, hence a watch
+    resumed from the resource version of that list has already expired.
+    """
+
+    def __init__(self):
+        super().__init__(max_event_count=1)
+
+        self.expire_next_list: bool = False
+
+        self.list_count: int = 0
+
+    def list_namespaced_pod(self, namespace: str, label_selector: str = None, watch: bool = False, **kwargs):
+        result = super().list_namespaced_pod(namespace, label_selector, watch, **kwargs)
+
+        if not watch:
+            self.list_count += 1
+
+            if self.expire_next_list:
+                self.expire_next_list = False
+
+                for pod in result.items:
+                    self.set_pod_phase(pod.metadata.name, namespace, "Running")
+
+        return result
+
+
+def create_pipeline() -> KubernetesRMQDemoPipeline:
+    pipeline = KubernetesRMQDemoPipeline("pipeline")
+    pipeline.set_parameter(">>channelLocation", "RABBITMQ_BROKER_URL")
+    pipeline.writer.set_parameter("recordCount", 30)
+    pipeline.writer.set_parameter("replicationFactor", 2)
+    pipeline.reader.set_parameter("replicationFactor", 3)
+    return pipeline
+
+
+def create_deployer(api: FakeCoreV1Api) -> DiffKubernetesDeployer:
+    return DiffKubernetesDeployer(namespace=Namespace, core_v1_api=api, poll_interval_sec=0.01)
+
+
+def get_pod_uids(api: FakeCoreV1Api) -> dict[str, str]:
+    return {pod.metadata.name: pod.metadata.uid for pod in api.list_namespaced_pod(Namespace).items}
+
+
+def test_compute_diff_creates_everything_first_and_nothing_after_deployment():
+    api = FakeCoreV1Api()
+    deployer = create_deployer(api)
+    pipeline = create_pipeline()
+
+    diff = deployer.compute_diff(pipeline)
+
+    assert 7 == len(diff.pod_operations)
+    assert all(PodOperation.Create == operation for operation in diff.pod_operations.values())
+    assert diff.secret is not None
+
+    deployer.deploy_diff(pipeline)
+
+    diff = deployer.compute_diff(create_pipeline())
+
+    assert diff.is_empty()
+    assert 7 == len(diff.unchanged_pod_names)
+
+
+def test_deploy_diff_replaces_only_changed_pods_and_secret():
+    api = FakeCoreV1Api()
+    deployer = create_deployer(api)
+    pipeline = create_pipeline()
+
+    deployer.deploy_diff(pipeline)
+    uids = get_pod_uids(api)
+
+    pipeline.writer.set_parameter("recordCount", 60)
+    report = deployer.deploy_diff(pipeline)
+
+    writer_pod_names = {pod_name for pod_name in uids if pod_name.startswith("pipeline-writer")}
+
+    assert {pod_name: PodOperation.Replace for pod_name in writer_pod_names} == report.diff.pod_operations
+    assert report.diff.secret is not None
+    assert 0 == len(report.failed_results())
+
+    new_uids = get_pod_uids(api)
+
+    assert uids.keys() == new_uids.keys()
+    assert all((uids[pod_name] != new_uids[pod_name]) == (pod_name in writer_pod_names) for pod_name in uids)
+    assert 60 == deployer.retrieve_deployed_pipeline("pipeline").writer.get_parameter("recordCount")
+
+    assert deployer.deploy_diff(pipeline).diff.is_empty()
+
+
+def test_attach_resynchronizes_expired_watch():
+    api = ExpiringFakeCoreV1Api()
+    deployer = create_deployer(api)
+    pipeline = create_pipeline()
+    pod_names = [sanitize(operator.get_full_name()) for operator in Internals(pipeline).nested_instances.values()]
+
+    deployer.deploy_diff(pipeline)
+
+    states: dict[str, list[DeploymentState]] = {pod_name: [] for pod_name in pod_names}
+    all_running = threading.Event()
+
+    def on_operator_state_change(operator: Operator, state: DeploymentState):
+        states[sanitize(operator.get_full_name())].append(state)
+
+        if all(DeploymentState.Running in pod_states for pod_states in states.values()):
+            all_running.set()
+
+    api.expire_next_list = True
+
+    thread = threading.Thread(target=deployer.attach, args=("pipeline", on_operator_state_change),
+                              kwargs={"watch_timeout_sec": 1}, daemon=True)
+    thread.start()
+
+    try:
+        # The pods are set to running only before the watch, so the state is retrieved by the resync
+        assert all_running.wait(10)
+    finally:
+        for pod_name in pod_names:
+            api.set_pod_phase(pod_name, Namespace, "Succeeded")
+
+        thread.join(10)
+
+    assert not thread.is_alive()
+    assert 3 <= api.list_count
+    assert all(DeploymentState.Completed == pod_states[-1] for pod_states in states.values())
+
+
+def test_attach_restarts_failed_operator_with_backoff():
+    api = FakeCoreV1Api()
+    deployer = create_deployer(api)
+    pipeline = create_pipeline()
+    pipeline.writer.set_parameter("replicationFactor", 0)
+    pipeline.reader.set_parameter("replicationFactor", 0)
+
+    deployer.deploy_diff(pipeline)
+    api.set_pod_phase("pipeline-reader", Namespace, "Succeeded")
+
+    failure_times: list[float] = []
+    restart_times: list[float] = []
+    writer_states: list[DeploymentState] = []
+
+    create_namespaced_pod = api.create_namespaced_pod
+
+    def create_restarted_pod(namespace, body, **kwargs):
+        restart_times.append(time.monotonic())
+        return create_namespaced_pod(namespace, body, **kwargs)
+
+    api.create_namespaced_pod = create_restarted_pod
+
+    def on_operator_state_change(operator: Operator, state: DeploymentState):
+        if operator.get_simple_name() != "writer":
+            return
+
+        writer_states.append(state)
+
+        # Every new writer pod fails
+        if DeploymentState.Open == state:
+            failure_times.append(time.monotonic())
+            api.set_pod_phase("pipeline-writer", Namespace, "Failed")
+
+    thread = threading.Thread(target=deployer.attach, args=("pipeline", on_operator_state_change),
+                              kwargs={"restart_on_failure": True, "max_restart_count": 2,
+                                      "restart_backoff_sec": 0.3, "max_restart_backoff_sec": 0.4,
+                                      "watch_timeout_sec": 1}, daemon=True)
+    thread.start()
+    thread.join(20)
+
+    assert not thread.is_alive()
+    assert 2 == len(restart_times)
+    assert 3 == len(failure_times)
+    assert 0.3 <= restart_times[0] - failure_times[0]
+    assert 0.4 <= restart_times[1] - failure_times[1]
+    assert DeploymentState.Failed == writer_states[-1]
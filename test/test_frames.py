@@ -0,0 +1,71 @@
+# =============================================================================
+# Copyright (c) 2024 by Laszlo Anka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+import pytest
+
+from pypz.example.frames import RecordFrame, RecordFrameBatch, is_frame, pack_frame
+
+Records = [b"", b"HelloWorld", "ü" * 10, bytearray(b"bytes"), memoryview(b"view")]
+
+
+def test_frame_round_trip():
+    frame = RecordFrame(pack_frame(Records))
+    expected_records = [bytes(record, "utf-8") if isinstance(record, str) else bytes(record) for record in Records]
+
+    assert len(Records) == len(frame)
+    assert expected_records == [bytes(record) for record in frame]
+    assert expected_records[-1] == bytes(frame[-1])
+    assert sum(map(len, expected_records)) == frame.get_payload_size()
+
+    with pytest.raises(IndexError):
+        frame[len(Records)]
+
+
+def test_frame_batch():
+    batch = RecordFrameBatch([RecordFrame(pack_frame([b"a", b"b"])), RecordFrame(pack_frame([])),
+                              RecordFrame(pack_frame([b"c"]))])
+
+    assert 3 == len(batch)
+    assert [b"a", b"b", b"c"] == [bytes(record) for record in batch]
+    assert b"c" == bytes(batch[2])
+    assert b"c" == bytes(batch[-1])
+
+
+@pytest.mark.parametrize("message", [
+    b"PZF1",
+    b"PZF1\x00\x00\x00\x00 plain message",
+    b"PZF1\x01\x00\x00\x00\x05\x00\x00\x00abc",
+    b"PZF1\xff\xff\xff\xff",
+    pack_frame([b"abc"])[:-1],
+])
+def test_messages_starting_with_magic_are_not_frames(message):
+    assert not is_frame(message)
+
+    with pytest.raises(ValueError):
+        RecordFrame(message)
+
+
+class LargeRecord:
+    """
+    Reports a size beyond the range of the offsets without allocating it
+    """
+
+    def __len__(self) -> int:
+        return 1 << 31
+
+
+def test_too_large_payload_is_rejected():
+    with pytest.raises(ValueError):
+        pack_frame([LargeRecord(), LargeRecord()])
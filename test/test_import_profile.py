@@ -0,0 +1,38 @@
+# =============================================================================
+# Copyright (c) 2024 by Laszlo Anka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+import pytest
+
+from pypz.example.import_profile import check_no_transports, create_report, profile_imports
+
+
+@pytest.mark.parametrize("target", [
+    "pypz.example.writer",
+    "pypz.example.reader",
+    "pypz.example.pipeline",
+    "pypz.example.rmq_pipeline",
+    "pypz.example.get_param_schema",
+])
+def test_pipeline_creation_imports_no_transport(target):
+    check_no_transports([create_report([target], profile_imports([target]))])
+
+
+def test_channel_implementation_imports_transport():
+    report = create_report(["pypz.example.kafka_io"], profile_imports(["pypz.example.kafka_io"]))
+
+    assert {"avro", "kafka", "pypz.plugins.kafka_io"} <= set(report["transportModules"])
+
+    with pytest.raises(ImportError):
+        check_no_transports([report])
@@ -0,0 +1,33 @@
+# =============================================================================
+# Copyright (c) 2024 by Laszlo Anka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+import logging
+
+import pytest
+from pypz.plugins.loggers.default import DefaultLoggerPlugin
+
+from pypz.example.loggers import AsyncLoggerPlugin, is_log_level_enabled
+
+
+@pytest.mark.parametrize("logger_plugin_type", [AsyncLoggerPlugin, DefaultLoggerPlugin])
+def test_log_level_is_checked_by_parameter(logger_plugin_type):
+    logger_plugin = logger_plugin_type("logger")
+
+    assert is_log_level_enabled(logger_plugin, logging.INFO)
+    assert not is_log_level_enabled(logger_plugin, logging.DEBUG)
+
+    logger_plugin.set_parameter("logLevel", "DEBUG")
+
+    assert is_log_level_enabled(logger_plugin, logging.DEBUG)
@@ -0,0 +1,128 @@
+# =============================================================================
+# Copyright (c) 2024 by Laszlo Anka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+from pypz.example.benchmark import run_benchmark
+from pypz.example.memory_io import MemoryChannelReader, MemoryChannelWriter, RingBuffer, get_channel_statistics
+from pypz.example.memory_pipeline import MemoryDemoPipeline, MemoryRMQDemoPipeline
+from pypz.example.records import RecordTypes
+
+
+def create_context(group_index: int = 0, group_size: int = 1, group_mode: bool = False) -> MagicMock:
+    context = MagicMock()
+    context.is_in_group_mode.return_value = group_mode
+    context.get_group_size.return_value = group_size
+    context.get_group_index.return_value = group_index
+    context.is_principal.return_value = 0 == group_index
+    context.get_full_name.return_value = f"pipeline.operator_{group_index}.port"
+    return context
+
+
+def open_channels(reader_count: int, writer_count: int, group_mode: bool):
+    readers = [MemoryChannelReader("channel", create_context(index, reader_count, group_mode))
+               for index in range(reader_count)]
+    writers = [MemoryChannelWriter("channel", create_context(index, writer_count))
+               for index in range(writer_count)]
+
+    for channel in [*readers, *writers]:
+        channel.set_location("test")
+
+    readers[0]._create_resources()
+
+    for channel in [*readers, *writers]:
+        assert channel._open_channel()
+
+    return readers, writers
+
+
+def test_ring_buffer_is_bounded_fifo():
+    ring_buffer = RingBuffer(2)
+
+    assert ring_buffer.offer(1) and ring_buffer.offer(2)
+    assert not ring_buffer.offer(3)
+    assert [ring_buffer.poll(), ring_buffer.poll(), ring_buffer.poll()] == [1, 2, None]
+
+
+def test_concurrent_writers_are_counted_exactly():
+    readers, writers = open_channels(1, 8, group_mode=False)
+
+    def write(writer: MemoryChannelWriter):
+        for _ in range(500):
+            writer._write_records([b"record"] * 3)
+
+    threads = [threading.Thread(target=write, args=(writer,)) for writer in writers]
+
+    for thread in threads:
+        thread.start()
+
+    read_record_count = 0
+    while any(thread.is_alive() for thread in threads) or readers[0].has_records():
+        read_record_count += len(readers[0]._read_records())
+
+    for thread in threads:
+        thread.join()
+
+    statistics = readers[0]._resource.statistics
+
+    assert 8 * 500 * 3 == statistics.written_record_count == statistics.read_record_count == read_record_count
+    assert 0 == readers[0].get_consumer_lag()
+
+    readers[0]._delete_resources()
+
+
+def test_group_reads_are_counted_once_per_record():
+    readers, writers = open_channels(3, 1, group_mode=True)
+
+    writers[0]._write_records([b"record"] * 10)
+
+    assert 10 == len(readers[0]._read_records())
+    assert 10 == len(readers[1]._read_records())
+
+    statistics = readers[0]._resource.statistics
+
+    assert 10 == statistics.written_record_count == statistics.read_record_count
+    assert [0, 0, 10] == [reader.get_consumer_lag() for reader in readers]
+
+    assert 10 == len(readers[2]._read_records())
+    assert 10 == statistics.read_record_count
+
+    readers[0]._delete_resources()
+
+
+@pytest.mark.parametrize("record_type", RecordTypes)
+def test_demo_pipeline_delivers_every_record(record_type):
+    pipeline = MemoryDemoPipeline("pipeline")
+    pipeline.writer.set_parameter("recordType", record_type)
+
+    results = run_benchmark(pipeline, record_count=1000, batch_size=100)
+
+    assert 1000 == pipeline.reader.received_record_count
+    assert {"writtenRecordCount": 1000, "readRecordCount": 1000} == {
+        key: value for key, value in next(iter(results["channels"].values())).items() if key.endswith("RecordCount")
+    }
+
+
+def test_rmq_demo_pipeline_delivers_every_record():
+    pipeline = MemoryRMQDemoPipeline("pipeline")
+
+    run_benchmark(pipeline, record_count=500, batch_size=50)
+
+    statistics = next(iter(get_channel_statistics().values()))
+
+    assert 500 == statistics.written_record_count == statistics.read_record_count
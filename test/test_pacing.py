@@ -0,0 +1,154 @@
+# =============================================================================
+# Copyright (c) 2024 by Laszlo Anka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+from unittest.mock import MagicMock
+
+import pytest
+
+from pypz.example import pacing
+from pypz.example.pacing import IdleBackoff, TokenBucket, wait_and_retrieve
+from pypz.example.records import ColumnBatch
+
+
+class FakeClock:
+    """
+    Replaces the time module of the pacing, so the waits are recorded instead of slept
+    """
+
+    def __init__(self):
+        self.now: float = 1000.0
+        self.sleep_times: list[float] = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleep_times.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    clock = FakeClock()
+    monkeypatch.setattr(pacing, "time", clock)
+    return clock
+
+
+def test_token_bucket_allows_burst_up_to_capacity(clock):
+    bucket = TokenBucket(100, 10)
+
+    assert 10 == bucket.acquire(50)
+    assert 0 == bucket.acquire(1)
+    assert [] == clock.sleep_times
+
+    clock.now += 0.055
+
+    assert 5 == bucket.acquire(10)
+
+
+def test_token_bucket_waits_for_tokens(clock):
+    bucket = TokenBucket(100)
+
+    assert 100 == bucket.acquire(100)
+    assert 50 == bucket.acquire(50, max_wait_sec=1)
+    assert pytest.approx(0.5) == sum(clock.sleep_times)
+
+
+def test_token_bucket_acquires_available_tokens_at_timeout(clock):
+    bucket = TokenBucket(100)
+    bucket.acquire(100)
+
+    assert 20 == bucket.acquire(50, max_wait_sec=0.2)
+    assert pytest.approx(0.2) == sum(clock.sleep_times)
+
+
+def test_token_bucket_keeps_the_rate(clock):
+    bucket = TokenBucket(1000, 100)
+    start_time = clock.now
+
+    acquired = sum(bucket.acquire(100, max_wait_sec=1) for _ in range(100))
+
+    # The initial capacity is the only burst
+    assert 10000 == acquired
+    assert pytest.approx(9.9) == clock.now - start_time
+
+
+def test_disabled_token_bucket_does_not_pace(clock):
+    bucket = TokenBucket(0)
+
+    assert not bucket.is_enabled()
+    assert 1000000 == bucket.acquire(1000000, max_wait_sec=1)
+    assert [] == clock.sleep_times
+
+
+def create_input_port(batches: list, can_retrieve: bool = True) -> MagicMock:
+    input_port = MagicMock()
+    input_port.retrieve.side_effect = batches + [[]] * 10000
+    input_port.can_retrieve.return_value = can_retrieve
+    return input_port
+
+
+def test_idle_backoff_spins_yields_then_sleeps_exponentially(clock):
+    backoff = IdleBackoff(spin_count=3, yield_count=2, min_sleep_sec=0.001, max_sleep_sec=0.004)
+
+    for _ in range(9):
+        backoff.idle()
+
+    assert [0, 0, 0.001, 0.002, 0.004, 0.004] == clock.sleep_times
+    assert backoff.is_sleeping()
+
+    backoff.reset()
+
+    assert not backoff.is_sleeping()
+    assert 0 == backoff.get_sleep_time_sec()
+
+
+def test_idle_backoff_sleeps_at_most_the_remaining_time(clock):
+    backoff = IdleBackoff(spin_count=0, yield_count=0, min_sleep_sec=0.1, max_sleep_sec=0.1)
+
+    backoff.idle(0.03)
+    backoff.idle(-1)
+
+    assert [0.03, 0] == clock.sleep_times
+
+
+def test_wait_and_retrieve_collects_until_min_record_count(clock):
+    input_port = create_input_port([[], [1, 2], [], [3], [4, 5]])
+
+    assert [1, 2, 3] == wait_and_retrieve(input_port, 1000, min_record_count=3)
+    assert [4, 5] == wait_and_retrieve(input_port, 1000)
+
+
+def test_wait_and_retrieve_concatenates_column_batches(clock):
+    input_port = create_input_port([ColumnBatch({"text": ["a"]}), ColumnBatch({"text": ["b", "c"]})])
+
+    assert ColumnBatch({"text": ["a", "b", "c"]}) == wait_and_retrieve(input_port, 1000, min_record_count=3)
+
+
+def test_wait_and_retrieve_stops_at_timeout(clock):
+    input_port = create_input_port([[1]])
+    start_time = clock.now
+
+    assert [1] == wait_and_retrieve(input_port, 500, min_record_count=2)
+    assert pytest.approx(0.5) == clock.now - start_time
+
+
+def test_wait_and_retrieve_stops_once_writers_finished(clock):
+    input_port = create_input_port([], can_retrieve=False)
+    backoff = IdleBackoff(spin_count=10, yield_count=0)
+
+    assert [] == wait_and_retrieve(input_port, 1000, idle_backoff=backoff)
+    assert 11 == input_port.retrieve.call_count
+    assert [] == clock.sleep_times
@@ -0,0 +1,70 @@
+# =============================================================================
+# Copyright (c) 2024 by Laszlo Anka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+import os
+
+import pytest
+
+from pypz.example.recorder import RecordingWriter, read_recording, to_columns
+
+
+def write_samples(file_path: str, samples: list[tuple[int, dict[str, float]]]) -> None:
+    writer = RecordingWriter(file_path)
+
+    try:
+        for timestamp_ms, values in samples:
+            writer.write_sample(timestamp_ms, values)
+    finally:
+        writer.close()
+
+
+def test_only_changed_values_are_recorded(tmp_path):
+    file_path = str(tmp_path / "recording.pzsr")
+
+    write_samples(file_path, [(1000, {"a": 1.0, "b": 2.0}), (2000, {"a": 1.0, "b": 3.0}), (3000, {"a": 1.0})])
+
+    assert [(1000, {"a": 1.0, "b": 2.0}), (2000, {"b": 3.0}), (3000, {})] == list(read_recording(file_path))
+
+    timestamps, columns = to_columns(file_path)
+
+    assert [1000, 2000, 3000] == list(timestamps)
+    assert {"a": [1.0, 1.0, 1.0], "b": [2.0, 3.0, 3.0]} == {name: list(column) for name, column in columns.items()}
+
+
+def test_recording_is_continued(tmp_path):
+    file_path = str(tmp_path / "recording.pzsr")
+
+    write_samples(file_path, [(1000, {"a": 1.0})])
+    write_samples(file_path, [(2000, {"a": 1.0, "b": 2.0})])
+
+    assert [(1000, {"a": 1.0}), (2000, {"b": 2.0})] == list(read_recording(file_path))
+
+
+@pytest.mark.parametrize("cut_size", [1, 5, 8, 10, 12])
+def test_truncated_recording_is_continued(tmp_path, cut_size):
+    file_path = str(tmp_path / "recording.pzsr")
+
+    write_samples(file_path, [(1000, {"a": 1.0}), (2000, {"a": 2.0, "series_b": 3.0})])
+
+    # Simulates a recorder killed while writing the last sample
+    os.truncate(file_path, os.path.getsize(file_path) - cut_size)
+    recorded_samples = list(read_recording(file_path))
+
+    write_samples(file_path, [(3000, {"a": 4.0, "series_b": 5.0})])
+
+    samples = list(read_recording(file_path))
+
+    assert recorded_samples == samples[:-1]
+    assert (3000, {"a": 4.0, "series_b": 5.0}) == samples[-1]
@@ -0,0 +1,60 @@
+# =============================================================================
+# Copyright (c) 2024 by Laszlo Anka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+import pytest
+
+from pypz.example.records import ColumnBatch, check_record_type, concatenate_batches, create_row_type, to_dicts
+
+Records = [{"text": f"HelloWorld_{index}", "index": index} for index in range(5)]
+
+
+def test_column_batch_behaves_as_list_of_records():
+    batch = ColumnBatch.from_records(Records, ["text", "index"])
+
+    assert 5 == len(batch)
+    assert Records[2] == batch[2]
+    assert Records == list(batch)
+    assert Records == batch.to_records()
+    assert ColumnBatch.from_records(Records[1:3], ["text", "index"]) == batch[1:3]
+    assert [("HelloWorld_0", 0), ("HelloWorld_1", 1)] == list(batch[:2].iter_rows())
+
+
+def test_column_batch_rejects_columns_of_different_lengths():
+    with pytest.raises(ValueError):
+        ColumnBatch({"text": ["a", "b"], "index": [0]})
+
+
+def test_concatenate_batches():
+    batches = [ColumnBatch.from_records(Records[:2], ["text", "index"]),
+               ColumnBatch.from_records(Records[2:], ["text", "index"])]
+
+    assert ColumnBatch.from_records(Records, ["text", "index"]) == concatenate_batches(batches)
+    assert Records == concatenate_batches([Records[:2], batches[1]])
+    assert [] == concatenate_batches([])
+
+
+def test_rows_are_converted_to_dicts():
+    row_type = create_row_type("Record", ["text", "class"])
+    row = row_type("HelloWorld", "keyword")
+
+    assert ("text", "_1") == row._fields
+    assert not hasattr(row, "__dict__")
+    assert [{"text": "HelloWorld", "_1": "keyword"}] == to_dicts([row])
+    assert Records is to_dicts(Records)
+
+
+def test_invalid_record_type_is_rejected():
+    with pytest.raises(ValueError):
+        check_record_type("object")
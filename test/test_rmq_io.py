@@ -0,0 +1,46 @@
+# =============================================================================
+# Copyright (c) 2024 by Laszlo Anka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+import pytest
+
+from pypz.example.compression import CompressionSelector, compress_payload
+from pypz.example.frames import pack_frame
+from pypz.example.rmq_io import to_record_frame
+
+Records = [f"HelloWorld_{index}".encode() for index in range(100)]
+
+
+@pytest.mark.parametrize("compression", ["none", "gzip", "adaptive"])
+def test_frames_are_decompressed(compression):
+    message = CompressionSelector(compression, bandwidth_mbps=1).compress(pack_frame(Records))
+
+    assert Records == [bytes(record) for record in to_record_frame(message)]
+
+
+@pytest.mark.parametrize("message", [
+    b"PZC",
+    b"PZC plain message",
+    b"PZC\x01\x10\x00\x00\x00" + b"x" * 16,
+    b"PZC\x00\x04\x00\x00\x00PZF1",
+    b"PZC\xff" + bytes(16),
+    compress_payload(b"HelloWorld" * 100, "gzip"),
+    b"plain message",
+])
+def test_plain_messages_are_single_records(message):
+    assert [message] == [bytes(record) for record in to_record_frame(message)]
+
+
+def test_string_messages_are_single_records():
+    assert [b"PZC plain message"] == [bytes(record) for record in to_record_frame("PZC plain message")]
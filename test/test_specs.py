@@ -0,0 +1,90 @@
+# =============================================================================
+# Copyright (c) 2024 by Laszlo Anka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+import json
+
+import pytest
+from pypz.core.commons.utils import convert_to_dict
+
+from pypz.example.k8s_pipeline import KubernetesRMQDemoPipeline
+from pypz.example.pipeline import DemoPipeline
+from pypz.example.specs import PipelineSpecCache, dumps_compact, from_compact, load_pipeline, to_compact
+
+
+def create_pipeline(pipeline_type: type, record_count: int = 30):
+    pipeline = pipeline_type("pipeline")
+    pipeline.set_parameter(">>channelLocation", "BROKER_URL")
+    pipeline.writer.set_parameter("recordCount", record_count)
+    return pipeline
+
+
+@pytest.mark.parametrize("pipeline_type", [DemoPipeline, KubernetesRMQDemoPipeline])
+def test_compact_spec_round_trip(pipeline_type):
+    pipeline = create_pipeline(pipeline_type)
+    instance_dto = convert_to_dict(pipeline.get_dto())
+
+    assert instance_dto == from_compact(to_compact(instance_dto))
+
+    compact_spec = dumps_compact(pipeline)
+
+    assert len(compact_spec) < len(str(pipeline))
+
+    for source in (compact_spec, compact_spec.encode(), str(pipeline)):
+        assert instance_dto == convert_to_dict(load_pipeline(source, use_cache=False).get_dto())
+
+
+def test_specs_are_stored_once():
+    compact = to_compact(convert_to_dict(create_pipeline(KubernetesRMQDemoPipeline).get_dto()))
+
+    assert ["pypz.example.k8s_pipeline:KubernetesRMQDemoReaderOperator",
+            "pypz.example.k8s_pipeline:KubernetesRMQDemoWriterOperator"] == \
+        sorted(key for key in compact["specs"] if key.endswith("Operator"))
+    assert not any("currentValue" in description
+                   for spec in compact["specs"].values()
+                   for description in (spec.get("expectedParameters") or {}).values())
+
+
+def test_unsupported_compact_version_is_rejected():
+    compact = json.loads(dumps_compact(create_pipeline(DemoPipeline)))
+    compact["version"] += 1
+
+    with pytest.raises(ValueError):
+        from_compact(compact)
+
+
+def test_spec_cache():
+    cache = PipelineSpecCache(max_size=2)
+    sources = [dumps_compact(create_pipeline(DemoPipeline, record_count)) for record_count in range(3)]
+
+    first_pipeline = cache.load(sources[0])
+    second_pipeline = cache.load(sources[0])
+
+    assert (1, 1) == (cache.hit_count, cache.miss_count)
+    assert first_pipeline is not second_pipeline
+    assert str(first_pipeline) == str(second_pipeline)
+
+    # Modifying a loaded pipeline does not affect the cached spec
+    first_pipeline.writer.set_parameter("recordCount", 100)
+    assert 0 == cache.load(sources[0]).writer.get_parameter("recordCount")
+
+    assert cache.load(sources[0], shared=True) is cache.load(sources[0], shared=True)
+    assert cache.load(sources[0], shared=True) is not cache.load(sources[0], shared=True, mock_nonexistent=True)
+
+    # The least recently used spec is evicted
+    cache.load(sources[1])
+    cache.load(sources[2])
+    cache.load(sources[0])
+
+    assert 4 == cache.miss_count